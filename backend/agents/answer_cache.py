@@ -0,0 +1,91 @@
+import os
+import threading
+
+import numpy as np
+
+from backend.tracing import counter
+
+# Cosine similarity above which two questions count as the same question
+SIMILARITY_THRESHOLD = float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.95"))
+ENTRIES_PER_TENANT = int(os.getenv("ANSWER_CACHE_ENTRIES", "512"))
+MAX_TENANTS = 1000
+
+CACHE_LOOKUPS = counter(
+    "airc_answer_cache_total",
+    "Semantic answer cache lookups by result",
+    ["result"]
+)
+CACHE_SAVED_SECONDS = counter(
+    "airc_answer_cache_saved_seconds_total",
+    "Retrieval and QA time not spent thanks to cache hits"
+)
+
+# ---------------------------
+# Per-tenant cache
+# ---------------------------
+# Entries are (question embedding, scope, response, seconds it took to
+# compute). The embedding is of the question as asked; scope is the earlier
+# conversation a follow-up was resolved against ("" for standalone
+# questions), and only entries with the same scope can match. Entries are
+# only valid for the collection version they were answered against; a write
+# to the collection empties the tenant's cache on the next lookup.
+class _TenantCache:
+    def __init__(self, version):
+        self.version = version
+        self.vectors = None
+        self.scopes = []
+        self.entries = []
+        self.next_slot = 0
+
+    def add(self, vector, scope, response, seconds):
+        vector = np.asarray(vector, dtype=np.float32)[None, :]
+        if self.vectors is None:
+            self.vectors = vector
+        elif len(self.entries) < ENTRIES_PER_TENANT:
+            self.vectors = np.vstack([self.vectors, vector])
+        else:
+            # Full: overwrite the oldest slot (ring buffer)
+            self.vectors[self.next_slot] = vector[0]
+            self.scopes[self.next_slot] = scope
+            self.entries[self.next_slot] = (response, seconds)
+            self.next_slot = (self.next_slot + 1) % ENTRIES_PER_TENANT
+            return
+        self.scopes.append(scope)
+        self.entries.append((response, seconds))
+
+class SemanticAnswerCache:
+    def __init__(self, threshold=SIMILARITY_THRESHOLD):
+        self.threshold = threshold
+        self._tenants = {}
+        self._lock = threading.Lock()
+
+    def lookup(self, tenant, version, vector, scope=""):
+        with self._lock:
+            cache = self._tenants.get(tenant)
+            if cache is None or cache.version != version or cache.vectors is None:
+                CACHE_LOOKUPS.inc(result="miss")
+                return None
+            similarity = cache.vectors @ np.asarray(vector, dtype=np.float32)
+            similarity[[s != scope for s in cache.scopes]] = -np.inf
+            best = int(np.argmax(similarity))
+            if similarity[best] < self.threshold:
+                CACHE_LOOKUPS.inc(result="miss")
+                return None
+            response, seconds = cache.entries[best]
+
+        CACHE_LOOKUPS.inc(result="hit")
+        CACHE_SAVED_SECONDS.inc(seconds)
+        return response
+
+    def store(self, tenant, version, vector, response, seconds, scope=""):
+        with self._lock:
+            cache = self._tenants.get(tenant)
+            if cache is not None and version < cache.version:
+                return  # answered against data that has since changed
+            if cache is None or version > cache.version:
+                if cache is None and len(self._tenants) >= MAX_TENANTS:
+                    self._tenants.pop(next(iter(self._tenants)))
+                cache = self._tenants[tenant] = _TenantCache(version)
+            cache.add(vector, scope, response, seconds)
+
+answer_cache = SemanticAnswerCache()
@@ -0,0 +1,404 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+from backend.agents.quiz_agent import STOPWORDS, extract_terms
+from backend.agents.rag_agent import chunk_passages, embed_batch
+from backend.agents.summarize_agent import split_sentences
+from backend.tracing import span
+
+FLASHCARD_DB = Path(os.getenv("FLASHCARD_DB", Path("storage") / "flashcards.db"))
+DEFAULT_DECK = "default"
+DAY_SECONDS = 86400
+
+# SM-2 parameters; grades run 0-5 and anything below 3 is a lapse
+MIN_EASE = 1.3
+START_EASE = 2.5
+RELEARN_SECONDS = 600
+MASTERED_INTERVAL_DAYS = 21
+MAX_CARDS_PER_REQUEST = 5000
+
+# Generation walks at most this many unseen passages per call; the rest
+# are picked up by the next call
+MAX_PASSAGES_PER_RUN = 256
+QA_BATCH_SIZE = 16
+QA_MIN_SCORE = 0.3
+MAX_ANSWER_CHARS = 200
+# Cards whose front+back embeddings are this similar count as duplicates
+DUPLICATE_SIMILARITY = 0.9
+# Bare "X is ..." only counts as a definition when followed by one of these
+COPULA_BODY = re.compile(r"^(?:a|an|the|one of|any|a kind of|a type of)\s", re.IGNORECASE)
+
+DEFINITION = re.compile(
+    r"^(?:(?P<article>a|an|the)\s+)?(?P<term>[A-Za-z][\w\-]*(?:\s+[\w\-]+){0,4}?)"
+    r"(?:\s*\((?P<abbr>[A-Z][A-Za-z]{1,9})\))?,?\s+"
+    r"(?P<verb>is defined as|are defined as|refers to|refer to|is|are|means|denotes)\s+"
+    r"(?P<body>.{15,})$",
+    re.IGNORECASE | re.DOTALL
+)
+
+CARD_COLUMNS = (
+    "card_id", "deck", "front", "back", "kind", "doc_id", "start", "end",
+    "due", "interval", "ease", "reps", "lapses", "last_review"
+)
+
+# ---------------------------
+# SM-2
+# ---------------------------
+def schedule(card, grade, now):
+    # Returns the updated (interval days, ease, reps, lapses, due)
+    interval, ease, reps, lapses = card["interval"], card["ease"], card["reps"], card["lapses"]
+    if grade < 3:
+        # As in SM-2, a lapse restarts the repetitions but keeps the ease
+        reps, lapses = 0, lapses + 1
+        interval = RELEARN_SECONDS / DAY_SECONDS
+        due = now + RELEARN_SECONDS
+    else:
+        reps += 1
+        interval = 1.0 if reps == 1 else 6.0 if reps == 2 else interval * ease
+        due = now + interval * DAY_SECONDS
+        ease = max(MIN_EASE, ease + 0.1 - (5 - grade) * (0.08 + (5 - grade) * 0.02))
+    return interval, ease, reps, lapses, due
+
+# ---------------------------
+# Card store
+# ---------------------------
+# Cards live in SQLite with an index on (tenant, deck, due): the next due
+# card is one B-tree descent, reviews touch a single row, and decks of tens
+# of thousands of cards never load into memory.
+class ReviewScheduler:
+    def __init__(self, path=FLASHCARD_DB):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=10)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS cards (
+                    tenant TEXT NOT NULL,
+                    deck TEXT NOT NULL,
+                    card_id INTEGER PRIMARY KEY,
+                    front TEXT NOT NULL,
+                    back TEXT NOT NULL,
+                    kind TEXT NOT NULL DEFAULT 'basic',
+                    doc_id TEXT,
+                    start INTEGER,
+                    "end" INTEGER,
+                    due REAL NOT NULL,
+                    interval REAL NOT NULL DEFAULT 0,
+                    ease REAL NOT NULL DEFAULT 2.5,
+                    reps INTEGER NOT NULL DEFAULT 0,
+                    lapses INTEGER NOT NULL DEFAULT 0,
+                    last_review REAL
+                );
+                CREATE UNIQUE INDEX IF NOT EXISTS cards_front ON cards (tenant, deck, front);
+                CREATE INDEX IF NOT EXISTS cards_due ON cards (tenant, deck, due);
+                CREATE INDEX IF NOT EXISTS cards_tenant_due ON cards (tenant, due);
+                CREATE TABLE IF NOT EXISTS card_vectors (
+                    card_id INTEGER PRIMARY KEY,
+                    tenant TEXT NOT NULL,
+                    deck TEXT NOT NULL,
+                    vector BLOB NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS card_vectors_deck ON card_vectors (tenant, deck);
+                CREATE TABLE IF NOT EXISTS generated_passages (
+                    tenant TEXT NOT NULL,
+                    deck TEXT NOT NULL,
+                    passage TEXT NOT NULL,
+                    PRIMARY KEY (tenant, deck, passage)
+                );
+                CREATE TABLE IF NOT EXISTS decks (
+                    tenant TEXT NOT NULL,
+                    deck TEXT NOT NULL,
+                    total INTEGER NOT NULL DEFAULT 0,
+                    reviewed INTEGER NOT NULL DEFAULT 0,
+                    mastered INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (tenant, deck)
+                );
+            """)
+
+    def _card(self, row):
+        card = {name: row[name] for name in CARD_COLUMNS}
+        card["new"] = card["reps"] == 0 and card["last_review"] is None
+        return card
+
+    def _insert(self, tenant, deck, cards, now):
+        # New cards are due immediately, in insertion order; a card whose
+        # front already exists in the deck is skipped. Returns the ids of the
+        # inserted cards (None for skipped ones); caller holds the lock.
+        ids = []
+        for i, c in enumerate(cards):
+            cursor = self._conn.execute(
+                'INSERT OR IGNORE INTO cards (tenant, deck, front, back, kind, doc_id, start, "end", due, ease) '
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (tenant, deck, c["front"], c["back"], c.get("kind", "basic"), c.get("doc_id"),
+                 c.get("start"), c.get("end"), now + i * 1e-6, START_EASE)
+            )
+            ids.append(cursor.lastrowid if cursor.rowcount else None)
+        added = sum(card_id is not None for card_id in ids)
+        self._conn.execute(
+            "INSERT INTO decks (tenant, deck, total) VALUES (?, ?, ?) "
+            "ON CONFLICT (tenant, deck) DO UPDATE SET total = total + excluded.total",
+            (tenant, deck, added)
+        )
+        return ids
+
+    def _insert_vectors(self, tenant, deck, ids, vectors):
+        # Caller holds the lock
+        self._conn.executemany(
+            "INSERT INTO card_vectors (card_id, tenant, deck, vector) VALUES (?, ?, ?, ?)",
+            [(card_id, tenant, deck, vector.astype(np.float16).tobytes())
+             for card_id, vector in zip(ids, vectors) if card_id is not None]
+        )
+
+    def add_cards(self, tenant, deck, cards, now=None):
+        # Cards added directly (e.g. seeded from a quiz) are embedded too, so
+        # generation's near-duplicate check sees them
+        now = time.time() if now is None else now
+        cards = [c for c in cards[:MAX_CARDS_PER_REQUEST] if c.get("front") and c.get("back")]
+        if not cards:
+            return 0
+        vectors = embed_batch([card_text(c) for c in cards])
+        with self._lock, self._conn:
+            ids = self._insert(tenant, deck, cards, now)
+            self._insert_vectors(tenant, deck, ids, vectors)
+            return sum(card_id is not None for card_id in ids)
+
+    def add_generated(self, tenant, deck, cards, vectors, passages, now=None):
+        # Cards, their dedup vectors and the passages they came from are
+        # committed together, so a failed run is simply retried
+        now = time.time() if now is None else now
+        with self._lock, self._conn:
+            ids = self._insert(tenant, deck, cards, now)
+            self._insert_vectors(tenant, deck, ids, vectors)
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO generated_passages (tenant, deck, passage) VALUES (?, ?, ?)",
+                [(tenant, deck, digest) for digest in passages]
+            )
+            return sum(card_id is not None for card_id in ids)
+
+    def seen_passages(self, tenant, deck, digests):
+        seen = set()
+        with self._lock:
+            for pos in range(0, len(digests), 500):
+                chunk = digests[pos:pos + 500]
+                rows = self._conn.execute(
+                    f"SELECT passage FROM generated_passages WHERE tenant = ? AND deck = ? "
+                    f"AND passage IN ({','.join('?' * len(chunk))})",
+                    (tenant, deck, *chunk)
+                ).fetchall()
+                seen.update(row[0] for row in rows)
+        return seen
+
+    def deck_vectors(self, tenant, deck):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT vector FROM card_vectors WHERE tenant = ? AND deck = ?", (tenant, deck)
+            ).fetchall()
+        if not rows:
+            return None
+        return np.frombuffer(b"".join(row[0] for row in rows), dtype=np.float16).reshape(len(rows), -1)
+
+    def next_due(self, tenant, deck=None, now=None, limit=1):
+        now = time.time() if now is None else now
+        with self._lock:
+            if deck:
+                rows = self._conn.execute(
+                    "SELECT * FROM cards WHERE tenant = ? AND deck = ? AND due <= ? ORDER BY due LIMIT ?",
+                    (tenant, deck, now, limit)
+                ).fetchall()
+            else:
+                rows = self._conn.execute(
+                    "SELECT * FROM cards WHERE tenant = ? AND due <= ? ORDER BY due LIMIT ?",
+                    (tenant, now, limit)
+                ).fetchall()
+        return [self._card(row) for row in rows]
+
+    def review(self, tenant, card_id, grade, now=None):
+        now = time.time() if now is None else now
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT * FROM cards WHERE tenant = ? AND card_id = ?", (tenant, card_id)
+            ).fetchone()
+            if row is None:
+                return None
+            interval, ease, reps, lapses, due = schedule(row, grade, now)
+            self._conn.execute(
+                "UPDATE cards SET interval = ?, ease = ?, reps = ?, lapses = ?, due = ?, last_review = ? "
+                "WHERE card_id = ?",
+                (interval, ease, reps, lapses, due, now, card_id)
+            )
+            # Deck counters move with each review so stats never scan cards
+            mastered = (interval >= MASTERED_INTERVAL_DAYS) - (row["interval"] >= MASTERED_INTERVAL_DAYS)
+            self._conn.execute(
+                "UPDATE decks SET reviewed = reviewed + ?, mastered = mastered + ? WHERE tenant = ? AND deck = ?",
+                (row["last_review"] is None, mastered, tenant, row["deck"])
+            )
+            return {**self._card(row), "interval": interval, "ease": ease, "reps": reps,
+                    "lapses": lapses, "due": due, "last_review": now, "new": False}
+
+    def stats(self, tenant, deck=None, now=None):
+        # Totals come from the deck counters; due counts and the next due
+        # time are range queries on the due index
+        now = time.time() if now is None else now
+        scope, params = ("tenant = ? AND deck = ?", (tenant, deck)) if deck else ("tenant = ?", (tenant,))
+        with self._lock:
+            total, reviewed, mastered = self._conn.execute(
+                f"SELECT COALESCE(SUM(total), 0), COALESCE(SUM(reviewed), 0), COALESCE(SUM(mastered), 0) "
+                f"FROM decks WHERE {scope}",
+                params
+            ).fetchone()
+            due = self._conn.execute(
+                f"SELECT COUNT(*) FROM cards WHERE {scope} AND due <= ?", (*params, now)
+            ).fetchone()[0]
+            next_due = self._conn.execute(
+                f"SELECT MIN(due) FROM cards WHERE {scope} AND due > ?", (*params, now)
+            ).fetchone()[0]
+        return {"total": total, "due": due, "new": total - reviewed, "mastered": mastered, "next_due": next_due}
+
+    def decks(self, tenant):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT deck, total FROM decks WHERE tenant = ? AND total > 0 ORDER BY deck", (tenant,)
+            ).fetchall()
+        return [{"deck": deck, "cards": count} for deck, count in rows]
+
+    def delete_deck(self, tenant, deck):
+        with self._lock, self._conn:
+            for table in ("decks", "card_vectors", "generated_passages"):
+                self._conn.execute(f"DELETE FROM {table} WHERE tenant = ? AND deck = ?", (tenant, deck))
+            return self._conn.execute(
+                "DELETE FROM cards WHERE tenant = ? AND deck = ?", (tenant, deck)
+            ).rowcount
+
+# ---------------------------
+# Generation
+# ---------------------------
+def card_text(card):
+    # What a card's dedup vector is computed from
+    return f"{card['front']} {card['back']}"
+
+def definition_cards(passage):
+    # "X is a ...", "X refers to ...", "X (ABBR) is defined as ..."
+    cards = []
+    for sentence in split_sentences(passage):
+        match = DEFINITION.match(sentence.strip())
+        if not match:
+            continue
+        term = match["term"].strip()
+        words = term.split()
+        if words[0].lower() in STOPWORDS or words[-1].lower() in STOPWORDS:
+            continue
+        if match["verb"].lower() in ("is", "are") and not COPULA_BODY.match(match["body"]):
+            continue
+        if match["abbr"]:
+            term = f"{term} ({match['abbr']})"
+        verb = "are" if match["verb"].lower().startswith("are") else "is"
+        if match["article"]:
+            term = f"{match['article'].lower()} {term}"
+        cards.append({"front": f"What {verb} {term}?", "back": sentence.strip(), "kind": "definition"})
+    return cards
+
+def qa_cards(passages, qa):
+    # One question per passage about its strongest key phrase, answered by
+    # the extractive QA model in batches
+    questions = []
+    for i, passage in enumerate(passages):
+        terms = extract_terms([passage], 1)
+        if terms:
+            questions.append((i, terms[0], {"question": f"What is {terms[0]}?", "context": passage}))
+    if not questions:
+        return []
+
+    inputs = [q[2] for q in questions]
+    with span("qa_model", input_size=sum(len(q["context"]) for q in inputs), batch_size=len(inputs)):
+        answers = qa(inputs, batch_size=QA_BATCH_SIZE)
+    if isinstance(answers, dict):
+        answers = [answers]
+
+    cards = []
+    for (i, term, item), answer in zip(questions, answers):
+        text = answer["answer"].strip()
+        if answer["score"] < QA_MIN_SCORE or not text or len(text) > MAX_ANSWER_CHARS:
+            continue
+        if text.lower() == term.lower():
+            continue
+        cards.append({"front": item["question"], "back": text, "kind": "qa", "passage": i})
+    return cards
+
+def drop_duplicates(vectors, existing=None, threshold=DUPLICATE_SIMILARITY):
+    # Greedy: a candidate survives if it is not too close to a deck card or
+    # to an earlier surviving candidate
+    keep = np.ones(len(vectors), dtype=bool)
+    if existing is not None and len(existing):
+        keep &= (vectors @ existing.astype(np.float32).T).max(axis=1) < threshold
+    similarity = vectors @ vectors.T
+    for i in range(len(vectors)):
+        if keep[i]:
+            keep[i + 1:] &= similarity[i, i + 1:] < threshold
+    return keep
+
+def generate_flashcards(scheduler, tenant, deck, doc_id, text, qa, max_passages=MAX_PASSAGES_PER_RUN):
+    # Incremental: passages are keyed by content hash, so re-running on a
+    # grown document only walks the passages that were not seen before
+    offsets = chunk_passages(text)
+    digests = [hashlib.sha1(text[s:e].encode("utf-8")).hexdigest() for s, e in offsets]
+    seen = scheduler.seen_passages(tenant, deck, digests)
+    pending = [i for i, digest in enumerate(digests) if digest not in seen]
+    batch = pending[:max_passages]
+
+    with span("flashcard_extract", input_size=len(batch)):
+        candidates = []
+        without_definition = []
+        for i in batch:
+            cards = definition_cards(text[offsets[i][0]:offsets[i][1]])
+            for card in cards:
+                card["passage"] = i
+            candidates.extend(cards)
+            if not cards:
+                without_definition.append(i)
+
+        for card in qa_cards([text[offsets[i][0]:offsets[i][1]] for i in without_definition], qa):
+            card["passage"] = without_definition[card["passage"]]
+            candidates.append(card)
+
+    added = duplicates = 0
+    if candidates:
+        with span("flashcard_dedup", input_size=len(candidates)):
+            vectors = embed_batch([card_text(c) for c in candidates])
+            keep = drop_duplicates(vectors, scheduler.deck_vectors(tenant, deck))
+        cards = []
+        for card in (c for c, k in zip(candidates, keep) if k):
+            start, end = offsets[card.pop("passage")]
+            cards.append({**card, "doc_id": doc_id, "start": int(start), "end": int(end)})
+        duplicates = len(candidates) - len(cards)
+        added = scheduler.add_generated(tenant, deck, cards, vectors[keep], [digests[i] for i in batch])
+    else:
+        scheduler.add_generated(tenant, deck, [], [], [digests[i] for i in batch])
+
+    return {
+        "passages": len(offsets),
+        "processed": len(batch),
+        "remaining": len(pending) - len(batch),
+        "candidates": len(candidates),
+        "duplicates": duplicates,
+        "added": added
+    }
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+def review_scheduler():
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = ReviewScheduler()
+        return _scheduler
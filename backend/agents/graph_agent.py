@@ -0,0 +1,318 @@
+import atexit
+import hashlib
+import json
+import os
+import threading
+import weakref
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+from scipy import sparse
+
+from backend.agents.quiz_agent import extract_terms, word_runs
+from backend.agents.rag_agent import DEFAULT_TENANT
+from backend.tracing import span
+
+GRAPH_DIR = Path(os.getenv("GRAPH_DIR", Path("storage") / "graph"))
+MAX_CONCEPTS_PER_DOCUMENT = 200
+# Ingests within this many seconds share one write of the graph files
+SAVE_DELAY_SECONDS = float(os.getenv("GRAPH_SAVE_DELAY", "5"))
+# Tenant graphs kept in memory; others are reloaded from disk on demand
+MAX_LOADED_GRAPHS = int(os.getenv("GRAPH_MAX_LOADED", "64"))
+MAX_GRAM = 3
+
+# Level of detail: browsers stay responsive up to a few hundred nodes/edges
+MAX_VIEW_NODES = 200
+MAX_VIEW_EDGES = 400
+LABELLED_NODES = 40
+LAYOUT_ITERATIONS = 150
+VIEW_CACHE_SIZE = 32
+
+# ---------------------------
+# Concept extraction
+# ---------------------------
+def _grams(passage):
+    return {
+        " ".join(words[i:i + n]).lower()
+        for words in word_runs(passage)
+        for n in range(1, MAX_GRAM + 1)
+        for i in range(len(words) - n + 1)
+    }
+
+def extract_concepts(passages, max_concepts=MAX_CONCEPTS_PER_DOCUMENT):
+    # Key phrases (stopword-trimmed 1-3 word runs, capitalised names favoured)
+    # and, per passage, which of them occur on whole-word boundaries
+    labels = extract_terms(passages, max_concepts)
+    keys = {label.lower(): label for label in labels}
+    occurrences = [sorted(keys.keys() & _grams(p)) for p in passages]
+    return keys, occurrences
+
+# ---------------------------
+# Layout
+# ---------------------------
+def spring_layout(size, sources, targets, weights, iterations=LAYOUT_ITERATIONS, seed=0):
+    # Fruchterman-Reingold on a dense distance matrix; fine at MAX_VIEW_NODES
+    rng = np.random.default_rng(seed)
+    positions = rng.uniform(-1, 1, (size, 2))
+    if size < 2:
+        return positions
+    k = 1 / np.sqrt(size)
+    attraction = np.zeros((size, size))
+    attraction[sources, targets] = weights / max(float(np.max(weights, initial=0)), 1e-12)
+    attraction += attraction.T
+
+    temperature = 0.1
+    for _ in range(iterations):
+        delta = positions[:, None, :] - positions[None, :, :]
+        distance = np.maximum(np.linalg.norm(delta, axis=-1), 1e-3)
+        force = k * k / distance ** 2 - attraction * distance / k
+        displacement = (delta * force[:, :, None]).sum(axis=1)
+        length = np.maximum(np.linalg.norm(displacement, axis=1), 1e-9)
+        positions += displacement / length[:, None] * np.minimum(length, temperature)[:, None]
+        temperature *= 0.97
+    # Centre and scale into [-1, 1] so clients only pick a zoom factor
+    positions -= positions.mean(axis=0)
+    return positions / max(float(np.abs(positions).max()), 1e-9)
+
+# ---------------------------
+# Corpus co-occurrence index
+# ---------------------------
+# counts[i, j] is the number of passages where concepts i and j both occur;
+# the diagonal holds each concept's passage frequency. Documents are folded
+# in as they are ingested, so serving a subgraph never rescans any text.
+class ConceptGraph:
+    def __init__(self, directory=GRAPH_DIR):
+        self.directory = Path(directory)
+        self.ids = {}
+        self.labels = []
+        self.documents = {}
+        self.passages = 0
+        self.counts = sparse.csr_matrix((0, 0), dtype=np.int32)
+        self.version = 0
+        self._views = OrderedDict()
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._save_timer = None
+        self._dirty = False
+        self._load()
+
+    def _load(self):
+        state_path = self.directory / "concepts.json"
+        matrix_path = self.directory / "cooccurrence.npz"
+        if not state_path.exists() or not matrix_path.exists():
+            return
+        state = json.loads(state_path.read_text())
+        self.labels = state["labels"]
+        self.ids = {label.lower(): i for i, label in enumerate(self.labels)}
+        self.documents = state["documents"]
+        self.passages = state["passages"]
+        self.counts = sparse.load_npz(matrix_path).tocsr()
+
+    def _save(self, counts, state):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        matrix_tmp = self.directory / "cooccurrence.tmp.npz"
+        state_tmp = self.directory / "concepts.json.tmp"
+        sparse.save_npz(matrix_tmp, counts)
+        state_tmp.write_text(json.dumps(state))
+        os.replace(matrix_tmp, self.directory / "cooccurrence.npz")
+        os.replace(state_tmp, self.directory / "concepts.json")
+
+    def _schedule_save(self):
+        # Called under self._lock. Rewriting the matrix on every ingest is
+        # O(corpus); a burst of uploads is written once after SAVE_DELAY_SECONDS
+        self._dirty = True
+        if self._save_timer is None:
+            self._save_timer = threading.Timer(SAVE_DELAY_SECONDS, self.flush)
+            self._save_timer.daemon = True
+            self._save_timer.start()
+
+    def flush(self):
+        with self._save_lock:
+            with self._lock:
+                self._save_timer = None
+                if not self._dirty:
+                    return
+                self._dirty = False
+                # counts is replaced, never mutated, so the snapshot is safe
+                # to write outside the lock
+                counts = self.counts
+                state = {
+                    "labels": list(self.labels),
+                    "documents": dict(self.documents),
+                    "passages": self.passages
+                }
+            try:
+                self._save(counts, state)
+            except Exception:
+                with self._lock:
+                    self._dirty = True
+                raise
+
+    def add_document(self, doc_id, passages):
+        with self._lock:
+            if doc_id in self.documents:
+                return len(self.documents[doc_id])
+
+        with span("graph_extract", input_size=len(passages)):
+            keys, occurrences = extract_concepts(passages)
+        if not keys:
+            return 0
+
+        with self._lock, span("graph_update", input_size=len(keys)):
+            if doc_id in self.documents:
+                return len(self.documents[doc_id])
+
+            for key, label in keys.items():
+                if key not in self.ids:
+                    self.ids[key] = len(self.labels)
+                    self.labels.append(label)
+            size = len(self.labels)
+
+            # Binary passage x concept incidence; its Gram matrix is this
+            # document's contribution to the co-occurrence counts
+            rows = [r for r, found in enumerate(occurrences) for _ in found]
+            cols = [self.ids[key] for found in occurrences for key in found]
+            incidence = sparse.csr_matrix(
+                (np.ones(len(rows), dtype=np.int32), (rows, cols)),
+                shape=(len(passages), size)
+            )
+            # Never resize in place: flush() and subgraph() read the current
+            # matrix outside the lock. New concepts get empty rows by
+            # repeating the last indptr entry, which copies no values.
+            counts = self.counts
+            if counts.shape[0] < size:
+                indptr = np.pad(counts.indptr, (0, size - counts.shape[0]), mode="edge")
+                counts = sparse.csr_matrix((counts.data, counts.indices, indptr), shape=(size, size))
+            self.counts = (counts + incidence.T @ incidence).tocsr()
+
+            self.passages += len(passages)
+            self.documents[doc_id] = sorted({self.ids[key] for key in keys})
+            self.version += 1
+            self._schedule_save()
+            return len(keys)
+
+    def subgraph(self, top_n=30, doc_id=None, edges_per_node=4, min_cooccurrence=2):
+        with self._lock:
+            counts = self.counts
+            total = self.passages
+            candidates = self.documents.get(doc_id) if doc_id else None
+            labels = self.labels
+        if doc_id and candidates is None:
+            return None
+
+        frequency = counts.diagonal()
+        candidates = np.asarray(candidates if candidates is not None else range(len(frequency)))
+        if not len(candidates):
+            return {"nodes": [], "edges": []}
+
+        # Most frequent concepts first, then PMI over their co-occurrences
+        top_n = min(top_n, len(candidates))
+        order = np.argpartition(-frequency[candidates], top_n - 1)[:top_n]
+        nodes = candidates[order[np.argsort(-frequency[candidates][order])]]
+
+        block = sparse.triu(counts[nodes][:, nodes], k=1).tocoo()
+        keep = block.data >= min_cooccurrence
+        i, j, joint = block.row[keep], block.col[keep], block.data[keep].astype(np.float64)
+        pmi = np.log(joint * total / (frequency[nodes[i]] * frequency[nodes[j]].astype(np.float64)))
+
+        # Keep each node's strongest positive associations
+        edges, degree = [], np.zeros(len(nodes), dtype=int)
+        for e in np.argsort(-pmi):
+            if pmi[e] <= 0:
+                break
+            a, b = i[e], j[e]
+            if degree[a] >= edges_per_node and degree[b] >= edges_per_node:
+                continue
+            degree[a] += 1
+            degree[b] += 1
+            edges.append({
+                "source": labels[nodes[a]],
+                "target": labels[nodes[b]],
+                "weight": round(float(pmi[e]), 4),
+                "count": int(joint[e])
+            })
+
+        return {
+            "nodes": [{"id": labels[n], "count": int(frequency[n])} for n in nodes],
+            "edges": edges
+        }
+
+    def view(self, top_n=30, doc_id=None, edges_per_node=4, min_cooccurrence=2):
+        # Render-ready subgraph with precomputed positions, cached per
+        # parameters; any ingest bumps the version so stale views age out
+        top_n = max(1, min(top_n, MAX_VIEW_NODES))
+        edges_per_node = max(1, min(edges_per_node, 2 * MAX_VIEW_EDGES // top_n))
+        with self._lock:
+            key = (self.version, doc_id, top_n, edges_per_node, min_cooccurrence)
+            if key in self._views:
+                self._views.move_to_end(key)
+                return self._views[key]
+
+        graph = self.subgraph(top_n, doc_id, edges_per_node, min_cooccurrence)
+        if graph is None:
+            return None
+        nodes, edges = graph["nodes"], graph["edges"][:MAX_VIEW_EDGES]
+
+        with span("graph_layout", input_size=len(nodes)):
+            rows = {node["id"]: i for i, node in enumerate(nodes)}
+            positions = spring_layout(
+                len(nodes),
+                np.array([rows[e["source"]] for e in edges], dtype=int),
+                np.array([rows[e["target"]] for e in edges], dtype=int),
+                np.array([e["weight"] for e in edges])
+            )
+        # Nodes arrive most frequent first; only the top ones carry labels
+        for i, node in enumerate(nodes):
+            node["x"], node["y"] = round(float(positions[i, 0]), 4), round(float(positions[i, 1]), 4)
+            node["labelled"] = i < LABELLED_NODES
+
+        view = {"nodes": nodes, "edges": edges}
+        with self._lock:
+            self._views[key] = view
+            while len(self._views) > VIEW_CACHE_SIZE:
+                self._views.popitem(last=False)
+        return view
+
+    def stats(self):
+        with self._lock:
+            return {
+                "concepts": len(self.labels),
+                "documents": len(self.documents),
+                "passages": self.passages,
+                "pairs": int(self.counts.nnz),
+                "version": self.version
+            }
+
+# One graph per tenant, matching the per-tenant vector collections. The most
+# recently used stay loaded; an evicted graph still referenced elsewhere
+# (a running ingest, a pending save) is reused rather than loaded twice.
+_graphs = OrderedDict()
+_evicted = weakref.WeakValueDictionary()
+_graphs_lock = threading.Lock()
+
+def concept_graph(tenant=DEFAULT_TENANT):
+    evicted = []
+    with _graphs_lock:
+        graph = _graphs.get(tenant)
+        if graph is None:
+            graph = _evicted.pop(tenant, None)
+            if graph is None:
+                digest = hashlib.sha256(tenant.encode("utf-8")).hexdigest()[:24]
+                graph = ConceptGraph(GRAPH_DIR / digest)
+            _graphs[tenant] = graph
+        _graphs.move_to_end(tenant)
+        while len(_graphs) > MAX_LOADED_GRAPHS:
+            old_tenant, old_graph = _graphs.popitem(last=False)
+            _evicted[old_tenant] = old_graph
+            evicted.append(old_graph)
+    for old_graph in evicted:
+        old_graph.flush()
+    return graph
+
+@atexit.register
+def flush_graphs():
+    with _graphs_lock:
+        graphs = list(_graphs.values()) + list(_evicted.values())
+    for graph in graphs:
+        graph.flush()
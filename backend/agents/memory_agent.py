@@ -0,0 +1,149 @@
+import os
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+
+import numpy as np
+
+from backend.agents.quiz_agent import STOPWORDS
+from backend.agents.rag_agent import embed_batch
+from backend.tracing import span
+
+# Recent turns kept verbatim and used to rewrite follow-up questions
+WINDOW_TURNS = 4
+# Older turns move to an embedding memory capped by an approximate token budget
+MEMORY_TOKEN_BUDGET = int(os.getenv("CHAT_MEMORY_TOKENS", "2000"))
+RECALL_TURNS = 2
+RECALL_MIN_SIMILARITY = 0.35
+MAX_REWRITE_CHARS = 400
+MAX_SESSIONS = int(os.getenv("CHAT_MAX_SESSIONS", "1000"))
+SESSION_TTL_SECONDS = int(os.getenv("CHAT_SESSION_TTL", "3600"))
+
+# Pronouns and deictic words that can point back at an earlier turn
+REFERRING_WORDS = {
+    "it", "its", "they", "them", "their", "theirs", "this", "that", "these", "those",
+    "he", "she", "him", "his", "her", "former", "latter"
+}
+# Openers that continue the previous question ("what about chapter 3?")
+CONTINUATIONS = {("what", "about"), ("how", "about"), ("and",), ("also",), ("what", "else")}
+# Words that ask for something rather than name it
+REQUEST_WORDS = {
+    "explain", "describe", "tell", "define", "mean", "means", "meant", "show", "give",
+    "list", "summarize", "summarise", "elaborate", "please", "exactly", "really", "else",
+    "don", "doesn", "didn", "isn", "aren", "wasn", "weren"
+}
+WORD = re.compile(r"[a-z]+")
+
+def estimate_tokens(text):
+    # Roughly 4 characters per token for English; no tokenizer needed
+    return max(1, len(text) // 4)
+
+# ---------------------------
+# Session
+# ---------------------------
+class Conversation:
+    def __init__(self):
+        self.window = deque()
+        self.memory_questions = []
+        self.memory_tokens = []
+        self.memory_vectors = None
+        self.touched = time.time()
+        self.lock = threading.Lock()
+
+    def remember(self, question, answer):
+        with self.lock:
+            self.window.append((question, answer))
+            evicted = self.window.popleft() if len(self.window) > WINDOW_TURNS else None
+        if evicted is None:
+            return
+
+        text = f"Q: {evicted[0]} A: {evicted[1]}"
+        vector = embed_batch([text])
+        with self.lock:
+            self.memory_questions.append(evicted[0])
+            self.memory_tokens.append(estimate_tokens(text))
+            self.memory_vectors = vector if self.memory_vectors is None else np.vstack([self.memory_vectors, vector])
+            # Oldest memories go first once the budget is spent, so recall
+            # cost stays flat however long the chat runs
+            total, drop = sum(self.memory_tokens), 0
+            while total > MEMORY_TOKEN_BUDGET and drop < len(self.memory_tokens) - 1:
+                total -= self.memory_tokens[drop]
+                drop += 1
+            if drop:
+                del self.memory_questions[:drop], self.memory_tokens[:drop]
+                self.memory_vectors = self.memory_vectors[drop:]
+
+    def recall(self, vector, k=RECALL_TURNS):
+        with self.lock:
+            if self.memory_vectors is None:
+                return []
+            similarity = self.memory_vectors @ vector
+            questions = list(self.memory_questions)
+        order = np.argsort(-similarity)[:k]
+        return [questions[i] for i in order if similarity[i] >= RECALL_MIN_SIMILARITY]
+
+    def recent_questions(self):
+        with self.lock:
+            return [question for question, _ in self.window]
+
+def is_follow_up(question):
+    # A question leans on earlier turns when it names nothing of its own
+    # ("why?", "tell me more"), opens as a continuation, or refers back with
+    # a pronoun before naming anything it could refer to in the question
+    words = WORD.findall(question.lower())
+    if tuple(words[:1]) in CONTINUATIONS or tuple(words[:2]) in CONTINUATIONS:
+        return True
+    content = [
+        i for i, w in enumerate(words)
+        if len(w) > 2 and w not in STOPWORDS and w not in REFERRING_WORDS and w not in REQUEST_WORDS
+    ]
+    if not content:
+        return True
+    referring = [i for i, w in enumerate(words) if w in REFERRING_WORDS]
+    return bool(referring) and (len(content) == 1 or referring[0] < content[0])
+
+def rewrite_query(conversation, question, vector=None):
+    # Returns the retrieval query, its embedding and the earlier questions it
+    # was expanded with. Follow-ups are expanded with the last question and
+    # any recalled older turns on the same topic.
+    vector = embed_batch([question])[0] if vector is None else vector
+    if conversation is None or not is_follow_up(question):
+        return question, vector, []
+
+    with span("memory_recall"):
+        context = list(dict.fromkeys(conversation.recent_questions()[-1:] + conversation.recall(vector)))
+    if not context:
+        return question, vector, []
+
+    rewritten = f"{question} ({'; '.join(context)})"[:MAX_REWRITE_CHARS]
+    return rewritten, embed_batch([rewritten])[0], context
+
+# ---------------------------
+# Session store
+# ---------------------------
+class ConversationStore:
+    def __init__(self, max_sessions=MAX_SESSIONS, ttl=SESSION_TTL_SECONDS):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, tenant, session_id):
+        key = (tenant, session_id)
+        now = time.time()
+        with self._lock:
+            conversation = self._sessions.get(key)
+            if conversation is None or now - conversation.touched > self.ttl:
+                conversation = self._sessions[key] = Conversation()
+            conversation.touched = now
+            self._sessions.move_to_end(key)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+            return conversation
+
+    def drop(self, tenant, session_id):
+        with self._lock:
+            return self._sessions.pop((tenant, session_id), None) is not None
+
+conversations = ConversationStore()
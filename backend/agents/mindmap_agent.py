@@ -0,0 +1,162 @@
+import asyncio
+import hashlib
+import threading
+from collections import Counter, OrderedDict
+
+import numpy as np
+
+from backend.agents.quiz_agent import extract_terms
+from backend.agents.summarize_agent import summarize_tiered
+from backend.extraction import TEXT_LINE
+from backend.tracing import span
+
+MAX_DEPTH = 3
+MAX_NODES = 400
+KEY_PHRASES = 5
+# Key phrases of long sections come from evenly spaced windows of this total size
+KEY_PHRASE_CHARS = 20000
+KEY_PHRASE_WINDOW = 2000
+# Documents without an outline or headings are split into sections of this size
+FALLBACK_SECTION_CHARS = 8000
+# Heading candidates are short lines set noticeably larger than body text
+HEADING_SIZE_RATIO = 1.15
+MAX_HEADING_CHARS = 120
+SUMMARY_CACHE_SIZE = 1024
+
+_summaries = OrderedDict()
+_summaries_lock = threading.Lock()
+
+# ---------------------------
+# Headings
+# ---------------------------
+def _locate(text, title, start, end):
+    # Headings in the extracted text may wrap; match on the first few words
+    probe = " ".join(title.split()[:6])
+    position = text.find(probe, start, end) if probe else -1
+    return position if position >= 0 else start
+
+def outline_headings(toc, text, page_starts):
+    headings = []
+    pages = len(page_starts) - 1
+    for level, title, page in toc:
+        if level > MAX_DEPTH or not title.strip() or not 1 <= page <= pages:
+            continue
+        start, end = int(page_starts[page - 1]), int(page_starts[page])
+        headings.append((level, title.strip(), _locate(text, title.strip(), start, end)))
+    return headings
+
+def font_headings(layout, text):
+    # Body size is the size covering the most characters; the few larger
+    # sizes map to heading levels, biggest first
+    is_text = layout["kind"] == TEXT_LINE
+    sizes = np.round(layout["size"][is_text], 1)
+    starts, ends = layout["start"][is_text], layout["end"][is_text]
+    if not len(sizes):
+        return []
+
+    unique, inverse = np.unique(sizes, return_inverse=True)
+    body = unique[np.argmax(np.bincount(inverse, weights=ends - starts))]
+    larger = unique[unique >= body * HEADING_SIZE_RATIO][::-1][:MAX_DEPTH]
+    levels = {float(size): i + 1 for i, size in enumerate(larger)}
+
+    candidates = [
+        (levels[float(size)], " ".join(text[start:end].split()), int(start))
+        for size, start, end in zip(sizes, starts, ends)
+        if float(size) in levels and end - start <= MAX_HEADING_CHARS
+    ]
+    # Running headers repeat on every page at heading size; skip them
+    repeated = Counter(title for _, title, _ in candidates)
+    return [
+        (level, title, start) for level, title, start in candidates
+        if repeated[title] <= 2 and any(c.isalpha() for c in title)
+    ]
+
+def fallback_headings(text):
+    headings = []
+    for start in range(0, len(text), FALLBACK_SECTION_CHARS):
+        section = text[start:start + FALLBACK_SECTION_CHARS]
+        terms = extract_terms([section], 1)
+        headings.append((1, terms[0] if terms else f"Part {len(headings) + 1}", start))
+    return headings
+
+# ---------------------------
+# Tree
+# ---------------------------
+def key_phrases(text, start, end):
+    length = end - start
+    if length <= KEY_PHRASE_CHARS:
+        windows = [text[start:end]]
+    else:
+        count = KEY_PHRASE_CHARS // KEY_PHRASE_WINDOW
+        step = (length - KEY_PHRASE_WINDOW) // (count - 1)
+        windows = [text[start + i * step:start + i * step + KEY_PHRASE_WINDOW] for i in range(count)]
+    return extract_terms(windows, KEY_PHRASES)
+
+def build_tree(headings, text, title):
+    root = {"id": 0, "title": title, "level": 0, "start": 0, "end": len(text), "children": []}
+    nodes, stack = [root], [root]
+
+    # Oversized outlines lose their deepest level first, then their tail
+    while len(headings) >= MAX_NODES and max(h[0] for h in headings) > 1:
+        deepest = max(h[0] for h in headings)
+        headings = [h for h in headings if h[0] < deepest]
+
+    for level, heading, start in sorted(headings, key=lambda h: h[2])[:MAX_NODES - 1]:
+        while stack[-1]["level"] >= level:
+            stack.pop()["end"] = start
+        node = {"id": len(nodes), "title": heading, "level": level,
+                "start": start, "end": len(text), "children": []}
+        stack[-1]["children"].append(node)
+        nodes.append(node)
+        stack.append(node)
+
+    for node in nodes:
+        node["key_phrases"] = key_phrases(text, node["start"], node["end"])
+    return root
+
+def build_mindmap(text, title="Document", toc=None, layout=None):
+    # The tree only records titles, character ranges and key phrases;
+    # section summaries are produced on demand, a few nodes at a time
+    if not text or not text.strip():
+        return None
+
+    with span("mindmap_outline", input_size=len(text)) as record:
+        headings, record["source"] = [], "sections"
+        if toc and layout is not None:
+            headings, record["source"] = outline_headings(toc, text, layout["page_starts"]), "outline"
+        if not headings and layout is not None:
+            headings, record["source"] = font_headings(layout, text), "fonts"
+        if not headings:
+            headings, record["source"] = fallback_headings(text), "sections"
+
+    with span("mindmap_tree", input_size=len(headings)):
+        tree = build_tree(headings, text, title)
+    tree["source"] = record["source"]
+    return tree
+
+# ---------------------------
+# Section summaries
+# ---------------------------
+async def summarize_section(title, section_text, hint=None):
+    key = (hint, hashlib.sha256(section_text.encode("utf-8")).hexdigest())
+    with _summaries_lock:
+        if key in _summaries:
+            _summaries.move_to_end(key)
+            return _summaries[key]
+
+    summary, tier = await summarize_tiered(title, section_text, hint)
+    result = {"summary": summary, "tier": tier}
+    with _summaries_lock:
+        _summaries[key] = result
+        while len(_summaries) > SUMMARY_CACHE_SIZE:
+            _summaries.popitem(last=False)
+    return result
+
+async def summarize_sections(text, sections, hint=None):
+    # Sections are submitted together so short ones share a BART batch
+    with span("mindmap_summaries", input_size=len(sections), profile=False):
+        results = await asyncio.gather(*(
+            summarize_section(section.get("title", ""), text[section["start"]:section["end"]], hint)
+            for section in sections
+        ))
+    return [{"id": section["id"], **result} for section, result in zip(sections, results)]
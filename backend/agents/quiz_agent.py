@@ -1,16 +1,243 @@
-def generate_quiz(summary_text: str):
-    if not summary_text:
+import json
+import random
+import re
+import threading
+from collections import Counter, OrderedDict
+
+import numpy as np
+
+from backend.agents.rag_agent import embed_batch
+from backend.database import blob_store
+from backend.agents.summarize_agent import mmr_select, split_sentences
+from backend.tracing import span
+
+QUESTIONS_PER_QUIZ = 10
+OPTIONS_PER_QUESTION = 4
+MAX_STEM_CHARS = 250
+MAX_TERMS = 300
+CACHE_SIZE = 64
+
+STOPWORDS = set("""
+a about above after again against all also am an and any are as at be because been before
+being below between both but by can could did do does doing down during each few for from
+further had has have having he her here hers him his how i if in into is it its itself just
+me more most my no nor not now of off on once only or other our out over own same she should
+so some such than that the their them then there these they this those through to too under
+until up very was we were what when where which while who whom why will with would you your
+may might must shall using used use one two three first second new many much like e g eg ie
+example examples etc within without via per each every another however therefore thus
+""".split())
+
+WORD = re.compile(r"[A-Za-z][A-Za-z0-9\-]*")
+# Key phrases never span these: sentence and clause punctuation, line breaks
+PHRASE_BREAK = re.compile(r"[.!?;:,()\[\]\n]+")
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+def _cached(key, build):
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+    value = build()
+    with _cache_lock:
+        _cache[key] = value
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return value
+
+# ---------------------------
+# Key terms
+# ---------------------------
+def word_runs(passage):
+    # Words of each sentence/clause/line separately, so n-grams stay inside one
+    return [words for words in map(WORD.findall, PHRASE_BREAK.split(passage)) if words]
+
+def extract_terms(passages, max_terms=MAX_TERMS):
+    # Candidate phrases are 1-3 word runs that neither start nor end with a
+    # stopword; score favours terms spread over several passages
+    counts, spread = Counter(), Counter()
+    surface = {}
+    for passage in passages:
+        seen = set()
+        for words, n in ((words, n) for words in word_runs(passage) for n in (1, 2, 3)):
+            for i in range(len(words) - n + 1):
+                gram = words[i:i + n]
+                first, last = gram[0].lower(), gram[-1].lower()
+                if first in STOPWORDS or last in STOPWORDS or len(last) < 3:
+                    continue
+                if n == 1 and (len(first) < 5 and not gram[0][0].isupper()):
+                    continue
+                key = " ".join(w.lower() for w in gram)
+                counts[key] += 1
+                surface.setdefault(key, " ".join(gram))
+                seen.add(key)
+        spread.update(seen)
+
+    scored = [
+        (counts[key] * (1 + 0.5 * (len(key.split()) - 1)) * min(spread[key], 5), key)
+        for key in counts
+        if counts[key] >= 2 or surface[key][0].isupper()
+    ]
+    scored.sort(reverse=True)
+    return [surface[key] for _, key in scored[:max_terms]]
+
+class TermIndex:
+    # Key phrases of one document and their unit-normalised embeddings;
+    # distractor lookup is a single matrix-vector product
+    def __init__(self, terms, vectors):
+        self.terms = terms
+        self.vectors = np.asarray(vectors, dtype=np.float32)
+        self.rows = {term.lower(): i for i, term in enumerate(terms)}
+
+    def __len__(self):
+        return len(self.terms)
+
+    def nearest(self, term, k):
+        row = self.rows.get(term.lower())
+        if row is None or len(self.terms) < 2:
+            return []
+        similarity = self.vectors @ self.vectors[row]
+        similarity[row] = -np.inf
+        k = min(k, len(self.terms) - 1)
+        top = np.argpartition(-similarity, k - 1)[:k]
+        return top[np.argsort(-similarity[top])].tolist()
+
+def build_term_index(passages):
+    terms = extract_terms(passages)
+    if not terms:
+        return TermIndex([], np.zeros((0, 0), dtype=np.float32))
+    return TermIndex(terms, embed_batch(terms))
+
+def store_term_index(passages):
+    # Built once at ingest; float16 halves the footprint and is plenty for ranking
+    with span("term_index", input_size=len(passages)):
+        index = build_term_index(passages)
+    if not len(index):
+        return None
+    return {
+        "count": len(index),
+        "terms": blob_store.put_text(json.dumps(index.terms), kind="json"),
+        "vectors": blob_store.put_array(index.vectors.astype(np.float16))
+    }
+
+def load_term_index(handle):
+    def load():
+        terms = json.loads(blob_store.read_text(handle["terms"]["hash"]))
+        return TermIndex(terms, blob_store.get_array(handle["vectors"]["hash"]))
+    return _cached(("term_index", handle["vectors"]["hash"]), load)
+
+# ---------------------------
+# Distractors
+# ---------------------------
+def pick_distractors(answer, term_index, context, k=OPTIONS_PER_QUESTION - 1):
+    context_lower = context.lower()
+    answer_lower = answer.lower()
+    answer_words = len(answer.split())
+    distractors = []
+
+    # Nearest terms by cosine similarity: plausible but wrong
+    for i in term_index.nearest(answer, k * 8):
+        candidate = term_index.terms[i]
+        lowered = candidate.lower()
+        if lowered in answer_lower or answer_lower in lowered:
+            continue
+        # Options of wildly different length give the answer away
+        if abs(len(candidate.split()) - answer_words) > 1:
+            continue
+        if lowered in context_lower:
+            continue
+        if any(lowered in d.lower() or d.lower() in lowered for d in distractors):
+            continue
+        distractors.append(candidate)
+        if len(distractors) == k:
+            break
+    return distractors
+
+# ---------------------------
+# Question generation
+# ---------------------------
+def _blank(sentence, term):
+    pattern = re.compile(rf"(?<![\w-]){re.escape(term)}(?![\w-])", re.IGNORECASE)
+    if not pattern.search(sentence):
+        return None
+    return pattern.sub("_____", sentence, count=1)
+
+def build_questions(passages, passage_vectors, term_index, n_questions=QUESTIONS_PER_QUIZ, seed=0):
+    rng = random.Random(seed)
+    terms = term_index.terms
+    if not terms:
         return []
 
-    sentences = summary_text.split(".")
-    questions = []
+    # Spread questions over representative, non-redundant passages
+    order = list(range(len(passages)))
+    if passage_vectors is not None and len(passage_vectors):
+        order = mmr_select(np.asarray(passage_vectors), min(len(passages), n_questions * 3))
+    rng.shuffle(order)
+
+    rank = term_index.rows
+    questions, used = [], set()
+    for p in order:
+        for sentence in split_sentences(passages[p]):
+            if len(sentence) > MAX_STEM_CHARS:
+                continue
+            lowered = sentence.lower()
+            present = [t for t in terms if t.lower() not in used and t.lower() in lowered]
+            # A substring hit may not be a whole-word match ("ion" in
+            # "function"); fall back to the next-ranked term that is
+            answer = stem = None
+            for term in sorted(present, key=lambda t: rank[t.lower()]):
+                stem = _blank(sentence, term)
+                if stem:
+                    answer = term
+                    break
+            if not stem:
+                continue
 
-    for sentence in sentences[:5]:
-        sentence = sentence.strip()
-        if len(sentence) > 20:
-            questions.append({
-                "question": f"What does this mean?\n{sentence}",
-                "answer": sentence
-            })
+            distractors = pick_distractors(answer, term_index, sentence)
+            if len(distractors) == OPTIONS_PER_QUESTION - 1:
+                options = distractors + [answer]
+                rng.shuffle(options)
+                questions.append({
+                    "type": "multiple_choice",
+                    "question": f"Choose the term that completes the sentence:\n{stem}",
+                    "options": options,
+                    "answer": answer,
+                    "passage": int(p)
+                })
+            else:
+                questions.append({
+                    "type": "cloze",
+                    "question": f"Fill in the blank:\n{stem}",
+                    "options": [],
+                    "answer": answer,
+                    "passage": int(p)
+                })
+            used.add(answer.lower())
+            break
+
+        if len(questions) == n_questions:
+            break
 
     return questions
+
+def generate_quiz(doc_hash, text, passage_offsets, passage_vectors=None,
+                  n_questions=QUESTIONS_PER_QUIZ, seed=0, term_index=None):
+    if not text or passage_offsets is None or not len(passage_offsets):
+        return []
+
+    passages = [text[s:e] for s, e in passage_offsets]
+
+    # Prefer the index precomputed at ingest; building one embeds every term
+    with span("quiz_terms", input_size=len(passages)):
+        if term_index is not None:
+            term_index = load_term_index(term_index)
+        else:
+            term_index = _cached(("terms", doc_hash), lambda: build_term_index(passages))
+
+    with span("quiz_generate", input_size=len(passages)):
+        return _cached(
+            ("quiz", doc_hash, n_questions, seed),
+            lambda: build_questions(passages, passage_vectors, term_index, n_questions, seed)
+        )
@@ -1,37 +1,234 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+from functools import lru_cache
+from pathlib import Path
+
 import chromadb
-from chromadb.config import Settings
+import numpy as np
 from sentence_transformers import SentenceTransformer
 
+from backend.database import blob_store
+from backend.tracing import span
+
 embedding_model = SentenceTransformer("all-MiniLM-L6-v2")
 
-chroma_client = chromadb.Client(
-    Settings(persist_directory="vector_store")
-)
+# On disk, so indexed documents survive restarts alongside the blob store
+VECTOR_STORE_DIR = os.getenv("VECTOR_STORE_DIR", "vector_store")
+chroma_client = chromadb.PersistentClient(path=VECTOR_STORE_DIR)
 
-collection = chroma_client.get_or_create_collection(
-    name="research_docs",
-    metadata={"hnsw:space": "cosine"}
-)
+DEFAULT_TENANT = "anonymous"
+# Passages one tenant may keep indexed; 0 disables the quota
+TENANT_MAX_PASSAGES = int(os.getenv("TENANT_MAX_PASSAGES", "200000"))
 
-def embed(text: str):
-    return embedding_model.encode(text).tolist()
-
-def store_document_in_vector_db(text: str, filename: str):
-    vector = embed(text)
-    collection.add(
-        documents=[text],
-        embeddings=[vector],
-        ids=[filename]
-    )
+PASSAGE_CHARS = 500
+CHROMA_ADD_BATCH = 1000
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+|\n{2,}")
 
-def query_vector_db(question: str):
-    question_embedding = embed(question)
-    results = collection.query(
-        query_embeddings=[question_embedding],
-        n_results=1
+class QuotaExceeded(Exception):
+    pass
+
+# ---------------------------
+# Tenants
+# ---------------------------
+# Each user or workspace gets its own collection (and HNSW index), so
+# searches only touch that tenant's vectors and never see anyone else's
+@lru_cache(maxsize=1024)
+def get_collection(tenant: str = DEFAULT_TENANT):
+    # Hashed names satisfy Chroma's naming rules for any tenant id
+    digest = hashlib.sha256(tenant.encode("utf-8")).hexdigest()[:24]
+    return chroma_client.get_or_create_collection(
+        name=f"research_docs_{digest}",
+        metadata={"hnsw:space": "cosine", "tenant": tenant}
     )
 
-    if not results["documents"]:
-        return ""
+# Bumped on every write so caches derived from a collection can tell
+# when their entries are stale. Kept on disk next to the vectors so every
+# worker process sees a write made by any other.
+COLLECTION_VERSION_DB = Path(os.getenv("COLLECTION_VERSION_DB", Path(VECTOR_STORE_DIR) / "versions.db"))
+
+class CollectionVersions:
+    def __init__(self, path=COLLECTION_VERSION_DB):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=10)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS versions (tenant TEXT PRIMARY KEY, version INTEGER NOT NULL)"
+            )
+
+    def get(self, tenant):
+        with self._lock:
+            row = self._conn.execute("SELECT version FROM versions WHERE tenant = ?", (tenant,)).fetchone()
+        return row[0] if row else 0
+
+    def bump(self, tenant):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO versions (tenant, version) VALUES (?, 1) "
+                "ON CONFLICT (tenant) DO UPDATE SET version = version + 1",
+                (tenant,)
+            )
+
+_versions = None
+_versions_lock = threading.Lock()
+
+def collection_versions():
+    global _versions
+    with _versions_lock:
+        if _versions is None:
+            _versions = CollectionVersions()
+        return _versions
+
+def collection_version(tenant: str = DEFAULT_TENANT):
+    return collection_versions().get(tenant)
+
+def _bump_version(tenant: str):
+    collection_versions().bump(tenant)
+
+def is_indexed(doc_id: str, tenant: str = DEFAULT_TENANT):
+    return bool(get_collection(tenant).get(ids=[f"{doc_id}:0"], include=[])["ids"])
+
+def tenant_usage(tenant: str = DEFAULT_TENANT):
+    return {"tenant": tenant, "passages": get_collection(tenant).count(), "quota": TENANT_MAX_PASSAGES}
+
+def embed(text: str):
+    with span("embed", input_size=len(text), batch_size=1):
+        return embedding_model.encode(text).tolist()
+
+def embed_batch(texts, batch_size=64):
+    # Unit-normalised float32 rows, so cosine similarity is a dot product
+    with span("embed", input_size=sum(map(len, texts)), batch_size=len(texts)):
+        return embedding_model.encode(
+            texts,
+            batch_size=batch_size,
+            normalize_embeddings=True,
+            convert_to_numpy=True
+        ).astype("float32")
+
+# ---------------------------
+# Passage index
+# ---------------------------
+def chunk_passages(text: str, target_chars: int = PASSAGE_CHARS):
+    # Pack whole sentences into ~target_chars passages; returns (start, end) offsets
+    sentences = []
+    pos = 0
+    for match in SENTENCE_END.finditer(text):
+        sentences.append((pos, match.start()))
+        pos = match.end()
+    sentences.append((pos, len(text)))
+
+    offsets = []
+    start = end = None
+    for s, e in sentences:
+        if not text[s:e].strip():
+            continue
+        # Cut run-on "sentences" (tables, OCR noise) instead of growing forever
+        while e - s > 2 * target_chars:
+            if start is not None:
+                offsets.append((start, end))
+                start = None
+            offsets.append((s, s + target_chars))
+            s += target_chars
+        if start is None:
+            start, end = s, e
+        elif e - start > target_chars:
+            offsets.append((start, end))
+            start, end = s, e
+        else:
+            end = e
+    if start is not None:
+        offsets.append((start, end))
+    return offsets
+
+def passage_pages(offsets, page_starts):
+    # 1-based first/last page of each (start, end) span
+    bounds = np.asarray(offsets, dtype=np.int64)
+    first = np.searchsorted(page_starts, bounds[:, 0], side="right")
+    last = np.searchsorted(page_starts, bounds[:, 1] - 1, side="right")
+    return first.tolist(), last.tolist()
+
+def index_document(doc_id: str, text: str, filename: str = "", page_starts=None,
+                   tenant: str = DEFAULT_TENANT):
+    offsets = chunk_passages(text)
+    if not offsets:
+        return None
+
+    collection = get_collection(tenant)
+    # Checked before embedding so an over-quota upload costs nothing;
+    # re-indexing a document only overwrites its own passages
+    if TENANT_MAX_PASSAGES and collection.count() + len(offsets) > TENANT_MAX_PASSAGES:
+        if not is_indexed(doc_id, tenant):
+            raise QuotaExceeded(f"Tenant {tenant!r} would exceed {TENANT_MAX_PASSAGES} passages")
+
+    passages = [text[s:e] for s, e in offsets]
+    vectors = embed_batch(passages)
+
+    # Provenance lives in the Chroma metadata, so a hit resolves to its file,
+    # page range and character span without rescanning any text
+    metadatas = [
+        {"doc_id": doc_id, "filename": filename, "chunk": i, "start": s, "end": e}
+        for i, (s, e) in enumerate(offsets)
+    ]
+    if page_starts is not None:
+        for metadata, first, last in zip(metadatas, *passage_pages(offsets, page_starts)):
+            metadata["page_first"], metadata["page_last"] = first, last
+
+    with span("chroma_add", input_size=len(text), batch_size=len(passages)):
+        for pos in range(0, len(passages), CHROMA_ADD_BATCH):
+            batch = range(pos, min(pos + CHROMA_ADD_BATCH, len(passages)))
+            collection.upsert(
+                ids=[f"{doc_id}:{i}" for i in batch],
+                documents=[passages[i] for i in batch],
+                embeddings=vectors[pos:batch.stop].tolist(),
+                metadatas=[metadatas[i] for i in batch]
+            )
+    _bump_version(tenant)
+
+    # Keep the vectors alongside the text so summaries and quizzes can reuse
+    # them without another embedding pass or a Chroma round trip
+    return {
+        "passages": len(passages),
+        "embeddings": blob_store.put_array(vectors),
+        "offsets": blob_store.put_array(np.asarray(offsets, dtype=np.int64))
+    }
+
+def load_passage_index(index):
+    vectors = blob_store.get_array(index["embeddings"]["hash"])
+    offsets = blob_store.get_array(index["offsets"]["hash"])
+    return vectors, offsets
+
+def store_document_in_vector_db(text: str, filename: str, doc_id: str = None, page_starts=None,
+                                tenant: str = DEFAULT_TENANT):
+    return index_document(doc_id or filename, text, filename, page_starts, tenant)
+
+def query_passages(question: str, n_results: int = 3, tenant: str = DEFAULT_TENANT,
+                   embedding=None):
+    collection = get_collection(tenant)
+    if not collection.count():
+        return []
+
+    question_embedding = embed(question) if embedding is None else list(map(float, embedding))
+    with span("chroma_query"):
+        results = collection.query(
+            query_embeddings=[question_embedding],
+            n_results=n_results,
+            include=["documents", "metadatas", "distances"]
+        )
+
+    if not results["documents"] or not results["documents"][0]:
+        return []
+
+    return [
+        {"text": text, "score": 1 - distance, **metadata}
+        for text, metadata, distance in zip(
+            results["documents"][0], results["metadatas"][0], results["distances"][0]
+        )
+    ]
 
-    return results["documents"][0][0]
+def query_vector_db(question: str, n_results: int = 3, tenant: str = DEFAULT_TENANT):
+    return "\n".join(p["text"] for p in query_passages(question, n_results, tenant))
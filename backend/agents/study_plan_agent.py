@@ -0,0 +1,179 @@
+import json
+import re
+
+import numpy as np
+
+from backend.agents.quiz_agent import WORD, load_term_index
+from backend.database import blob_store
+from backend.tracing import span
+
+READING_WPM = 230
+# Difficulty scales reading time by concept density relative to the
+# document's median section, within these bounds
+DIFFICULTY_WEIGHT = 0.5
+MIN_DIFFICULTY = 0.75
+MAX_DIFFICULTY = 1.5
+# Section intros shorter than this are folded into their first subsection
+MIN_UNIT_WORDS = 50
+MAX_DAYS = 365
+# Sections are split into pieces of at most this fraction of a day, which
+# bounds how far the partition can miss an even split
+MAX_PIECE_OF_DAY = 0.5
+KEY_TERMS_PER_DAY = 5
+
+# ---------------------------
+# Section statistics (ingest)
+# ---------------------------
+def section_units(tree):
+    # Leaves of the mindmap in reading order, plus the intro text a parent
+    # has before its first child, so the units tile the whole document
+    units = []
+
+    def walk(node, path):
+        children = node.get("children", [])
+        title = " › ".join(path + [node["title"]]) if node["level"] else node["title"]
+        if not children:
+            units.append((node["id"], title, node["start"], node["end"], node.get("key_phrases", [])))
+            return
+        if children[0]["start"] > node["start"]:
+            units.append((node["id"], title, node["start"], children[0]["start"], node.get("key_phrases", [])))
+        for child in children:
+            walk(child, path + [node["title"]] if node["level"] else path)
+
+    walk(tree, [])
+    return units
+
+def build_study_stats(text, tree, term_index=None):
+    # Words and distinct key terms per unit; terms come from the document's
+    # term index and are matched in one pass over the text
+    if not text or not tree:
+        return None
+
+    with span("study_stats", input_size=len(text)):
+        units = section_units(tree)
+        starts = np.array([u[2] for u in units], dtype=np.int64)
+
+        word_positions = np.fromiter((m.start() for m in WORD.finditer(text)), dtype=np.int64)
+        words = np.bincount(
+            np.searchsorted(starts, word_positions, side="right") - 1, minlength=len(units)
+        )
+
+        concepts = np.zeros(len(units), dtype=np.int64)
+        terms = load_term_index(term_index).terms if term_index else []
+        if terms:
+            pattern = re.compile(
+                r"(?<![\w-])(?:" + "|".join(map(re.escape, sorted(terms, key=len, reverse=True))) + r")(?![\w-])",
+                re.IGNORECASE
+            )
+            seen = set()
+            for match in pattern.finditer(text):
+                unit = int(np.searchsorted(starts, match.start(), side="right")) - 1
+                key = (unit, match.group(0).lower())
+                if key not in seen:
+                    seen.add(key)
+                    concepts[unit] += 1
+
+        # Short intros would make a day of a few lines; fold them forward
+        keep = {i for i in range(len(units)) if words[i] >= MIN_UNIT_WORDS or i == len(units) - 1}
+        merged = []
+        carry_words = carry_concepts = 0
+        carry_start = None
+        for i in range(len(units)):
+            carry_words += int(words[i])
+            carry_concepts += int(concepts[i])
+            carry_start = units[i][2] if carry_start is None else carry_start
+            if i in keep:
+                node_id, title, _, end, phrases = units[i]
+                merged.append({
+                    "id": node_id, "title": title, "start": carry_start, "end": end,
+                    "words": carry_words, "concepts": carry_concepts, "key_phrases": phrases
+                })
+                carry_words = carry_concepts = 0
+                carry_start = None
+
+        density = np.array([s["concepts"] / max(s["words"], 1) * 1000 for s in merged])
+        median = float(np.median(density)) if len(density) else 0.0
+        for section, d in zip(merged, density):
+            ratio = d / median if median > 0 else 1.0
+            difficulty = float(np.clip(1 + DIFFICULTY_WEIGHT * (ratio - 1), MIN_DIFFICULTY, MAX_DIFFICULTY))
+            section["difficulty"] = round(difficulty, 3)
+            section["minutes"] = round(section["words"] / READING_WPM * difficulty, 2)
+    return merged
+
+def store_study_stats(stats):
+    if not stats:
+        return None
+    return {
+        "sections": len(stats),
+        "minutes": round(sum(s["minutes"] for s in stats), 1),
+        "stats": blob_store.put_text(json.dumps(stats), kind="json")
+    }
+
+def index_study_stats(text, tree, term_index=None):
+    # Computed once at ingest so planning never touches the text
+    return store_study_stats(build_study_stats(text, tree, term_index))
+
+def load_study_stats(handle):
+    return json.loads(blob_store.read_text(handle["stats"]["hash"]))
+
+# ---------------------------
+# Planning
+# ---------------------------
+def split_long_sections(stats, target):
+    # Sections longer than target are split into equal character ranges so
+    # one huge chapter cannot unbalance the plan
+    units = []
+    for section in stats:
+        parts = max(1, int(np.ceil(section["minutes"] / target - 1e-9))) if target > 0 else 1
+        bounds = np.linspace(section["start"], section["end"], parts + 1).astype(int)
+        for p in range(parts):
+            units.append({
+                **section,
+                "start": int(bounds[p]),
+                "end": int(bounds[p + 1]),
+                "minutes": section["minutes"] / parts,
+                "part": [p + 1, parts] if parts > 1 else None
+            })
+    return units
+
+def partition(minutes, days):
+    # Contiguous split of the units into `days` groups: cut at the unit
+    # boundary nearest each ideal cut i * total / days on the prefix sums.
+    # O(n + days log n); each day is off the ideal by at most one unit.
+    prefix = np.concatenate([[0.0], np.cumsum(minutes)])
+    total = prefix[-1]
+    cuts = [0]
+    for i in range(1, days):
+        ideal = total * i / days
+        right = max(1, min(int(np.searchsorted(prefix, ideal)), len(minutes)))
+        cut = right if prefix[right] - ideal <= ideal - prefix[right - 1] else right - 1
+        # Keep every day non-empty while units last
+        cut = min(max(cut, cuts[-1] + 1), len(minutes) - (days - i))
+        cuts.append(cut)
+    cuts.append(len(minutes))
+    return cuts
+
+def plan_study(stats, days):
+    days = max(1, min(days, MAX_DAYS))
+    total = sum(s["minutes"] for s in stats)
+    units = split_long_sections(stats, total / days * MAX_PIECE_OF_DAY)
+    days = min(days, len(units))
+    cuts = partition(np.array([u["minutes"] for u in units]), days)
+
+    plan = []
+    for day in range(days):
+        chunk = units[cuts[day]:cuts[day + 1]]
+        minutes = sum(u["minutes"] for u in chunk)
+        phrases = list(dict.fromkeys(p for u in chunk for p in u["key_phrases"]))[:KEY_TERMS_PER_DAY]
+        plan.append({
+            "day": day + 1,
+            "minutes": round(minutes, 1),
+            "difficulty": round(sum(u["difficulty"] * u["minutes"] for u in chunk) / max(minutes, 1e-9), 2),
+            "key_phrases": phrases,
+            "sections": [
+                {key: u[key] for key in ("id", "title", "start", "end", "part")}
+                | {"minutes": round(u["minutes"], 1)}
+                for u in chunk
+            ]
+        })
+    return {"days": plan, "total_minutes": round(total, 1)}
@@ -1,21 +1,239 @@
+import asyncio
+import os
+import re
+import threading
+import time
+from concurrent.futures import Future, InvalidStateError
+
+import numpy as np
 from transformers import pipeline
 
+from backend import profiling
+from backend.agents.rag_agent import embed_batch
+from backend.tracing import span, counter
+
 summarizer = pipeline(
     "summarization",
     model="facebook/bart-large-cnn"
 )
 
-def summarize_text(topic, context_text):
+MAX_INPUT_CHARS = 3000
+SUMMARY_KWARGS = {"max_length": 150, "min_length": 60, "do_sample": False}
+
+# ---------------------------
+# Dynamic batching
+# ---------------------------
+# Concurrent requests are grouped by input length so one padded batch does
+# not make short inputs pay for the longest one.
+MAX_BATCH_SIZE = int(os.getenv("SUMMARY_MAX_BATCH", "8"))
+MAX_WAIT_SECONDS = float(os.getenv("SUMMARY_MAX_WAIT_MS", "25")) / 1000
+LENGTH_BUCKETS = (1000, 2000, MAX_INPUT_CHARS)
+
+class SummaryBatcher:
+    def __init__(self, max_batch_size=MAX_BATCH_SIZE, max_wait=MAX_WAIT_SECONDS):
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._pending = {bucket: [] for bucket in LENGTH_BUCKETS}
+        self._cond = threading.Condition()
+        self._worker = None
+
+    def submit(self, text):
+        future = Future()
+        bucket = next(b for b in LENGTH_BUCKETS if len(text) <= b)
+        with self._cond:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="summary-batcher", daemon=True)
+                self._worker.start()
+            job = (time.perf_counter(), text, future, profiling.current_profile())
+            self._pending[bucket].append(job)
+            self._cond.notify()
+        return future
+
+    def queue_depth(self):
+        with self._cond:
+            return sum(len(jobs) for jobs in self._pending.values())
+
+    def _next_batch(self):
+        with self._cond:
+            while True:
+                waiting = [b for b, jobs in self._pending.items() if jobs]
+                if not waiting:
+                    self._cond.wait()
+                    continue
+
+                # Serve the bucket holding the oldest job first
+                bucket = min(waiting, key=lambda b: self._pending[b][0][0])
+                jobs = self._pending[bucket]
+                remaining = jobs[0][0] + self.max_wait - time.perf_counter()
+                if len(jobs) >= self.max_batch_size or remaining <= 0:
+                    batch = jobs[:self.max_batch_size]
+                    del jobs[:self.max_batch_size]
+                    return batch
+                self._cond.wait(remaining)
+
+    def _run(self):
+        while True:
+            # Callers that gave up (client disconnect, cancelled await) are
+            # dropped here; the rest can no longer be cancelled
+            batch = [job for job in self._next_batch() if job[2].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            texts = [job[1] for job in batch]
+            profiles = {job[3] for job in batch}
+            try:
+                with profiling.attached(profiles), \
+                        span("summarize_batch", input_size=sum(map(len, texts)), batch_size=len(texts)):
+                    outputs = summarizer(texts, batch_size=len(texts), truncation=True, **SUMMARY_KWARGS)
+            except Exception as e:
+                for job in batch:
+                    _complete(job[2], exception=e)
+                continue
+
+            for (_, _, future, _), output in zip(batch, outputs):
+                _complete(future, result=(output["summary_text"], len(batch)))
+
+def _complete(future, result=None, exception=None):
+    # A failed hand-off must never kill the single worker thread
+    try:
+        if exception is not None:
+            future.set_exception(exception)
+        else:
+            future.set_result(result)
+    except InvalidStateError:
+        pass
+
+batcher = SummaryBatcher()
+
+def _prepare(context_text):
     if not context_text or len(context_text.strip()) == 0:
+        return None
+    return context_text[:MAX_INPUT_CHARS]
+
+def summarize_text(topic, context_text):
+    context_text = _prepare(context_text)
+    if context_text is None:
+        return "No content found to summarize."
+
+    with span("summarize", input_size=len(context_text), profile=False) as record:
+        summary, record["batch_size"] = batcher.submit(context_text).result()
+
+    return summary
+
+async def summarize_text_async(topic, context_text):
+    # Awaiting keeps the event loop free, so concurrent uploads reach the
+    # batcher together instead of running one after another
+    context_text = _prepare(context_text)
+    if context_text is None:
         return "No content found to summarize."
 
-    context_text = context_text[:3000]
+    with span("summarize", input_size=len(context_text), profile=False) as record:
+        future = batcher.submit(context_text)
+        summary, record["batch_size"] = await asyncio.wrap_future(future)
+
+    return summary
+
+# ---------------------------
+# Fast tier: extractive centroid summary
+# ---------------------------
+EXTRACTIVE_SENTENCES = 6
+MAX_EXTRACTIVE_CANDIDATES = int(os.getenv("SUMMARY_MAX_CANDIDATES", "400"))
+SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+|\n{2,}")
+
+def split_sentences(text):
+    sentences = (" ".join(s.split()) for s in SENTENCE_SPLIT.split(text))
+    return [s for s in sentences if 40 <= len(s) <= 400]
+
+def mmr_select(vectors, k, diversity=0.3):
+    # Maximal marginal relevance against the document centroid: each pick
+    # trades closeness to the centroid for distance from earlier picks
+    centroid = vectors.mean(axis=0)
+    centroid /= max(float(np.linalg.norm(centroid)), 1e-12)
+    relevance = vectors @ centroid
+
+    k = min(k, len(vectors))
+    selected = [int(np.argmax(relevance))]
+    max_similarity = vectors @ vectors[selected[0]]
+    while len(selected) < k:
+        scores = (1 - diversity) * relevance - diversity * max_similarity
+        scores[selected] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        np.maximum(max_similarity, vectors @ vectors[best], out=max_similarity)
+    return sorted(selected)
+
+def extractive_summary(text, max_sentences=EXTRACTIVE_SENTENCES):
+    sentences = split_sentences(text)
+    if not sentences:
+        return text[:600].strip()
+
+    # Sample evenly across the document so long books stay cheap to embed
+    if len(sentences) > MAX_EXTRACTIVE_CANDIDATES:
+        picks = np.linspace(0, len(sentences) - 1, MAX_EXTRACTIVE_CANDIDATES).astype(int)
+        sentences = [sentences[i] for i in picks]
+
+    vectors = embed_batch(sentences)
+    return " ".join(sentences[i] for i in mmr_select(vectors, max_sentences))
+
+def lead_sentence(passage):
+    for sentence in split_sentences(passage):
+        return sentence
+    return " ".join(passage.split())[:300]
+
+def passage_summary(text, vectors, offsets, max_sentences=EXTRACTIVE_SENTENCES):
+    # Reuses the passage vectors computed for RAG at ingest, so this covers
+    # the whole document for the cost of a few matrix-vector products
+    chosen = mmr_select(np.asarray(vectors), max_sentences)
+    return " ".join(lead_sentence(text[offsets[i][0]:offsets[i][1]]) for i in chosen)
+
+# ---------------------------
+# Tier selection
+# ---------------------------
+TIERS = ("fast", "quality")
+# Beyond this BART would only see a small prefix of the document
+LONG_DOCUMENT_CHARS = int(os.getenv("SUMMARY_LONG_DOC_CHARS", "20000"))
+# Queue depth at which "auto" requests fall back to the fast tier
+FAST_TIER_QUEUE_DEPTH = int(os.getenv("SUMMARY_FAST_QUEUE_DEPTH", str(2 * MAX_BATCH_SIZE)))
+# Queue depth at which even explicit "quality" requests are shed
+SHED_QUEUE_DEPTH = int(os.getenv("SUMMARY_SHED_QUEUE_DEPTH", str(8 * MAX_BATCH_SIZE)))
+
+TIER_DECISIONS = counter(
+    "airc_summary_tier_total",
+    "Summaries produced per tier and selection reason",
+    ["tier", "reason"]
+)
+
+def choose_tier(text_length, hint=None):
+    depth = batcher.queue_depth()
+
+    if hint == "fast":
+        return "fast", "hint"
+    if hint == "quality":
+        if depth >= SHED_QUEUE_DEPTH:
+            return "fast", "overload"
+        return "quality", "hint"
+
+    if depth >= FAST_TIER_QUEUE_DEPTH:
+        return "fast", "queue_depth"
+    if text_length > LONG_DOCUMENT_CHARS:
+        return "fast", "length"
+    return "quality", "default"
+
+async def summarize_tiered(topic, context_text, hint=None, passages=None):
+    if not context_text or len(context_text.strip()) == 0:
+        return "No content found to summarize.", None
+
+    tier, reason = choose_tier(len(context_text), hint)
+    TIER_DECISIONS.inc(tier=tier, reason=reason)
+
+    if tier == "fast":
+        if passages is not None and len(passages[0]):
+            vectors, offsets = passages
+            with span("summarize_passages", input_size=len(offsets)):
+                summary = passage_summary(context_text, vectors, offsets)
+            return summary, tier
 
-    summary = summarizer(
-        context_text,
-        max_length=150,
-        min_length=60,
-        do_sample=False
-    )
+        with span("summarize_fast", input_size=len(context_text)):
+            summary = await asyncio.to_thread(extractive_summary, context_text)
+        return summary, tier
 
-    return summary[0]["summary_text"]
+    return await summarize_text_async(topic, context_text), tier
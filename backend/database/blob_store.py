@@ -0,0 +1,201 @@
+import hashlib
+import json
+import mmap
+import os
+import re
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import zstandard as zstd
+
+BLOB_DIR = Path(os.getenv("BLOB_DIR", Path("storage") / "blobs"))
+
+# Blobs are compressed in independent chunks so a byte range only
+# decompresses the chunks it overlaps instead of the whole blob.
+CHUNK_SIZE = 1024 * 1024
+COMPRESSION_LEVEL = 3
+
+_compressor = zstd.ZstdCompressor(level=COMPRESSION_LEVEL)
+_decompressor = zstd.ZstdDecompressor()
+DIGEST = re.compile(r"[0-9a-f]{64}")
+
+def is_digest(digest: str):
+    return isinstance(digest, str) and DIGEST.fullmatch(digest) is not None
+
+def _paths(digest: str):
+    # Digests also arrive from URLs; anything but sha256 hex could escape BLOB_DIR
+    if not is_digest(digest):
+        raise KeyError(digest)
+    folder = BLOB_DIR / digest[:2]
+    return folder / f"{digest}.blob", folder / f"{digest}.json"
+
+def _handle(digest: str, index: dict):
+    return {
+        "hash": digest,
+        "kind": index["kind"],
+        "size": index["size"],
+        "stored_size": index["stored_size"]
+    }
+
+def exists(digest: str):
+    return is_digest(digest) and _paths(digest)[1].exists()
+
+def stat(digest: str):
+    if not is_digest(digest):
+        return None
+    index_path = _paths(digest)[1]
+    if not index_path.exists():
+        return None
+    index = json.loads(index_path.read_text())
+    return _handle(digest, index)
+
+def _load_index(digest: str):
+    index_path = _paths(digest)[1]
+    if not index_path.exists():
+        raise KeyError(digest)
+    return json.loads(index_path.read_text())
+
+# ---------------------------
+# Writes
+# ---------------------------
+def _atomic_write(path: Path, write):
+    # Unique temp file in the target folder, then rename over the target, so
+    # concurrent writers of the same blob never share a partial file
+    tmp = tempfile.NamedTemporaryFile(dir=path.parent, prefix=path.name, suffix=".tmp", delete=False)
+    try:
+        with tmp:
+            write(tmp)
+        os.replace(tmp.name, path)
+    except BaseException:
+        os.unlink(tmp.name)
+        raise
+
+def put_bytes(data: bytes, kind: str = "bytes", compress: bool = True, meta: dict = None):
+    digest = hashlib.sha256(data).hexdigest()
+    data_path, index_path = _paths(digest)
+
+    if index_path.exists():
+        return _handle(digest, json.loads(index_path.read_text()))
+
+    data_path.parent.mkdir(parents=True, exist_ok=True)
+
+    offsets = [0]
+
+    def write_data(out):
+        if compress:
+            for pos in range(0, len(data), CHUNK_SIZE):
+                frame = _compressor.compress(data[pos:pos + CHUNK_SIZE])
+                out.write(frame)
+                offsets.append(offsets[-1] + len(frame))
+        else:
+            out.write(data)
+            offsets.append(len(data))
+
+    _atomic_write(data_path, write_data)
+
+    index = {
+        "kind": kind,
+        "size": len(data),
+        "stored_size": offsets[-1],
+        "compressed": compress,
+        "chunk_size": CHUNK_SIZE,
+        "offsets": offsets,
+        "meta": meta or {}
+    }
+    # The index is written last, so a blob only "exists" once it is complete
+    _atomic_write(index_path, lambda out: out.write(json.dumps(index).encode("utf-8")))
+
+    return _handle(digest, index)
+
+def put_text(text: str, kind: str = "text"):
+    return put_bytes(text.encode("utf-8"), kind=kind)
+
+def put_image(image_bytes: bytes, fmt: str = "png"):
+    # Image formats are already compressed, zstd would only cost CPU
+    return put_bytes(image_bytes, kind="image", compress=False, meta={"format": fmt})
+
+def put_array(array):
+    array = np.ascontiguousarray(array)
+    meta = {"dtype": array.dtype.str, "shape": list(array.shape)}
+    return put_bytes(array.tobytes(), kind="array", compress=False, meta=meta)
+
+# ---------------------------
+# Reads (memory-mapped)
+# ---------------------------
+def _open_map(digest: str):
+    data_path = _paths(digest)[0]
+    with open(data_path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return None
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+def read_range(digest: str, start: int = 0, end: int = None):
+    index = _load_index(digest)
+    size = index["size"]
+    end = size if end is None else min(end, size)
+    start = max(0, start)
+    if start >= end:
+        return b""
+
+    mapped = _open_map(digest)
+    try:
+        if not index["compressed"]:
+            return bytes(mapped[start:end])
+
+        chunk_size = index["chunk_size"]
+        offsets = index["offsets"]
+        first = start // chunk_size
+        last = (end - 1) // chunk_size
+
+        parts = [
+            _decompressor.decompress(mapped[offsets[i]:offsets[i + 1]])
+            for i in range(first, last + 1)
+        ]
+        joined = b"".join(parts)
+        base = first * chunk_size
+        return joined[start - base:end - base]
+    finally:
+        mapped.close()
+
+def read_bytes(digest: str):
+    return read_range(digest)
+
+def read_text(digest: str):
+    return read_bytes(digest).decode("utf-8")
+
+def _trim_utf8(data: bytes):
+    # Drop a trailing partial UTF-8 sequence so every range decodes cleanly
+    cut = len(data)
+    while cut > 0 and (data[cut - 1] & 0xC0) == 0x80:
+        cut -= 1
+    if cut == 0:
+        return data
+    lead = data[cut - 1]
+    if lead >= 0xC0:
+        expected = 2 if lead < 0xE0 else 3 if lead < 0xF0 else 4
+        if len(data) - (cut - 1) < expected:
+            return data[:cut - 1]
+    return data
+
+def read_text_range(digest: str, start: int = 0, length: int = 64 * 1024):
+    # A window must fit at least one full UTF-8 character to make progress
+    length = max(length, 4)
+    data = _trim_utf8(read_range(digest, start, start + length))
+    size = _load_index(digest)["size"]
+    next_start = start + len(data)
+    return {
+        "text": data.decode("utf-8", errors="replace"),
+        "start": start,
+        "next": next_start if next_start < size else None,
+        "size": size
+    }
+
+def get_array(digest: str):
+    index = _load_index(digest)
+    meta = index["meta"]
+    mapped = _open_map(digest)
+    if mapped is None:
+        return np.empty(meta["shape"], dtype=meta["dtype"])
+    # Zero-copy view; the mapping stays alive as long as the array does
+    return np.frombuffer(mapped, dtype=meta["dtype"]).reshape(meta["shape"])
@@ -1,11 +1,20 @@
+from functools import lru_cache
 from pymongo import MongoClient
 import os
 from dotenv import load_dotenv
 
 load_dotenv()
 
-def get_db():
+def is_db_configured():
+    return bool(os.getenv("MONGO_URL"))
+
+@lru_cache(maxsize=1)
+def get_client():
+    # MongoClient keeps its own connection pool, so share one per process
     mongo_url = os.getenv("MONGO_URL")
-    client = MongoClient(mongo_url)
+    return MongoClient(mongo_url)
+
+def get_db():
+    client = get_client()
     db = client["ai_research_db"]
     return db
@@ -1,5 +1,9 @@
+from datetime import datetime, timezone
+from pymongo import ASCENDING, DESCENDING
 from .db_connection import get_db
 
+_documents_indexed = False
+
 def save_report(topic, summary, quiz):
     db = get_db()
     reports = db["reports"]
@@ -10,3 +14,66 @@ def save_report(topic, summary, quiz):
     }
     reports.insert_one(report_data)
     print(f"✅ Report for '{topic}' saved successfully in MongoDB!")
+
+# ---------------------------
+# Processed documents
+# ---------------------------
+def get_documents_collection():
+    global _documents_indexed
+    documents = get_db()["documents"]
+
+    if not _documents_indexed:
+        # (hash, user_id) is the lookup key for every artifact fetch
+        documents.create_index(
+            [("hash", ASCENDING), ("user_id", ASCENDING)],
+            unique=True,
+            name="hash_user"
+        )
+        documents.create_index(
+            [("user_id", ASCENDING), ("created_at", DESCENDING)],
+            name="user_recent"
+        )
+        documents.create_index([("created_at", DESCENDING)], name="created_at")
+        _documents_indexed = True
+
+    return documents
+
+def save_document(doc_hash, user_id, filename, text_location,
+                  summary="", quiz=None, mindmap=None, timings=None, **artifacts):
+    # artifacts: extra derived indexes (passage_index, term_index, ...) by name
+    now = datetime.now(timezone.utc)
+    get_documents_collection().update_one(
+        {"hash": doc_hash, "user_id": user_id},
+        {
+            "$set": {
+                "filename": filename,
+                "text_location": text_location,
+                "summary": summary,
+                "quiz": quiz or [],
+                "mindmap": mindmap,
+                "timings": timings or {},
+                **artifacts,
+                "updated_at": now
+            },
+            "$setOnInsert": {"created_at": now}
+        },
+        upsert=True
+    )
+
+def find_document(doc_hash, user_id, fields=None):
+    projection = {"_id": 0}
+    if fields:
+        projection = {field: 1 for field in fields}
+        projection["_id"] = 0
+
+    return get_documents_collection().find_one(
+        {"hash": doc_hash, "user_id": user_id},
+        projection
+    )
+
+def list_user_documents(user_id, limit=20):
+    cursor = get_documents_collection().find(
+        {"user_id": user_id},
+        {"_id": 0, "hash": 1, "filename": 1, "created_at": 1}
+    ).sort("created_at", DESCENDING).limit(limit)
+    return list(cursor)
@@ -0,0 +1,110 @@
+import os
+
+import fitz  # PyMuPDF
+import numpy as np
+
+from backend.database import blob_store
+
+# Row kinds in the layout table
+TEXT_LINE = 0
+TABLE_ROW = 1
+
+# Table detection costs tens of milliseconds per page, so it only runs on
+# pages that contain vector drawings (ruled tables need them)
+DETECT_TABLES = os.getenv("PDF_DETECT_TABLES", "1") == "1"
+
+# Image payloads are not needed and would dominate the dict output
+DICT_FLAGS = fitz.TEXTFLAGS_DICT & ~fitz.TEXT_PRESERVE_IMAGES
+
+BOLD_FLAG = 16
+
+LAYOUT_COLUMNS = {
+    "page": np.int32,
+    "start": np.int64,
+    "end": np.int64,
+    "bbox": np.float32,
+    "size": np.float32,
+    "bold": np.bool_,
+    "kind": np.uint8
+}
+
+# ---------------------------
+# Structured extraction
+# ---------------------------
+def _find_tables(page):
+    if not DETECT_TABLES or not page.get_cdrawings():
+        return []
+    return list(page.find_tables().tables)
+
+def _inside(bbox, boxes):
+    x = (bbox[0] + bbox[2]) / 2
+    y = (bbox[1] + bbox[3]) / 2
+    return any(b[0] <= x <= b[2] and b[1] <= y <= b[3] for b in boxes)
+
+def extract_pdf(pdf_doc):
+    # One row per text line or table row, in columns: page, character span
+    # in the returned text, bbox, font size, bold and row kind. Blocks are
+    # separated by a blank line so passage chunking sees paragraph breaks.
+    parts, rows, page_starts = [], [], []
+    position = 0
+
+    def emit(line_text, page, bbox, size, bold, kind):
+        nonlocal position
+        parts.append(line_text + "\n")
+        rows.append((page, position, position + len(line_text), bbox, size, bold, kind))
+        position += len(line_text) + 1
+
+    def end_block():
+        nonlocal position
+        parts.append("\n")
+        position += 1
+
+    for number, page in enumerate(pdf_doc):
+        page_starts.append(position)
+        tables = _find_tables(page)
+        table_boxes = [tuple(t.bbox) for t in tables]
+
+        for block in page.get_text("dict", flags=DICT_FLAGS)["blocks"]:
+            emitted = False
+            for line in block.get("lines", []):
+                spans = line["spans"]
+                line_text = "".join(s["text"] for s in spans)
+                if not line_text.strip() or _inside(line["bbox"], table_boxes):
+                    continue
+                size = max(s["size"] for s in spans)
+                bold = any(s["flags"] & BOLD_FLAG for s in spans)
+                emit(line_text, number, line["bbox"], size, bold, TEXT_LINE)
+                emitted = True
+            if emitted:
+                end_block()
+
+        # Tables become one pipe-separated line per row
+        for table in tables:
+            for cells, row in zip(table.extract(), table.rows):
+                line_text = " | ".join(" ".join((c or "").split()) for c in cells)
+                if line_text.strip(" |"):
+                    emit(line_text, number, row.bbox, 0.0, False, TABLE_ROW)
+            end_block()
+
+    page_starts.append(position)
+
+    columns = {
+        name: np.asarray([r[i] for r in rows], dtype=dtype)
+        for i, (name, dtype) in enumerate(LAYOUT_COLUMNS.items())
+    }
+    columns["bbox"] = columns["bbox"].reshape(-1, 4)
+    columns["page_starts"] = np.asarray(page_starts, dtype=np.int64)
+    return "".join(parts), columns
+
+# ---------------------------
+# Storage
+# ---------------------------
+def store_layout(layout):
+    return {
+        "lines": int(len(layout["start"])),
+        "pages": int(len(layout["page_starts"]) - 1),
+        "columns": {name: blob_store.put_array(column) for name, column in layout.items()}
+    }
+
+def load_layout(handle):
+    return {name: blob_store.get_array(h["hash"]) for name, h in handle["columns"].items()}
@@ -1,19 +1,125 @@
 import io
-from fastapi import FastAPI, UploadFile, File, Form
+import asyncio
+import hashlib
+import time
+import uuid
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Request, Response
+from fastapi.responses import FileResponse
+from pydantic import BaseModel
 from PIL import Image
 import pytesseract
 import fitz  # PyMuPDF
 
 from transformers import pipeline
 
-from backend.agents.summarize_agent import summarize_text
-from backend.agents.quiz_agent import generate_quiz
-from backend.agents.rag_agent import store_document_in_vector_db, query_vector_db
+from backend.agents.summarize_agent import summarize_tiered
+from backend.agents.quiz_agent import generate_quiz, store_term_index
+from backend.agents.graph_agent import concept_graph
+from backend.agents.mindmap_agent import build_mindmap, summarize_sections
+from backend.agents.study_plan_agent import MAX_DAYS, index_study_stats, load_study_stats, plan_study
+from backend.agents.memory_agent import conversations, rewrite_query
+from backend.agents.rag_agent import (
+    store_document_in_vector_db, query_passages, index_document, load_passage_index, is_indexed,
+    embed_batch,
+    tenant_usage, collection_version, QuotaExceeded
+)
+from backend.agents.answer_cache import answer_cache
+from backend.agents.flashcard_agent import (
+    DEFAULT_DECK, MAX_PASSAGES_PER_RUN, generate_flashcards, review_scheduler
+)
+from backend import profiling
+from backend.extraction import extract_pdf, store_layout, load_layout
+from backend.database import blob_store
+from backend.database.db_connection import is_db_configured
+from backend.database.models import save_document, find_document, list_user_documents
+from backend.tracing import (
+    span, start_trace, end_trace, stage_timings, server_timing_header,
+    render_metrics, REQUEST_SECONDS
+)
 
 # Tesseract path (Windows)
 pytesseract.pytesseract.tesseract_cmd = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
 
 app = FastAPI()
+# Changes on every start, so clients can tell a restarted backend from a
+# running one and drop results they cached from the old process
+INSTANCE_ID = uuid.uuid4().hex
+
+# ---------------------------
+# Request timing
+# ---------------------------
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    spans, token = start_trace()
+    profile_mode = profiling.profile_mode_for(request)
+    if profile_mode:
+        profile, profile_token = profiling.begin(request.url.path, profile_mode)
+
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+    finally:
+        elapsed = time.perf_counter() - start
+        if profile_mode:
+            profiling.finish(profile, profile_token, spans, elapsed)
+        end_trace(token)
+        # Label by route template so /blobs/{digest} stays one series
+        route = request.scope.get("route")
+        endpoint = route.path if route else "unmatched"
+        REQUEST_SECONDS.observe(elapsed, method=request.method, endpoint=endpoint, status=status)
+
+    response.headers["X-Process-Time"] = f"{elapsed:.6f}"
+    if spans:
+        response.headers["Server-Timing"] = server_timing_header(spans)
+    if profile_mode:
+        response.headers["X-Profile-Id"] = profile.id
+    return response
+
+@app.get("/metrics")
+def metrics():
+    return Response(content=render_metrics(), media_type="text/plain; version=0.0.4")
+
+# ---------------------------
+# On-demand profiling (admin)
+# ---------------------------
+def require_admin(request: Request):
+    if not profiling.is_admin(request):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+@app.post("/admin/profile")
+def arm_profiler(request: Request, endpoint: str, count: int = 1, mode: str = "sample"):
+    require_admin(request)
+    if mode not in ("sample", "cprofile"):
+        raise HTTPException(status_code=400, detail="mode must be 'sample' or 'cprofile'")
+    profiling.arm(endpoint, count, mode)
+    return {"armed": profiling.armed_endpoints()}
+
+@app.delete("/admin/profile")
+def disarm_profiler(request: Request, endpoint: str):
+    require_admin(request)
+    profiling.disarm(endpoint)
+    return {"armed": profiling.armed_endpoints()}
+
+@app.get("/admin/profiles")
+def list_profiles(request: Request, limit: int = 50):
+    require_admin(request)
+    return {"profiles": profiling.list_profiles(limit), "armed": profiling.armed_endpoints()}
+
+@app.get("/admin/profiles/{profile_id}")
+def get_profile(request: Request, profile_id: str, download: str = ""):
+    require_admin(request)
+    # download=collapsed (flame graph folded stacks) or download=prof (pstats)
+    kind = download or "json"
+    if kind not in profiling.PROFILE_KINDS:
+        raise HTTPException(status_code=400, detail="download must be 'collapsed' or 'prof'")
+    path = profiling.profile_path(profile_id, kind)
+    if not path:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    if download:
+        return FileResponse(path, filename=path.name)
+    return Response(content=path.read_text(), media_type="application/json")
 
 # ---------------------------
 # Load local QA model (once)
@@ -25,87 +131,486 @@ qa_model = pipeline(
 
 @app.get("/")
 def home():
-    return {"message": "AI Research Companion (Offline Version) running 🚀"}
+    return {"message": "AI Research Companion (Offline Version) running 🚀", "instance": INSTANCE_ID}
+
+# ---------------------------
+# Document persistence helpers
+# ---------------------------
+def document_hash(data: bytes):
+    return hashlib.sha256(data).hexdigest()
+
+async def ingest_document(doc_hash: str, text: str, filename: str, tenant: str, page_starts=None):
+    # Builds the per-document indexes every later feature reads from.
+    # Embedding is CPU-bound, so it runs off the event loop.
+    try:
+        passage_index = await asyncio.to_thread(
+            index_document, doc_hash, text, filename, page_starts, tenant
+        )
+    except QuotaExceeded as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    if not passage_index:
+        return {}, None
+
+    vectors, offsets = load_passage_index(passage_index)
+    passages = [text[s:e] for s, e in offsets]
+    term_index = await asyncio.to_thread(store_term_index, passages)
+    await asyncio.to_thread(concept_graph(tenant).add_document, doc_hash, passages)
+
+    artifacts = {"passage_index": passage_index, "term_index": term_index}
+    return artifacts, (vectors, offsets)
+
+async def build_quiz(doc_hash: str, text: str, passages, term_index=None,
+                     n_questions: int = 10, seed: int = 0):
+    if passages is None:
+        return []
+    vectors, offsets = passages
+    return await asyncio.to_thread(
+        generate_quiz, doc_hash, text, offsets, vectors, n_questions, seed, term_index
+    )
+
+def load_processed_document(doc_hash: str, user_id: str):
+    if not is_db_configured():
+        return None
+    document = find_document(
+        doc_hash, user_id, ["summary", "quiz", "mindmap", "study_stats", "text_location", "layout"]
+    )
+    if document:
+        document["text_handle"] = document.pop("text_location", None)
+    return document
+
+async def restore_document_index(doc_hash: str, document: dict, filename: str, tenant: str):
+    # The processed record can outlive the vector store (new volume, restored
+    # Mongo); re-index from the stored text so chat still finds the document
+    layout = document.pop("layout", None)
+    text_handle = document.get("text_handle")
+    if not text_handle or await asyncio.to_thread(is_indexed, doc_hash, tenant):
+        return
+    text = blob_store.read_text(text_handle["hash"])
+    page_starts = load_layout(layout)["page_starts"] if layout else None
+    await ingest_document(doc_hash, text, filename, tenant, page_starts)
 
 # ---------------------------
 # Upload PDF + Summarize
 # ---------------------------
 @app.post("/upload_pdf")
-async def upload_pdf(file: UploadFile = File(...)):
+async def upload_pdf(file: UploadFile = File(...), user_id: str = Form("anonymous"),
+                     summary_mode: str = Form("auto")):
     pdf_bytes = await file.read()
-    pdf_doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+    doc_hash = document_hash(pdf_bytes)
+
+    cached = load_processed_document(doc_hash, user_id)
+    if cached:
+        await restore_document_index(doc_hash, cached, file.filename, user_id)
+        return {**cached, "filename": file.filename, "document_id": doc_hash, "cached": True}
+
+    with span("pdf_extract", input_size=len(pdf_bytes)) as record:
+        pdf_doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+        extracted_text, layout = extract_pdf(pdf_doc)
+        toc = pdf_doc.get_toc(simple=True)
+        record["pages"] = pdf_doc.page_count
+
+    with span("blob_store", input_size=len(extracted_text)):
+        text_handle = blob_store.put_text(extracted_text)
+        layout_handle = store_layout(layout)
 
-    extracted_text = ""
-    for page in pdf_doc:
-        extracted_text += page.get_text()
+    artifacts, passages = await ingest_document(
+        doc_hash, extracted_text, file.filename, user_id, layout["page_starts"]
+    )
+    artifacts["layout"] = layout_handle
+    summary, summary_tier = await summarize_tiered(
+        "PDF Content", extracted_text, summary_mode, passages
+    )
 
-    summary = summarize_text("PDF Content", extracted_text)
+    quiz = await build_quiz(doc_hash, extracted_text, passages, artifacts.get("term_index"))
+    mindmap = await asyncio.to_thread(build_mindmap, extracted_text, file.filename, toc, layout)
+    artifacts["study_stats"] = await asyncio.to_thread(
+        index_study_stats, extracted_text, mindmap, artifacts.get("term_index")
+    )
 
-    # Quiz disabled for stability
-    quiz = []
+    if is_db_configured():
+        save_document(doc_hash, user_id, file.filename, text_handle,
+                      summary=summary, quiz=quiz, mindmap=mindmap, timings=stage_timings(),
+                      **artifacts)
 
     return {
         "filename": file.filename,
+        "document_id": doc_hash,
+        "text_handle": text_handle,
         "summary": summary,
-        "quiz": quiz
+        "summary_tier": summary_tier,
+        "quiz": quiz,
+        "mindmap": mindmap,
+        "study_stats": artifacts.get("study_stats"),
+        "cached": False
     }
 
 # ---------------------------
 # Upload Image (OCR)
 # ---------------------------
 @app.post("/upload_image")
-async def upload_image(file: UploadFile = File(...)):
+async def upload_image(file: UploadFile = File(...), user_id: str = Form("anonymous"),
+                       summary_mode: str = Form("auto")):
     image_bytes = await file.read()
-    image = Image.open(io.BytesIO(image_bytes))
+    doc_hash = document_hash(image_bytes)
+
+    cached = load_processed_document(doc_hash, user_id)
+    if cached:
+        await restore_document_index(doc_hash, cached, file.filename, user_id)
+        return {**cached, "filename": file.filename, "document_id": doc_hash, "cached": True}
+
+    with span("ocr", input_size=len(image_bytes)):
+        image = Image.open(io.BytesIO(image_bytes))
+        extracted_text = pytesseract.image_to_string(image)
+
+    with span("blob_store", input_size=len(extracted_text)):
+        text_handle = blob_store.put_text(extracted_text)
+
+    artifacts, passages = await ingest_document(doc_hash, extracted_text, file.filename, user_id)
+    summary, summary_tier = await summarize_tiered(
+        "Image Content", extracted_text, summary_mode, passages
+    )
+
+    quiz = await build_quiz(doc_hash, extracted_text, passages, artifacts.get("term_index"))
+    mindmap = await asyncio.to_thread(build_mindmap, extracted_text, file.filename)
+    artifacts["study_stats"] = await asyncio.to_thread(
+        index_study_stats, extracted_text, mindmap, artifacts.get("term_index")
+    )
 
-    extracted_text = pytesseract.image_to_string(image)
-    summary = summarize_text("Image Content", extracted_text)
+    if is_db_configured():
+        save_document(doc_hash, user_id, file.filename, text_handle,
+                      summary=summary, quiz=quiz, mindmap=mindmap, timings=stage_timings(),
+                      **artifacts)
 
     return {
         "filename": file.filename,
-        "summary": summary
+        "document_id": doc_hash,
+        "text_handle": text_handle,
+        "summary": summary,
+        "summary_tier": summary_tier,
+        "quiz": quiz,
+        "mindmap": mindmap,
+        "study_stats": artifacts.get("study_stats"),
+        "cached": False
+    }
+
+# ---------------------------
+# Blob range fetches
+# ---------------------------
+def check_range(start: int, length: int):
+    if start < 0 or length <= 0:
+        raise HTTPException(status_code=400, detail="start must be >= 0 and length > 0")
+
+@app.get("/blobs/{digest}")
+def get_blob(digest: str, start: int = 0, length: int = 1024 * 1024):
+    check_range(start, length)
+    handle = blob_store.stat(digest)
+    if not handle:
+        raise HTTPException(status_code=404, detail="Blob not found")
+    if start >= handle["size"] > 0:
+        raise HTTPException(status_code=416, detail="Range starts past the end of the blob",
+                            headers={"Content-Range": f"bytes */{handle['size']}"})
+
+    data = blob_store.read_range(digest, start, start + length)
+    # An empty blob has no byte range to report
+    content_range = f"bytes {start}-{start + len(data) - 1}" if data else "bytes *"
+    return Response(
+        content=data,
+        media_type="application/octet-stream",
+        headers={"Content-Range": f"{content_range}/{handle['size']}"}
+    )
+
+@app.get("/blobs/{digest}/text")
+def get_blob_text(digest: str, start: int = 0, length: int = 64 * 1024):
+    check_range(start, length)
+    if not blob_store.exists(digest):
+        raise HTTPException(status_code=404, detail="Blob not found")
+    return blob_store.read_text_range(digest, start, length)
+
+# ---------------------------
+# Stored documents
+# ---------------------------
+@app.get("/documents")
+def list_documents(user_id: str = "anonymous", limit: int = 20):
+    if not is_db_configured():
+        raise HTTPException(status_code=503, detail="Document store is not configured")
+    return {"documents": list_user_documents(user_id, limit)}
+
+@app.get("/documents/{doc_hash}")
+def get_document(doc_hash: str, user_id: str = "anonymous", fields: str = ""):
+    if not is_db_configured():
+        raise HTTPException(status_code=503, detail="Document store is not configured")
+
+    requested = [f for f in fields.split(",") if f] or None
+    document = find_document(doc_hash, user_id, requested)
+    if not document:
+        raise HTTPException(status_code=404, detail="Document not found")
+    return document
+
+@app.get("/documents/{doc_hash}/quiz")
+async def regenerate_quiz(doc_hash: str, user_id: str = "anonymous", n: int = 10, seed: int = 0):
+    if not is_db_configured():
+        raise HTTPException(status_code=503, detail="Document store is not configured")
+
+    document = find_document(doc_hash, user_id, ["text_location", "passage_index", "term_index"])
+    if not document or not document.get("passage_index"):
+        raise HTTPException(status_code=404, detail="Document not found")
+
+    text = blob_store.read_text(document["text_location"]["hash"])
+    passages = load_passage_index(document["passage_index"])
+    quiz = await build_quiz(doc_hash, text, passages, document.get("term_index"), n, seed)
+    return {"document_id": doc_hash, "quiz": quiz}
+
+# ---------------------------
+# Mindmap section summaries
+# ---------------------------
+MAX_SECTIONS_PER_REQUEST = 16
+
+class MindmapSection(BaseModel):
+    id: int
+    title: str = ""
+    start: int
+    end: int
+
+class MindmapSummaryRequest(BaseModel):
+    text_hash: str
+    sections: list[MindmapSection]
+    summary_mode: str = "auto"
+
+@app.post("/mindmap/summaries")
+async def mindmap_summaries(body: MindmapSummaryRequest):
+    # Clients expand the tree a branch at a time; each branch's sections are
+    # summarised concurrently and cached per section text
+    if len(body.sections) > MAX_SECTIONS_PER_REQUEST:
+        raise HTTPException(status_code=400,
+                            detail=f"At most {MAX_SECTIONS_PER_REQUEST} sections per request")
+    if not blob_store.exists(body.text_hash):
+        raise HTTPException(status_code=404, detail="Blob not found")
+
+    text = blob_store.read_text(body.text_hash)
+    sections = [section.model_dump() for section in body.sections]
+    return {"summaries": await summarize_sections(text, sections, body.summary_mode)}
+
+# ---------------------------
+# Study plans
+# ---------------------------
+@app.get("/study_plan")
+def study_plan(stats_hash: str = "", doc_id: str = "", user_id: str = "anonymous", days: int = 7):
+    # Section reading times and difficulty were computed at ingest; planning
+    # is a prefix-sum partition over at most a few hundred sections
+    if not 1 <= days <= MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"days must be between 1 and {MAX_DAYS}")
+
+    handle = None
+    if stats_hash:
+        handle = {"stats": {"hash": stats_hash}}
+    elif doc_id and is_db_configured():
+        document = find_document(doc_id, user_id, ["study_stats"])
+        handle = document.get("study_stats") if document else None
+    if not handle or not blob_store.exists(handle["stats"]["hash"]):
+        raise HTTPException(status_code=404, detail="Study statistics not found")
+
+    with span("study_plan", input_size=days):
+        return plan_study(load_study_stats(handle), days)
+
+# ---------------------------
+# Knowledge graph
+# ---------------------------
+@app.get("/graph")
+def knowledge_graph(user_id: str = "anonymous", doc_id: str = "", top_n: int = 30,
+                    edges_per_node: int = 4, min_cooccurrence: int = 2):
+    # Statistics span the user's corpus; doc_id restricts the nodes to one document's concepts.
+    # Node counts are capped and positions precomputed so the browser only draws.
+    graph_store = concept_graph(user_id)
+    with span("graph_query", input_size=top_n):
+        graph = graph_store.view(top_n, doc_id or None, edges_per_node, min_cooccurrence)
+    if graph is None:
+        raise HTTPException(status_code=404, detail="Document not in knowledge graph")
+    return {**graph, "stats": graph_store.stats()}
+
+# ---------------------------
+# Flashcards (spaced repetition)
+# ---------------------------
+class Flashcard(BaseModel):
+    front: str
+    back: str
+    kind: str = "basic"
+    doc_id: str | None = None
+    start: int | None = None
+    end: int | None = None
+
+class AddFlashcardsRequest(BaseModel):
+    user_id: str = "anonymous"
+    deck: str = DEFAULT_DECK
+    cards: list[Flashcard]
+
+class ReviewRequest(BaseModel):
+    user_id: str = "anonymous"
+    grade: int
+
+@app.post("/flashcards")
+def add_flashcards(body: AddFlashcardsRequest):
+    cards = [card.model_dump() for card in body.cards]
+    added = review_scheduler().add_cards(body.user_id, body.deck, cards)
+    return {"added": added, "stats": review_scheduler().stats(body.user_id, body.deck)}
+
+class GenerateFlashcardsRequest(BaseModel):
+    user_id: str = "anonymous"
+    doc_id: str
+    text_hash: str
+    deck: str = ""
+    max_passages: int = MAX_PASSAGES_PER_RUN
+
+@app.post("/flashcards/generate")
+async def generate_document_flashcards(body: GenerateFlashcardsRequest):
+    # Walks the document's passages in runs of max_passages; call again
+    # while "remaining" is non-zero. Seen passages are never reprocessed.
+    if not blob_store.exists(body.text_hash):
+        raise HTTPException(status_code=404, detail="Blob not found")
+
+    text = blob_store.read_text(body.text_hash)
+    deck = body.deck or body.doc_id
+    scheduler = review_scheduler()
+    result = await asyncio.to_thread(
+        generate_flashcards, scheduler, body.user_id, deck, body.doc_id, text, qa_model,
+        max(1, min(body.max_passages, MAX_PASSAGES_PER_RUN))
+    )
+    return {**result, "deck": deck, "stats": scheduler.stats(body.user_id, deck)}
+
+@app.get("/flashcards/next")
+def next_flashcards(user_id: str = "anonymous", deck: str = "", limit: int = 1):
+    # Due cards come off the (tenant, deck, due) index, oldest due first
+    scheduler = review_scheduler()
+    cards = scheduler.next_due(user_id, deck or None, limit=max(1, min(limit, 100)))
+    return {"cards": cards, "stats": scheduler.stats(user_id, deck or None)}
+
+@app.post("/flashcards/{card_id}/review")
+def review_flashcard(card_id: int, body: ReviewRequest, deck: str = ""):
+    if not 0 <= body.grade <= 5:
+        raise HTTPException(status_code=400, detail="grade must be between 0 and 5")
+    scheduler = review_scheduler()
+    card = scheduler.review(body.user_id, card_id, body.grade)
+    if card is None:
+        raise HTTPException(status_code=404, detail="Card not found")
+    return {
+        "card": card,
+        "next": scheduler.next_due(body.user_id, deck or None),
+        "stats": scheduler.stats(body.user_id, deck or None)
     }
 
+@app.get("/flashcards/decks")
+def flashcard_decks(user_id: str = "anonymous"):
+    return {"decks": review_scheduler().decks(user_id)}
+
+@app.delete("/flashcards/decks/{deck}")
+def delete_flashcard_deck(deck: str, user_id: str = "anonymous"):
+    return {"deleted": review_scheduler().delete_deck(user_id, deck)}
+
 # ---------------------------
 # Upload document to RAG
 # ---------------------------
 @app.post("/upload_to_rag")
-async def upload_to_rag(file: UploadFile = File(...)):
+async def upload_to_rag(file: UploadFile = File(...), user_id: str = Form("anonymous")):
     ext = file.filename.lower().split(".")[-1]
     data = await file.read()
     content = ""
+    page_starts = None
 
     if ext == "pdf":
-        pdf = fitz.open(stream=data, filetype="pdf")
-        for page in pdf:
-            content += page.get_text()
+        with span("pdf_extract", input_size=len(data)):
+            content, layout = extract_pdf(fitz.open(stream=data, filetype="pdf"))
+            page_starts = layout["page_starts"]
     elif ext in ["jpg", "jpeg", "png"]:
-        image = Image.open(io.BytesIO(data))
-        content = pytesseract.image_to_string(image)
+        with span("ocr", input_size=len(data)):
+            image = Image.open(io.BytesIO(data))
+            content = pytesseract.image_to_string(image)
     else:
         content = data.decode()
 
-    store_document_in_vector_db(content, file.filename)
+    try:
+        store_document_in_vector_db(content, file.filename, document_hash(data), page_starts, user_id)
+    except QuotaExceeded as e:
+        raise HTTPException(status_code=413, detail=str(e))
 
     return {"message": "Document stored for RAG"}
 
+@app.delete("/rag_chat/sessions/{session_id}")
+def end_chat_session(session_id: str, user_id: str = "anonymous"):
+    return {"deleted": conversations.drop(user_id, session_id)}
+
+@app.get("/usage")
+def usage(user_id: str = "anonymous"):
+    return tenant_usage(user_id)
+
 # ---------------------------
 # RAG Chat (Local QA)
 # ---------------------------
+def cite(passage: dict, start: int = None, end: int = None):
+    # Offsets are relative to the passage; the citation points into the document
+    citation = {
+        "document_id": passage["doc_id"],
+        "filename": passage["filename"],
+        "start": passage["start"] + (start or 0),
+        "end": passage["start"] + end if end is not None else passage["end"]
+    }
+    if "page_first" in passage:
+        citation["pages"] = [passage["page_first"], passage["page_last"]]
+    return citation
+
 @app.get("/rag_chat")
-def rag_chat(question: str):
-    context = query_vector_db(question)
+def rag_chat(question: str, user_id: str = "anonymous", session_id: str = ""):
+    # With a session id, follow-up questions are expanded with earlier turns
+    # before retrieval; without one the endpoint stays stateless
+    conversation = conversations.get(user_id, session_id) if session_id else None
+    question_embedding = embed_batch([question])[0]
+    query, query_embedding, context = rewrite_query(conversation, question, question_embedding)
 
-    if not context:
-        return {"answer": "No relevant document found."}
+    # Near-identical questions against an unchanged collection reuse the
+    # earlier answer and skip retrieval and the QA model entirely. The key
+    # is the question as asked, scoped to the turns a follow-up relied on.
+    version = collection_version(user_id)
+    scope = "\n".join(context)
+    with span("answer_cache"):
+        cached = answer_cache.lookup(user_id, version, question_embedding, scope)
+    if cached is not None:
+        if conversation is not None:
+            conversation.remember(question, cached["answer"])
+        return {"question": question, "query": query, **cached, "cached": True}
 
-    result = qa_model({
-        "question": question,
-        "context": context
-    })
+    start = time.perf_counter()
+    # Only the asking user's collection is searched
+    passages = query_passages(query, tenant=user_id, embedding=query_embedding)
 
-    return {
-        "question": question,
+    if not passages:
+        return {
+            "question": question, "query": query, "answer": "No relevant document found.",
+            "confidence": 0.0, "citation": None, "sources": [], "cached": False
+        }
+
+    context = "\n".join(p["text"] for p in passages)
+
+    with span("qa_model", input_size=len(context), batch_size=1):
+        result = qa_model({
+            "question": question,
+            "context": context
+        })
+
+    # Map the answer's span in the joined context back to its passage
+    position, citation = 0, None
+    for passage in passages:
+        if position <= result["start"] < position + len(passage["text"]):
+            end = min(result["end"] - position, len(passage["text"]))
+            citation = cite(passage, result["start"] - position, end)
+            break
+        position += len(passage["text"]) + 1
+
+    if conversation is not None:
+        conversation.remember(question, result["answer"])
+
+    response = {
         "answer": result["answer"],
-        "confidence": result["score"]
+        "confidence": result["score"],
+        "citation": citation,
+        "sources": [{**cite(p), "score": p["score"]} for p in passages]
     }
+    answer_cache.store(user_id, version, question_embedding, response, time.perf_counter() - start, scope)
+    return {"question": question, "query": query, **response, "cached": False}
@@ -0,0 +1,252 @@
+import cProfile
+import hmac
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+
+PROFILE_DIR = Path(os.getenv("PROFILE_DIR", Path("storage") / "profiles"))
+SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL", "0.005"))
+TOP_FUNCTIONS = 30
+# Files written per profile: summary, folded stacks, pstats
+PROFILE_KINDS = ("json", "collapsed", "prof")
+
+# Profile attached to the request currently being handled
+_current_profile = ContextVar("current_profile", default=None)
+
+# endpoint path -> {"remaining": n, "mode": mode}
+_armed = {}
+_armed_lock = threading.Lock()
+
+# cProfile hooks are interpreter-wide on newer Pythons, so only one
+# thread may run under cProfile at a time
+_cprofile_lock = threading.Lock()
+
+# ---------------------------
+# Admin gate
+# ---------------------------
+def is_admin(request):
+    token = os.getenv("ADMIN_TOKEN")
+    supplied = request.headers.get("X-Admin-Token", "")
+    # Profiling stays off entirely unless an admin token is configured
+    return bool(token) and hmac.compare_digest(token, supplied)
+
+def arm(endpoint, count, mode="sample"):
+    with _armed_lock:
+        _armed[endpoint] = {"remaining": count, "mode": mode}
+
+def disarm(endpoint):
+    with _armed_lock:
+        _armed.pop(endpoint, None)
+
+def armed_endpoints():
+    with _armed_lock:
+        return {endpoint: dict(state) for endpoint, state in _armed.items()}
+
+def profile_mode_for(request):
+    if request.query_params.get("profile") == "1" and is_admin(request):
+        mode = request.query_params.get("profile_mode", "sample")
+        return mode if mode in ("sample", "cprofile") else "sample"
+
+    path = request.url.path
+    with _armed_lock:
+        state = _armed.get(path)
+        if not state:
+            return None
+        state["remaining"] -= 1
+        if state["remaining"] <= 0:
+            del _armed[path]
+        return state["mode"]
+
+# ---------------------------
+# Per-request profile
+# ---------------------------
+class RequestProfile:
+    def __init__(self, endpoint, mode):
+        self.id = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        self.endpoint = endpoint
+        self.mode = mode
+        self.started = time.time()
+        self.samples = Counter()
+        self.stats = None
+        self.skipped_spans = 0
+        self._threads = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sampler = None
+
+    def start(self):
+        if self.mode == "sample":
+            self._sampler = threading.Thread(target=self._sample_loop, daemon=True)
+            self._sampler.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._sampler:
+            self._sampler.join()
+
+    # Called from tracing.span so only hot-path work is profiled, on
+    # whichever thread (event loop or threadpool) runs it
+    def enter_span(self):
+        ident = threading.get_ident()
+        with self._lock:
+            depth, profiler = self._threads.get(ident, (0, None))
+            if depth == 0 and self.mode == "cprofile":
+                if _cprofile_lock.acquire(blocking=False):
+                    profiler = cProfile.Profile()
+                    profiler.enable()
+                else:
+                    self.skipped_spans += 1
+            self._threads[ident] = (depth + 1, profiler)
+
+    def exit_span(self):
+        ident = threading.get_ident()
+        with self._lock:
+            depth, profiler = self._threads[ident]
+            if depth > 1:
+                self._threads[ident] = (depth - 1, profiler)
+                return
+            del self._threads[ident]
+
+        if profiler:
+            profiler.disable()
+            _cprofile_lock.release()
+            with self._lock:
+                if self.stats is None:
+                    self.stats = pstats.Stats(profiler)
+                else:
+                    self.stats.add(profiler)
+
+    def _sample_loop(self):
+        while not self._stop.wait(SAMPLE_INTERVAL):
+            with self._lock:
+                idents = list(self._threads)
+            if not idents:
+                continue
+            frames = sys._current_frames()
+            for ident in idents:
+                frame = frames.get(ident)
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({Path(code.co_filename).name}:{frame.f_lineno})")
+                    frame = frame.f_back
+                if stack:
+                    self.samples[tuple(reversed(stack))] += 1
+
+    def top_functions(self):
+        if self.mode == "cprofile":
+            if self.stats is None:
+                return []
+            rows = []
+            for (filename, line, name), (cc, nc, tt, ct, _) in self.stats.stats.items():
+                rows.append({
+                    "function": f"{name} ({Path(filename).name}:{line})",
+                    "calls": nc,
+                    "self_seconds": round(tt, 6),
+                    "total_seconds": round(ct, 6)
+                })
+            rows.sort(key=lambda r: r["total_seconds"], reverse=True)
+            return rows[:TOP_FUNCTIONS]
+
+        self_counts, total_counts = Counter(), Counter()
+        for stack, count in self.samples.items():
+            self_counts[stack[-1]] += count
+            for frame in set(stack):
+                total_counts[frame] += count
+        return [
+            {
+                "function": frame,
+                "total_samples": count,
+                "self_samples": self_counts.get(frame, 0),
+                "total_seconds": round(count * SAMPLE_INTERVAL, 4)
+            }
+            for frame, count in total_counts.most_common(TOP_FUNCTIONS)
+        ]
+
+    def save(self, spans, duration):
+        PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+        summary = {
+            "id": self.id,
+            "endpoint": self.endpoint,
+            "mode": self.mode,
+            "started": self.started,
+            "duration": duration,
+            "spans": spans,
+            "skipped_spans": self.skipped_spans,
+            "top_functions": self.top_functions()
+        }
+        (PROFILE_DIR / f"{self.id}.json").write_text(json.dumps(summary, indent=2, default=str))
+
+        if self.mode == "sample":
+            # Folded stacks: loads in speedscope or flamegraph.pl
+            lines = [";".join(stack) + f" {count}" for stack, count in self.samples.items()]
+            (PROFILE_DIR / f"{self.id}.collapsed").write_text("\n".join(lines))
+        elif self.stats is not None:
+            self.stats.dump_stats(str(PROFILE_DIR / f"{self.id}.prof"))
+        return summary
+
+def begin(endpoint, mode):
+    profile = RequestProfile(endpoint, mode)
+    profile.start()
+    token = _current_profile.set(profile)
+    return profile, token
+
+def finish(profile, token, spans, duration):
+    _current_profile.reset(token)
+    profile.stop()
+    return profile.save(spans, duration)
+
+def current_profile():
+    return _current_profile.get()
+
+@contextmanager
+def attached(profiles):
+    # Lets a worker thread do profiled work on behalf of queued requests
+    active = [p for p in profiles if p is not None]
+    for profile in active:
+        profile.enter_span()
+    try:
+        yield
+    finally:
+        for profile in active:
+            profile.exit_span()
+
+def enter_span():
+    profile = _current_profile.get()
+    if profile is not None:
+        profile.enter_span()
+    return profile
+
+def exit_span(profile):
+    if profile is not None:
+        profile.exit_span()
+
+# ---------------------------
+# Stored profiles
+# ---------------------------
+def list_profiles(limit=50):
+    if not PROFILE_DIR.exists():
+        return []
+    summaries = []
+    for path in sorted(PROFILE_DIR.glob("*.json"), reverse=True)[:limit]:
+        data = json.loads(path.read_text())
+        summaries.append({k: data[k] for k in ("id", "endpoint", "mode", "started", "duration")})
+    return summaries
+
+def profile_path(profile_id, kind="json"):
+    # Profile ids are generated here and kinds are a fixed set; reject
+    # anything that could escape the dir
+    if kind not in PROFILE_KINDS:
+        raise ValueError(f"kind must be one of {', '.join(PROFILE_KINDS)}")
+    if not profile_id.replace("-", "").isalnum():
+        return None
+    path = PROFILE_DIR / f"{profile_id}.{kind}"
+    return path if path.exists() else None
@@ -0,0 +1,172 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from backend import profiling
+
+# Seconds; covers sub-millisecond lookups up to multi-minute BART runs
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+# Spans recorded for the request currently being handled
+_current_spans = ContextVar("current_spans", default=None)
+
+# ---------------------------
+# Metric types
+# ---------------------------
+class Histogram:
+    def __init__(self, name, description, label_names, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.description = description
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(n, "")) for n in self.label_names)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            index = bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = [(k, (list(v[0]), v[1], v[2])) for k, v in self._series.items()]
+
+        for key, (counts, total, count) in sorted(items):
+            labels = ",".join(f'{n}="{v}"' for n, v in zip(self.label_names, key))
+            prefix = f"{labels}," if labels else ""
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'{self.name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{prefix}le="+Inf"}} {count}')
+            lines.append(f"{_series_name(self.name + '_sum', labels)} {total}")
+            lines.append(f"{_series_name(self.name + '_count', labels)} {count}")
+        return lines
+
+class Counter:
+    def __init__(self, name, description, label_names):
+        self.name = name
+        self.description = description
+        self.label_names = label_names
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(n, "")) for n in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            labels = ",".join(f'{n}="{v}"' for n, v in zip(self.label_names, key))
+            lines.append(f"{_series_name(self.name, labels)} {value}")
+        return lines
+
+def _series_name(name, labels):
+    return f"{name}{{{labels}}}" if labels else name
+
+_registry = []
+
+def histogram(name, description, label_names=(), buckets=DEFAULT_BUCKETS):
+    metric = Histogram(name, description, tuple(label_names), buckets)
+    _registry.append(metric)
+    return metric
+
+def counter(name, description, label_names=()):
+    metric = Counter(name, description, tuple(label_names))
+    _registry.append(metric)
+    return metric
+
+def render_metrics():
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+STAGE_SECONDS = histogram(
+    "airc_stage_duration_seconds",
+    "Time spent in each pipeline stage",
+    ["stage"]
+)
+STAGE_INPUT_SIZE = histogram(
+    "airc_stage_input_size",
+    "Input size per stage call (characters, pages or items)",
+    ["stage"],
+    buckets=(1, 10, 100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+)
+STAGE_BATCH_SIZE = histogram(
+    "airc_stage_batch_size",
+    "Model batch size per stage call",
+    ["stage"],
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256)
+)
+REQUEST_SECONDS = histogram(
+    "airc_http_request_duration_seconds",
+    "End-to-end request latency per endpoint",
+    ["method", "endpoint", "status"]
+)
+
+# ---------------------------
+# Request traces
+# ---------------------------
+def start_trace():
+    spans = []
+    token = _current_spans.set(spans)
+    return spans, token
+
+def end_trace(token):
+    _current_spans.reset(token)
+
+@contextmanager
+def span(stage, input_size=None, batch_size=None, profile=True, **attributes):
+    # Callers may fill in input_size / batch_size on the yielded record
+    # once they are known inside the block
+    record = {"stage": stage, "input_size": input_size, "batch_size": batch_size, **attributes}
+    # profile=False for spans that only wait on work done elsewhere
+    profile = profiling.enter_span() if profile else None
+    start = time.perf_counter()
+    try:
+        yield record
+    finally:
+        duration = time.perf_counter() - start
+        profiling.exit_span(profile)
+        STAGE_SECONDS.observe(duration, stage=stage)
+        if record["input_size"] is not None:
+            STAGE_INPUT_SIZE.observe(record["input_size"], stage=stage)
+        if record["batch_size"] is not None:
+            STAGE_BATCH_SIZE.observe(record["batch_size"], stage=stage)
+        record["duration"] = duration
+
+        spans = _current_spans.get()
+        if spans is not None:
+            spans.append(record)
+
+def current_spans():
+    return list(_current_spans.get() or [])
+
+def stage_timings(spans=None):
+    totals = {}
+    for record in spans if spans is not None else current_spans():
+        totals[record["stage"]] = totals.get(record["stage"], 0.0) + record["duration"]
+    return totals
+
+def server_timing_header(spans):
+    # Server-Timing (RFC draft) is shown natively in browser devtools
+    return ", ".join(
+        f"{stage};dur={seconds * 1000:.1f}"
+        for stage, seconds in stage_timings(spans).items()
+    )
@@ -0,0 +1,348 @@
+"""
+AI Research Companion - Load Test
+Drives mixed upload / ingest / chat traffic against the FastAPI backend and
+reports throughput, tail latency, client-side queueing delay, CPU and RSS.
+
+Usage:
+    # In-process ASGI app with stubbed models (no network, no model weights)
+    python -m benchmarks.load_test --mode inprocess --concurrency 16 --duration 30
+
+    # Real uvicorn workers serving the stubbed app
+    python -m benchmarks.load_test --mode uvicorn --workers 4 --concurrency 64
+
+    # An already-running deployment
+    python -m benchmarks.load_test --mode url --url http://127.0.0.1:8000 --no-stub
+
+Open-loop runs (--rate) schedule arrivals on a Poisson clock; the gap between a
+request's scheduled arrival and the moment a client slot picks it up is the
+queueing delay. Closed-loop runs (the default) keep --concurrency requests in
+flight at all times.
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+
+from benchmarks.rag_benchmark import build_synthetic_corpus
+from benchmarks.stats import latency_summary, write_report
+
+ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_OUTPUT = ROOT / "bench_results" / "load_test.json"
+
+
+# ==================== PAYLOADS ====================
+
+def make_pdf(text: str) -> bytes:
+    """Build a minimal single-page PDF containing `text` (no PDF library needed)"""
+    # The built-in Helvetica font only covers Latin-1
+    text = " ".join(text.encode("latin-1", errors="replace").decode("latin-1").split())
+    lines = [text[i:i + 90] for i in range(0, len(text), 90)][:60]
+    escaped = [l.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)") for l in lines]
+    stream = "BT /F1 10 Tf 40 800 Td 12 TL " + " ".join(f"({l}) '" for l in escaped) + " ET"
+
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] "
+        "/Contents 4 0 R /Resources << /Font << /F1 5 0 R >> >> >>",
+        f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream",
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+
+    out = "%PDF-1.4\n"
+    offsets = []
+    for i, body in enumerate(objects, start=1):
+        offsets.append(len(out.encode("latin-1")))
+        out += f"{i} 0 obj\n{body}\nendobj\n"
+    xref = len(out.encode("latin-1"))
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n"
+    out += "".join(f"{o:010d} 00000 n \n" for o in offsets)
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n"
+    return out.encode("latin-1")
+
+
+class Workload:
+    """Pre-generated request payloads so the client spends no time building them"""
+
+    def __init__(self, n_docs: int, seed: int, unique_uploads: bool):
+        corpus = build_synthetic_corpus(n_docs, facts_per_doc=4, seed=seed)
+        self.texts = list(corpus.documents.values())
+        self.questions = [q["question"] for q in corpus.questions]
+        self.unique_uploads = unique_uploads
+        self.rng = random.Random(seed)
+        self.counter = 0
+
+    def next_pdf(self):
+        self.counter += 1
+        text = self.rng.choice(self.texts)
+        if self.unique_uploads:
+            # Defeat content-hash caching so every upload runs the full pipeline
+            text = f"{text} Upload {self.counter}."
+        return f"load_{self.counter}.pdf", make_pdf(text)
+
+    def next_text(self):
+        self.counter += 1
+        return f"load_{self.counter}.txt", self.rng.choice(self.texts).encode("utf-8")
+
+    def next_question(self):
+        return self.rng.choice(self.questions)
+
+
+async def send(client: httpx.AsyncClient, kind: str, workload: Workload):
+    if kind == "upload":
+        name, data = workload.next_pdf()
+        return await client.post("/upload_pdf", files={"file": (name, data, "application/pdf")})
+    if kind == "ingest":
+        name, data = workload.next_text()
+        return await client.post("/upload_to_rag", files={"file": (name, data, "text/plain")})
+    if kind == "chat":
+        return await client.get("/rag_chat", params={"question": workload.next_question()})
+    if kind == "documents":
+        return await client.get("/documents")
+    raise ValueError(kind)
+
+
+# ==================== RESOURCE SAMPLING ====================
+
+class ResourceSampler:
+    """Samples CPU% and RSS of a process tree in a background thread"""
+
+    def __init__(self, pid: int, interval: float = 0.5):
+        self.pid = pid
+        self.interval = interval
+        self.cpu: List[float] = []
+        self.rss: List[int] = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        try:
+            import psutil  # noqa: F401
+        except ImportError:
+            print("psutil not installed; skipping CPU/RSS sampling")
+            return self
+        self._thread.start()
+        return self
+
+    def _run(self):
+        import psutil
+
+        root = psutil.Process(self.pid)
+        procs = {}
+        while not self._stop.is_set():
+            try:
+                tree = [root] + root.children(recursive=True)
+            except psutil.NoSuchProcess:
+                return
+            cpu, rss = 0.0, 0
+            for proc in tree:
+                tracked = procs.setdefault(proc.pid, proc)
+                try:
+                    cpu += tracked.cpu_percent(None)
+                    rss += tracked.memory_info().rss
+                except psutil.NoSuchProcess:
+                    procs.pop(proc.pid, None)
+            self.cpu.append(cpu)
+            self.rss.append(rss)
+            self._stop.wait(self.interval)
+
+    def stop(self) -> Dict:
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        if not self.cpu:
+            return {}
+        # The first cpu_percent() sample per process is always 0
+        cpu = self.cpu[1:] or self.cpu
+        return {
+            "cpu_percent_mean": round(sum(cpu) / len(cpu), 1),
+            "cpu_percent_max": round(max(cpu), 1),
+            "rss_mb_max": round(max(self.rss) / 2 ** 20, 1),
+            "rss_mb_last": round(self.rss[-1] / 2 ** 20, 1),
+        }
+
+
+# ==================== SERVER MODES ====================
+
+def start_uvicorn(port: int, workers: int, stub: bool) -> subprocess.Popen:
+    target = "benchmarks.stub_server:app" if stub else "backend.main:app"
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", target, "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        cwd=ROOT,
+    )
+    deadline = time.time() + 120
+    while time.time() < deadline:
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/", timeout=1.0)
+            return proc
+        except httpx.HTTPError:
+            if proc.poll() is not None:
+                raise RuntimeError("uvicorn exited during startup")
+            time.sleep(0.5)
+    proc.terminate()
+    raise RuntimeError("uvicorn did not become ready within 120s")
+
+
+def make_client(args) -> httpx.AsyncClient:
+    timeout = httpx.Timeout(args.timeout)
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+
+    if args.mode == "inprocess":
+        if not args.no_stub:
+            from benchmarks import stub_models
+            stub_models.install()
+        from backend.main import app
+
+        transport = httpx.ASGITransport(app=app)
+        return httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=timeout)
+
+    return httpx.AsyncClient(base_url=args.url, timeout=timeout, limits=limits)
+
+
+# ==================== DRIVER ====================
+
+async def run_load(args, client: httpx.AsyncClient, workload: Workload) -> Dict:
+    mix = {}
+    for part in args.mix.split(","):
+        kind, weight = part.split("=")
+        mix[kind] = float(weight)
+    kinds, weights = list(mix), list(mix.values())
+
+    rng = random.Random(args.seed)
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    queue_delays: List[float] = []
+    errors: Dict[str, int] = defaultdict(int)
+    server_timings: Dict[str, List[float]] = defaultdict(list)
+
+    slots = asyncio.Semaphore(args.concurrency)
+    deadline = time.perf_counter() + args.duration
+
+    async def one(kind: str, scheduled: float):
+        async with slots:
+            started = time.perf_counter()
+            queue_delays.append(started - scheduled)
+            try:
+                response = await send(client, kind, workload)
+                elapsed = time.perf_counter() - started
+                if response.status_code >= 400:
+                    errors[f"{kind}:{response.status_code}"] += 1
+                else:
+                    latencies[kind].append(elapsed)
+                    server_time = response.headers.get("x-process-time")
+                    if server_time:
+                        server_timings[kind].append(float(server_time))
+            except httpx.HTTPError as e:
+                errors[f"{kind}:{type(e).__name__}"] += 1
+
+    # Warm-up requests are not recorded
+    for kind in kinds:
+        try:
+            await send(client, kind, workload)
+        except httpx.HTTPError:
+            pass
+
+    started = time.perf_counter()
+    tasks = []
+    if args.rate:
+        # Open loop: arrivals follow a Poisson process regardless of completions
+        next_arrival = started
+        while next_arrival < deadline:
+            delay = next_arrival - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            kind = rng.choices(kinds, weights)[0]
+            tasks.append(asyncio.create_task(one(kind, next_arrival)))
+            next_arrival += rng.expovariate(args.rate)
+        await asyncio.gather(*tasks)
+    else:
+        async def worker():
+            while time.perf_counter() < deadline:
+                await one(rng.choices(kinds, weights)[0], time.perf_counter())
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+
+    wall = time.perf_counter() - started
+    completed = sum(len(v) for v in latencies.values())
+
+    return {
+        "wall_seconds": round(wall, 3),
+        "completed": completed,
+        "errors": dict(errors),
+        "throughput_rps": round(completed / wall, 2) if wall else 0.0,
+        "latency": latency_summary([x for v in latencies.values() for x in v]),
+        "latency_by_endpoint": {k: latency_summary(v) for k, v in latencies.items()},
+        "queueing_delay": latency_summary(queue_delays),
+        "server_time_by_endpoint": {k: latency_summary(v) for k, v in server_timings.items()},
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> Dict:
+    parser = argparse.ArgumentParser(description="Load-test the AI Research Companion API")
+    parser.add_argument("--mode", choices=["inprocess", "uvicorn", "url"], default="inprocess")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers (uvicorn mode)")
+    parser.add_argument("--no-stub", action="store_true", help="Load the real models")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--rate", type=float, default=0.0, help="Open-loop arrivals per second (0 = closed loop)")
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds of measured traffic")
+    parser.add_argument("--mix", default="upload=1,ingest=1,chat=4", help="Weighted endpoint mix")
+    parser.add_argument("--unique-uploads", action="store_true", help="Make every upload a new document")
+    parser.add_argument("--docs", type=int, default=100, help="Synthetic documents in the payload pool")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--label", default="", help="Free-form tag stored with the results")
+    parser.add_argument("--output", type=Path, default=DEFAULT_OUTPUT)
+    args = parser.parse_args(argv)
+
+    if args.mode == "uvicorn":
+        args.url = f"http://127.0.0.1:{args.port}"
+
+    server = None
+    if args.mode == "uvicorn":
+        server = start_uvicorn(args.port, args.workers, stub=not args.no_stub)
+
+    sampler = ResourceSampler(server.pid if server else os.getpid()).start() if args.mode != "url" else None
+    workload = Workload(args.docs, args.seed, args.unique_uploads)
+
+    async def go():
+        async with make_client(args) as client:
+            return await run_load(args, client, workload)
+
+    try:
+        result = asyncio.run(go())
+    finally:
+        resources = sampler.stop() if sampler else {}
+        if server:
+            server.terminate()
+            server.wait(timeout=30)
+
+    name = args.label or f"{args.mode}-w{args.workers}-c{args.concurrency}" + (f"-r{args.rate:g}" if args.rate else "")
+    report = {
+        "config": {k: str(v) for k, v in vars(args).items()},
+        "runs": [{"name": name, **result, "resources": resources}],
+    }
+    write_report(report, args.output)
+
+    print(f"{name}: {result['throughput_rps']} req/s, p95={result['latency']['p95_ms']}ms, "
+          f"p99={result['latency']['p99_ms']}ms, queue p95={result['queueing_delay']['p95_ms']}ms, "
+          f"errors={sum(result['errors'].values())}")
+    if resources:
+        print(f"cpu mean={resources['cpu_percent_mean']}% max={resources['cpu_percent_max']}%, "
+              f"rss max={resources['rss_mb_max']}MB")
+    print(f"Results written to {args.output}")
+    return report
+
+
+if __name__ == "__main__":
+    main()
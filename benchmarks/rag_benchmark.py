@@ -0,0 +1,458 @@
+"""
+AI Research Companion - RAG Benchmark
+Measures ingest throughput, query latency, retrieval quality and QA accuracy
+for each retriever / embedder / reader configuration.
+
+Usage:
+    python -m benchmarks.rag_benchmark --corpus synthetic --docs 200
+    python -m benchmarks.rag_benchmark --corpus notes --notes temp_rag.txt \
+        --retrievers whole,chunk,bm25,rag_agent --embedders hashing,all-MiniLM-L6-v2
+    python -m benchmarks.rag_benchmark --compare bench_results/rag_previous.json
+"""
+
+import argparse
+import json
+import math
+import random
+import re
+import string
+import time
+import zlib
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from benchmarks.stats import compare_reports, latency_summary, write_report
+
+ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_OUTPUT = ROOT / "bench_results" / "rag_benchmark.json"
+
+TOKEN_RE = re.compile(r"[A-Za-z0-9_]+")
+
+
+# ==================== CORPUS ====================
+
+@dataclass
+class Corpus:
+    documents: Dict[str, str]
+    questions: List[Dict] = field(default_factory=list)
+
+
+_SUBJECTS = [
+    "protocol", "reactor", "compiler", "enzyme", "telescope", "algorithm",
+    "vaccine", "processor", "satellite", "catalyst", "manuscript", "theorem",
+]
+_PEOPLE = [
+    "Ada Lovelace", "Alan Turing", "Grace Hopper", "Marie Curie", "Niels Bohr",
+    "Rosalind Franklin", "Claude Shannon", "Emmy Noether", "John von Neumann",
+    "Barbara Liskov", "Donald Knuth", "Katherine Johnson",
+]
+_CITIES = ["Delhi", "Zurich", "Boston", "Kyoto", "Lagos", "Lima", "Oslo", "Perth"]
+_FILLER = [
+    "Researchers continue to study its long-term effects on the field.",
+    "Several follow-up experiments confirmed the original observations.",
+    "The work was later summarised in a widely cited review article.",
+    "Critics initially questioned the methodology used in the study.",
+    "Funding for the project came from a consortium of universities.",
+]
+
+
+def build_synthetic_corpus(n_docs: int, facts_per_doc: int = 5, seed: int = 13) -> Corpus:
+    """
+    Build a corpus of generated documents with known answers
+
+    Each fact produces one question whose answer appears verbatim in exactly
+    one document, so recall and QA accuracy have an unambiguous ground truth.
+    """
+    rng = random.Random(seed)
+    documents, questions = {}, []
+
+    for d in range(n_docs):
+        doc_id = f"doc_{d:05d}"
+        sentences = []
+        for f in range(facts_per_doc):
+            name = f"{rng.choice(_SUBJECTS).title()} {d}-{f}"
+            person = rng.choice(_PEOPLE)
+            year = str(rng.randint(1850, 2023))
+            city = rng.choice(_CITIES)
+
+            sentences.append(f"The {name} was designed by {person} in {year}.")
+            sentences.append(f"Its first public demonstration took place in {city}.")
+            sentences.extend(rng.sample(_FILLER, 2))
+
+            questions.append({"question": f"Who designed the {name}?", "answer": person, "doc_id": doc_id})
+            questions.append({"question": f"In which year was the {name} designed?", "answer": year, "doc_id": doc_id})
+
+        documents[doc_id] = " ".join(sentences)
+
+    return Corpus(documents, questions)
+
+
+def load_notes_corpus(path: Path) -> Corpus:
+    """
+    Load course notes (temp_rag.txt style) as a corpus
+
+    Sections start at "Day N" headings; "Term: definition" lines become
+    question/answer pairs whose answer is the definition.
+    """
+    text = path.read_text(encoding="utf-8")
+    sections = re.split(r"\n(?=\W*Day \d+)", text)
+
+    documents, questions = {}, []
+    for i, section in enumerate(s for s in sections if s.strip()):
+        doc_id = f"{path.stem}_{i:03d}"
+        documents[doc_id] = section
+        for line in section.splitlines():
+            match = re.match(r"^\s*([A-Z][\w /()_-]{1,40}):\s+(.{10,})$", line)
+            if match:
+                term, definition = match.group(1).strip(), match.group(2).strip()
+                questions.append({"question": f"What is {term}?", "answer": definition, "doc_id": doc_id})
+
+    return Corpus(documents, questions)
+
+
+def chunk_text(text: str, size: int, overlap: int) -> List[str]:
+    """Split text into word windows of `size` words with `overlap` words shared"""
+    words = text.split()
+    if not words:
+        return []
+    step = max(1, size - overlap)
+    return [" ".join(words[i:i + size]) for i in range(0, max(1, len(words) - overlap), step)]
+
+
+# ==================== EMBEDDERS ====================
+
+class HashingEmbedder:
+    """Dependency-free bag-of-words embedder (feature hashing), for offline runs"""
+
+    def __init__(self, dim: int = 512):
+        self.name = f"hashing-{dim}"
+        self.dim = dim
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token in TOKEN_RE.findall(text.lower()):
+                out[row, zlib.crc32(token.encode()) % self.dim] += 1.0
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        return out / np.maximum(norms, 1e-12)
+
+
+class SentenceTransformerEmbedder:
+    """Wraps a sentence-transformers model, normalised for cosine search"""
+
+    def __init__(self, model_name: str, batch_size: int = 64):
+        from sentence_transformers import SentenceTransformer
+
+        self.name = model_name
+        self.batch_size = batch_size
+        self.model = SentenceTransformer(model_name)
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        return self.model.encode(
+            texts, batch_size=self.batch_size, normalize_embeddings=True, convert_to_numpy=True
+        ).astype(np.float32)
+
+
+def make_embedder(name: str):
+    if name.startswith("hashing"):
+        dim = int(name.split("-")[1]) if "-" in name else 512
+        return HashingEmbedder(dim)
+    return SentenceTransformerEmbedder(name)
+
+
+# ==================== RETRIEVERS ====================
+
+class DenseRetriever:
+    """Cosine search over passage vectors held in one NumPy matrix"""
+
+    def __init__(self, embedder, chunk_size: Optional[int] = None, overlap: int = 0):
+        self.embedder = embedder
+        self.chunk_size = chunk_size
+        self.overlap = overlap
+        kind = f"chunk{chunk_size}" if chunk_size else "whole"
+        self.name = f"{kind}/{embedder.name}"
+        self.passages: List[Tuple[str, str]] = []
+        self.matrix = None
+
+    def index(self, documents: Dict[str, str]) -> int:
+        for doc_id, text in documents.items():
+            pieces = chunk_text(text, self.chunk_size, self.overlap) if self.chunk_size else [text]
+            self.passages.extend((doc_id, p) for p in pieces)
+        self.matrix = self.embedder.encode([p for _, p in self.passages])
+        return len(self.passages)
+
+    def search(self, query: str, k: int) -> List[Tuple[str, str]]:
+        q = self.embedder.encode([query])[0]
+        scores = self.matrix @ q
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [self.passages[i] for i in top]
+
+
+class BM25Retriever:
+    """Lexical BM25 baseline over word-window passages"""
+
+    def __init__(self, chunk_size: int = 120, overlap: int = 20, k1: float = 1.5, b: float = 0.75):
+        self.name = f"bm25/chunk{chunk_size}"
+        self.chunk_size, self.overlap, self.k1, self.b = chunk_size, overlap, k1, b
+        self.passages: List[Tuple[str, str]] = []
+        self.postings: Dict[str, List[Tuple[int, int]]] = {}
+
+    def index(self, documents: Dict[str, str]) -> int:
+        lengths = []
+        for doc_id, text in documents.items():
+            for passage in chunk_text(text, self.chunk_size, self.overlap):
+                pid = len(self.passages)
+                self.passages.append((doc_id, passage))
+                tokens = TOKEN_RE.findall(passage.lower())
+                lengths.append(len(tokens))
+                for token, tf in Counter(tokens).items():
+                    self.postings.setdefault(token, []).append((pid, tf))
+        self.lengths = np.asarray(lengths, dtype=np.float32)
+        self.avg_len = float(self.lengths.mean()) if lengths else 0.0
+        return len(self.passages)
+
+    def search(self, query: str, k: int) -> List[Tuple[str, str]]:
+        n = len(self.passages)
+        scores = np.zeros(n, dtype=np.float32)
+        for token in set(TOKEN_RE.findall(query.lower())):
+            postings = self.postings.get(token)
+            if not postings:
+                continue
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            ids = np.fromiter((p for p, _ in postings), dtype=np.int64)
+            tfs = np.fromiter((t for _, t in postings), dtype=np.float32)
+            norm = self.k1 * (1 - self.b + self.b * self.lengths[ids] / self.avg_len)
+            scores[ids] += idf * tfs * (self.k1 + 1) / (tfs + norm)
+        k = min(k, n)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [self.passages[i] for i in top]
+
+
+class RagAgentRetriever:
+    """Drives the production backend.agents.rag_agent passage index end to end"""
+
+    def __init__(self):
+        from backend.agents import rag_agent
+
+        self.agent = rag_agent
+        self.name = "rag_agent/chroma"
+        # A tenant of its own keeps benchmark passages out of user collections
+        self.tenant = "benchmark"
+
+    def index(self, documents: Dict[str, str]) -> int:
+        passages = 0
+        for doc_id, text in documents.items():
+            index = self.agent.index_document(doc_id, text, doc_id, tenant=self.tenant)
+            passages += index["passages"] if index else 0
+        return passages
+
+    def search(self, query: str, k: int) -> List[Tuple[str, str]]:
+        return [
+            (hit["doc_id"], hit["text"])
+            for hit in self.agent.query_passages(query, k, self.tenant)
+        ]
+
+
+def make_retriever(kind: str, embedder_name: str, chunk_size: int, overlap: int):
+    if kind == "whole":
+        return DenseRetriever(make_embedder(embedder_name))
+    if kind == "chunk":
+        return DenseRetriever(make_embedder(embedder_name), chunk_size, overlap)
+    if kind == "bm25":
+        return BM25Retriever(chunk_size, overlap)
+    if kind == "rag_agent":
+        return RagAgentRetriever()
+    raise ValueError(f"Unknown retriever: {kind}")
+
+
+# ==================== READERS ====================
+
+class OverlapReader:
+    """Answers with the context sentence that best overlaps the question"""
+
+    name = "overlap"
+
+    def answer(self, question: str, context: str) -> str:
+        q_tokens = set(TOKEN_RE.findall(question.lower()))
+        sentences = re.split(r"(?<=[.!?])\s+|\n", context)
+        best = max(sentences, key=lambda s: len(q_tokens & set(TOKEN_RE.findall(s.lower()))), default="")
+        return best.strip()
+
+
+class PipelineReader:
+    """Extractive QA with a transformers question-answering pipeline"""
+
+    def __init__(self, model_name: str):
+        from transformers import pipeline
+
+        self.name = model_name
+        self.model = pipeline("question-answering", model=model_name)
+
+    def answer(self, question: str, context: str) -> str:
+        return self.model({"question": question, "context": context})["answer"]
+
+
+def make_reader(name: str):
+    if name == "none":
+        return None
+    if name == "overlap":
+        return OverlapReader()
+    return PipelineReader(name)
+
+
+# ==================== METRICS ====================
+
+def normalize_answer(text: str) -> str:
+    """SQuAD-style normalisation: lowercase, strip punctuation and articles"""
+    text = text.lower()
+    text = "".join(ch for ch in text if ch not in set(string.punctuation))
+    text = re.sub(r"\b(a|an|the)\b", " ", text)
+    return " ".join(text.split())
+
+
+def exact_match(prediction: str, truth: str) -> float:
+    return float(normalize_answer(prediction) == normalize_answer(truth))
+
+
+def f1_score(prediction: str, truth: str) -> float:
+    pred_tokens = normalize_answer(prediction).split()
+    true_tokens = normalize_answer(truth).split()
+    common = Counter(pred_tokens) & Counter(true_tokens)
+    overlap = sum(common.values())
+    if overlap == 0:
+        return 0.0
+    precision = overlap / len(pred_tokens)
+    recall = overlap / len(true_tokens)
+    return 2 * precision * recall / (precision + recall)
+
+
+def is_relevant(hit: Tuple[str, str], question: Dict) -> bool:
+    doc_id, passage = hit
+    return doc_id == question["doc_id"] and normalize_answer(question["answer"]) in normalize_answer(passage)
+
+
+# ==================== RUNNER ====================
+
+def run_config(retriever, reader, corpus: Corpus, k: int, warmup: int) -> Dict:
+    start = time.perf_counter()
+    n_passages = retriever.index(corpus.documents)
+    ingest_seconds = time.perf_counter() - start
+    total_chars = sum(len(t) for t in corpus.documents.values())
+
+    for q in corpus.questions[:warmup]:
+        retriever.search(q["question"], k)
+
+    latencies, reader_latencies = [], []
+    hits_at_k, reciprocal_ranks, ems, f1s = [], [], [], []
+
+    for q in corpus.questions:
+        t0 = time.perf_counter()
+        hits = retriever.search(q["question"], k)
+        latencies.append(time.perf_counter() - t0)
+
+        rank = next((i + 1 for i, hit in enumerate(hits) if is_relevant(hit, q)), None)
+        hits_at_k.append(1.0 if rank else 0.0)
+        reciprocal_ranks.append(1.0 / rank if rank else 0.0)
+
+        if reader and hits:
+            t0 = time.perf_counter()
+            prediction = reader.answer(q["question"], hits[0][1])
+            reader_latencies.append(time.perf_counter() - t0)
+            ems.append(exact_match(prediction, q["answer"]))
+            f1s.append(f1_score(prediction, q["answer"]))
+
+    report = {
+        "name": f"{retriever.name}+{reader.name if reader else 'none'}",
+        "retriever": retriever.name,
+        "reader": reader.name if reader else None,
+        "ingest": {
+            "documents": len(corpus.documents),
+            "passages": n_passages,
+            "seconds": round(ingest_seconds, 4),
+            "docs_per_sec": round(len(corpus.documents) / max(ingest_seconds, 1e-9), 2),
+            "chars_per_sec": round(total_chars / max(ingest_seconds, 1e-9), 2),
+        },
+        "query_latency": latency_summary(latencies),
+        "retrieval": {
+            f"recall@{k}": round(float(np.mean(hits_at_k)), 4) if hits_at_k else 0.0,
+            "mrr": round(float(np.mean(reciprocal_ranks)), 4) if reciprocal_ranks else 0.0,
+        },
+    }
+    if reader:
+        report["qa"] = {
+            "exact_match": round(float(np.mean(ems)), 4) if ems else 0.0,
+            "f1": round(float(np.mean(f1s)), 4) if f1s else 0.0,
+            "latency": latency_summary(reader_latencies),
+        }
+    return report
+
+
+def main(argv: Optional[List[str]] = None) -> Dict:
+    parser = argparse.ArgumentParser(description="Benchmark the RAG retrieval path")
+    parser.add_argument("--corpus", choices=["synthetic", "notes"], default="synthetic")
+    parser.add_argument("--notes", type=Path, default=ROOT / "temp_rag.txt")
+    parser.add_argument("--docs", type=int, default=200, help="Synthetic documents to generate")
+    parser.add_argument("--facts", type=int, default=5, help="Facts per synthetic document")
+    parser.add_argument("--max-questions", type=int, default=500)
+    parser.add_argument("--retrievers", default="whole,chunk,bm25")
+    parser.add_argument("--embedders", default="hashing-512")
+    parser.add_argument("--readers", default="overlap")
+    parser.add_argument("--chunk-size", type=int, default=120)
+    parser.add_argument("--overlap", type=int, default=20)
+    parser.add_argument("-k", type=int, default=5)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=13)
+    parser.add_argument("--output", type=Path, default=DEFAULT_OUTPUT)
+    parser.add_argument("--compare", type=Path, help="Previous JSON report to diff against")
+    args = parser.parse_args(argv)
+
+    if args.corpus == "synthetic":
+        corpus = build_synthetic_corpus(args.docs, args.facts, args.seed)
+    else:
+        corpus = load_notes_corpus(args.notes)
+
+    random.Random(args.seed).shuffle(corpus.questions)
+    corpus.questions = corpus.questions[:args.max_questions]
+
+    readers = [make_reader(name) for name in args.readers.split(",") if name]
+    runs = []
+    for kind in args.retrievers.split(","):
+        embedders = ["-"] if kind in ("bm25", "rag_agent") else args.embedders.split(",")
+        for embedder_name in embedders:
+            for reader in readers:
+                retriever = make_retriever(kind, embedder_name, args.chunk_size, args.overlap)
+                run = run_config(retriever, reader, corpus, args.k, args.warmup)
+                runs.append(run)
+                print(f"{run['name']:<45} recall@{args.k}={run['retrieval'][f'recall@{args.k}']:.3f} "
+                      f"mrr={run['retrieval']['mrr']:.3f} p95={run['query_latency']['p95_ms']:.2f}ms")
+
+    report = {
+        "config": {k: str(v) for k, v in vars(args).items()},
+        "corpus": {"documents": len(corpus.documents), "questions": len(corpus.questions)},
+        "runs": runs,
+    }
+    write_report(report, args.output)
+    print(f"Results written to {args.output}")
+
+    if args.compare and args.compare.exists():
+        baseline = json.loads(args.compare.read_text())
+        keys = [
+            "ingest.docs_per_sec", "query_latency.p50_ms", "query_latency.p95_ms",
+            "query_latency.p99_ms", f"retrieval.recall@{args.k}", "retrieval.mrr",
+            "qa.exact_match", "qa.f1",
+        ]
+        for line in compare_reports(report, baseline, keys):
+            print(line)
+
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Shared measurement helpers for the benchmark and load-test harnesses
+"""
+
+import json
+import subprocess
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+
+def latency_summary(samples: List[float]) -> Dict[str, float]:
+    """
+    Summarize latency samples (seconds) as milliseconds
+
+    Args:
+        samples: Raw latencies in seconds
+
+    Returns:
+        Dict with count, mean, p50, p95, p99 and max in milliseconds
+    """
+    if not samples:
+        return {"count": 0, "mean_ms": 0.0, "p50_ms": 0.0, "p95_ms": 0.0, "p99_ms": 0.0, "max_ms": 0.0}
+
+    ms = np.asarray(samples, dtype=np.float64) * 1000.0
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return {
+        "count": int(ms.size),
+        "mean_ms": round(float(ms.mean()), 3),
+        "p50_ms": round(float(p50), 3),
+        "p95_ms": round(float(p95), 3),
+        "p99_ms": round(float(p99), 3),
+        "max_ms": round(float(ms.max()), 3),
+    }
+
+
+def git_revision() -> Optional[str]:
+    """Return the current git commit, if the tree is a checkout"""
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+            cwd=Path(__file__).resolve().parent,
+        )
+        return out.stdout.strip()
+    except Exception:
+        return None
+
+
+def write_report(report: Dict, output: Path) -> None:
+    """Stamp a report with run metadata and write it as JSON"""
+    report.setdefault("meta", {})
+    report["meta"].update({
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "git_revision": git_revision(),
+    })
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+
+
+def compare_reports(current: Dict, baseline: Dict, keys: List[str]) -> List[str]:
+    """
+    Compare two reports run-by-run
+
+    Args:
+        current: Report from this run
+        baseline: Report from a previous run
+        keys: Metric names to diff
+
+    Returns:
+        Human-readable lines, one per run and metric present in both
+    """
+    previous = {run["name"]: run for run in baseline.get("runs", [])}
+    lines = []
+    for run in current.get("runs", []):
+        old = previous.get(run["name"])
+        if not old:
+            continue
+        for key in keys:
+            new_value = _lookup(run, key)
+            old_value = _lookup(old, key)
+            if new_value is None or old_value is None:
+                continue
+            delta = new_value - old_value
+            pct = (delta / old_value * 100.0) if old_value else 0.0
+            lines.append(f"{run['name']:<40} {key:<28} {old_value:>10.4f} -> {new_value:>10.4f} ({pct:+.1f}%)")
+    return lines
+
+
+def _lookup(run: Dict, dotted: str):
+    value = run
+    for part in dotted.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return None
+        value = value[part]
+    return value if isinstance(value, (int, float)) else None
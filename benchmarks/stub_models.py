@@ -0,0 +1,97 @@
+"""
+Lightweight stand-ins for the heavy model libraries, used by the load test
+
+Installing the stubs replaces `transformers.pipeline`,
+`sentence_transformers.SentenceTransformer` and `pytesseract.image_to_string`
+before `backend.main` is imported, so the API can be exercised end to end
+without downloading BART/BERT weights. Each fake model sleeps for a
+configurable, size-proportional time to keep the server's CPU profile
+roughly realistic.
+"""
+
+import os
+import sys
+import time
+import types
+import zlib
+
+import numpy as np
+
+# Per-call base cost and per-1k-characters cost, in milliseconds
+STUB_BASE_MS = float(os.getenv("STUB_MODEL_BASE_MS", "20"))
+STUB_PER_KCHAR_MS = float(os.getenv("STUB_MODEL_PER_KCHAR_MS", "5"))
+
+
+def _simulate_work(n_chars: int) -> None:
+    delay = (STUB_BASE_MS + STUB_PER_KCHAR_MS * n_chars / 1000.0) / 1000.0
+    # Busy-wait so CPU and throughput measurements see real work
+    deadline = time.perf_counter() + delay
+    while time.perf_counter() < deadline:
+        pass
+
+
+class _FakePipeline:
+    def __init__(self, task: str, model: str = None, **kwargs):
+        self.task = task
+        self.model = model
+
+    def __call__(self, inputs, **kwargs):
+        if self.task == "summarization":
+            texts = inputs if isinstance(inputs, list) else [inputs]
+            _simulate_work(sum(len(t) for t in texts))
+            return [{"summary_text": " ".join(t.split()[:60])} for t in texts]
+
+        if self.task == "question-answering":
+            items = inputs if isinstance(inputs, list) else [inputs]
+            _simulate_work(sum(len(i["context"]) for i in items))
+            outputs = []
+            for item in items:
+                sentence = item["context"].split(".")[0].strip()
+                outputs.append({"answer": sentence[:200], "score": 0.5, "start": 0, "end": len(sentence)})
+            return outputs if isinstance(inputs, list) else outputs[0]
+
+        _simulate_work(len(str(inputs)))
+        return [{"generated_text": str(inputs)[:200]}]
+
+
+class _FakeSentenceTransformer:
+    def __init__(self, model_name: str = None, **kwargs):
+        self.model_name = model_name
+        self.dim = 384
+
+    def get_sentence_embedding_dimension(self):
+        return self.dim
+
+    def encode(self, sentences, batch_size: int = 32, normalize_embeddings: bool = False,
+               convert_to_numpy: bool = True, **kwargs):
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        _simulate_work(sum(len(t) for t in texts) // 4)
+
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token in text.lower().split():
+                out[row, zlib.crc32(token.encode()) % self.dim] += 1.0
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        out = out / np.maximum(norms, 1e-12)
+        return out[0] if single else out
+
+
+def install() -> None:
+    """Register the stub modules; must run before backend.main is imported"""
+    transformers = types.ModuleType("transformers")
+    transformers.pipeline = lambda task, model=None, **kwargs: _FakePipeline(task, model, **kwargs)
+    sys.modules["transformers"] = transformers
+
+    sentence_transformers = types.ModuleType("sentence_transformers")
+    sentence_transformers.SentenceTransformer = _FakeSentenceTransformer
+    sys.modules["sentence_transformers"] = sentence_transformers
+
+    try:
+        import pytesseract
+        pytesseract.image_to_string = lambda image, **kwargs: "Stub OCR text from an uploaded image."
+    except ImportError:
+        pytesseract = types.ModuleType("pytesseract")
+        pytesseract.pytesseract = types.SimpleNamespace(tesseract_cmd="")
+        pytesseract.image_to_string = lambda image, **kwargs: "Stub OCR text from an uploaded image."
+        sys.modules["pytesseract"] = pytesseract
@@ -0,0 +1,11 @@
+"""
+ASGI entry point serving backend.main with stubbed models
+
+    uvicorn benchmarks.stub_server:app --workers 4
+"""
+
+from benchmarks import stub_models
+
+stub_models.install()
+
+from backend.main import app  # noqa: E402
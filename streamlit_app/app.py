@@ -4,7 +4,11 @@ A premium Streamlit frontend for AI-powered document analysis
 """
 
 import streamlit as st
-from pathlib import Path
+
+from utils import (
+    inject_custom_css, cache_stats, clear_backend_cache,
+    init_session_state, init_page_state
+)
 
 # ==================== PAGE CONFIG ====================
 st.set_page_config(
@@ -15,46 +19,16 @@ st.set_page_config(
 )
 
 # ==================== LOAD CSS ====================
-def load_css():
-    css_file = Path(__file__).parent / "styles.css"
-    if css_file.exists():
-        with open(css_file) as f:
-            st.markdown(f"<style>{f.read()}</style>", unsafe_allow_html=True)
-
-load_css()
+inject_custom_css()
 
 # ==================== SESSION STATE INITIALIZATION ====================
-def init_session_state():
-    defaults = {
-        'theme': 'dark',
-        'xp': 0,
-        'level': 1,
-        'badges': [],
-        'extracted_content': '',
-        'summary': '',
-        'quiz': [],
-        'mindmap': '',
-        'chat_history': [],
-        'message_count': 0,
-        'flashcards': [],
-        'current_card': 0,
-        'is_flipped': False,
-        'cards_studied': 0,
-        'cards_mastered': 0,
-        'study_mode': 'sequential',
-        'study_plans': {},
-        'completed_tasks': set(),
-        'search_results': [],
-        'search_history': [],
-        'documents_processed': 0,
-        'total_searches': 0,
-        'flashcards_created': 0
-    }
-    for k,v in defaults.items():
-        if k not in st.session_state:
-            st.session_state[k] = v
-
-init_session_state()
+init_session_state('documents_processed', 'total_searches')
+init_page_state('home', {
+    'message_count': 0,
+    'is_flipped': False,
+    'study_mode': 'sequential',
+    'search_results': []
+})
 
 # ==================== HELPER FUNCTIONS ====================
 def toggle_theme():
@@ -128,6 +102,18 @@ with st.sidebar:
     st.metric("Documents", st.session_state.documents_processed)
     st.metric("Searches", st.session_state.total_searches)
 
+    # Backend response cache
+    with st.expander("⚡ Cache"):
+        stats = cache_stats()
+        if stats:
+            for name, s in stats.items():
+                st.caption(f"{name}: {s['hits']}/{s['calls']} hits ({s['hit_rate']:.0%})")
+        else:
+            st.caption("No cached calls yet")
+        if st.button("Clear cache"):
+            clear_backend_cache()
+            st.rerun()
+
     st.markdown("<div class='divider'></div>", unsafe_allow_html=True)
 
     st.markdown("""
@@ -5,24 +5,16 @@ from pathlib import Path
 sys.path.append(str(Path(__file__).parent.parent))
 
 from utils import (
-    upload_pdf, generate_mindmap, upload_to_rag, add_xp,
-    show_loading, inject_custom_css, show_success_message, create_progress_bar
+    upload_pdf, add_xp, fetch_text_range, mindmap_to_markdown, render_text_pages,
+    show_loading, inject_custom_css, show_success_message, create_progress_bar,
+    init_session_state, DOCUMENT_STATE_KEYS, TEXT_PREVIEW_BYTES
 )
 
 st.set_page_config(page_title="Upload PDF", page_icon="📄", layout="wide")
-# ---- Initialize session state if not set ----
-if "xp" not in st.session_state:
-    st.session_state.xp = 0
-if "level" not in st.session_state:
-    st.session_state.level = 1
-if "badges" not in st.session_state:
-    st.session_state.badges = []
-
-
-css_path = Path(__file__).parents[1] / "styles.css"
-with open(css_path) as f:
-    st.markdown(f"<style>{f.read()}</style>", unsafe_allow_html=True)
+# ---- Restore this user's state (shared across pages and replicas) ----
+init_session_state(*DOCUMENT_STATE_KEYS)
 
+# Load CSS
 inject_custom_css()
 
 # Page header
@@ -57,18 +49,20 @@ with col2:
                 result = upload_pdf(uploaded_file)
 
                 if result:
-                    st.session_state.extracted_content = result.get("extracted_content","")
+                    handle = result.get("text_handle") or {}
+                    st.session_state.text_handle = handle
+                    st.session_state.document_id = result.get("document_id", "")
+                    # Only the first range is fetched; the full text stays in
+                    # the blob store and pages read it on demand
+                    st.session_state.text_preview = (
+                        fetch_text_range(handle["hash"], 0, TEXT_PREVIEW_BYTES)["text"] if handle else ""
+                    )
+                    st.session_state.pop("extracted_content", None)
                     st.session_state.summary = result.get("summary","")
                     st.session_state.quiz = result.get("quiz",[])
 
-                    st.session_state.mindmap = generate_mindmap(
-                        st.session_state.extracted_content
-                    )
-
-                    upload_to_rag(
-                        st.session_state.extracted_content,
-                        {"filename": uploaded_file.name}
-                    )
+                    st.session_state.mindmap = result.get("mindmap")
+                    st.session_state.study_stats = result.get("study_stats")
 
                     add_xp(50, "PDF Master")
                     show_success_message("PDF analyzed successfully!")
@@ -87,7 +81,10 @@ if st.session_state.get("summary"):
         st.markdown("</div>", unsafe_allow_html=True)
 
     with tab2:
-        st.text_area("Extracted Text", st.session_state.extracted_content, height=400)
+        if st.session_state.get("text_handle"):
+            render_text_pages(st.session_state.text_handle, key="pdf_text")
+        else:
+            st.text_area("Extracted Text", st.session_state.text_preview, height=400)
 
     with tab3:
         quiz = st.session_state.get("quiz", [])
@@ -106,12 +103,16 @@ if st.session_state.get("summary"):
                 if isinstance(options, list) and len(options) > 0:
                     st.radio(f"q_{i}", options, key=f"quiz_{i}")
 
+                with st.expander("Show answer"):
+                    st.write(q.get("answer", ""))
+
                 st.markdown("---")
 
 
 
     with tab4:
         if st.session_state.mindmap:
-            st.code(st.session_state.mindmap, language="text")
+            st.markdown(mindmap_to_markdown(st.session_state.mindmap))
+            st.caption("Open the Mindmap page to explore sections and their summaries.")
         else:
-            st.info("Mindmap is being generated...")
+            st.info("No mindmap available for this PDF.")
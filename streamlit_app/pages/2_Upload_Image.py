@@ -4,24 +4,17 @@ from pathlib import Path
 
 sys.path.append(str(Path(__file__).parent.parent))
 
-from utils import upload_image, add_xp, show_loading, inject_custom_css, show_success_message
+from utils import (
+    upload_image, fetch_text_range, render_text_pages, add_xp,
+    show_loading, inject_custom_css, show_success_message,
+    init_session_state, DOCUMENT_STATE_KEYS, TEXT_PREVIEW_BYTES
+)
 
 st.set_page_config(page_title="Upload Image", page_icon="🖼️", layout="wide")
-# ---- Initialize session state if not set ----
-if "xp" not in st.session_state:
-    st.session_state.xp = 0
-if "level" not in st.session_state:
-    st.session_state.level = 1
-if "badges" not in st.session_state:
-    st.session_state.badges = []
+# ---- Restore this user's state (shared across pages and replicas) ----
+init_session_state(*DOCUMENT_STATE_KEYS)
 
 # Load CSS
-
-css_path = Path(__file__).parents[1] / "styles.css"
-with open(css_path) as f:
-    st.markdown(f"<style>{f.read()}</style>", unsafe_allow_html=True)
-
-
 inject_custom_css()
 
 # Header
@@ -58,8 +51,19 @@ with col2:
                 result = upload_image(uploaded_file)
 
                 if result:
-                    st.session_state.extracted_content = result.get("extracted_text", "")
+                    handle = result.get("text_handle") or {}
+                    st.session_state.text_handle = handle
+                    st.session_state.document_id = result.get("document_id", "")
+                    # Only the first range is fetched; the full text stays in
+                    # the blob store and pages read it on demand
+                    st.session_state.text_preview = (
+                        fetch_text_range(handle["hash"], 0, TEXT_PREVIEW_BYTES)["text"] if handle else ""
+                    )
+                    st.session_state.pop("extracted_content", None)
                     st.session_state.summary = result.get("summary", "")
+                    st.session_state.quiz = result.get("quiz", [])
+                    st.session_state.mindmap = result.get("mindmap")
+                    st.session_state.study_stats = result.get("study_stats")
 
                     add_xp(40, "Image Analyzer")
                     show_success_message("OCR completed successfully!")
@@ -67,11 +71,14 @@ with col2:
                     st.rerun()
 
 # Results
-if st.session_state.get("extracted_content"):
-    tab1, tab2 = st.tabs(["Extracted Text", "Summary"])
+if st.session_state.get("text_handle"):
+    tab1, tab2, tab3 = st.tabs(["Extracted Text", "Summary", "Quiz"])
 
     with tab1:
-        st.text_area("Extracted Text", st.session_state.extracted_content, height=300)
+        if st.session_state.get("text_handle"):
+            render_text_pages(st.session_state.text_handle, key="image_text", height=300)
+        else:
+            st.text_area("Extracted Text", st.session_state.text_preview, height=300)
 
     with tab2:
         st.write(st.session_state.summary)
@@ -93,4 +100,7 @@ if st.session_state.get("extracted_content"):
                 if isinstance(options, list) and len(options) > 0:
                     st.radio(f"q_img_{i}", options, key=f"quiz_img_{i}")
 
+                with st.expander("Show answer"):
+                    st.write(q.get("answer", ""))
+
                 st.markdown("---")
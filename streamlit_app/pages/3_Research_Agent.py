@@ -6,25 +6,15 @@ sys.path.append(str(Path(__file__).parent.parent))
 
 from utils import (
     upload_text, add_xp, show_loading, 
-    inject_custom_css, show_success_message, validate_file_size
+    inject_custom_css, show_success_message, validate_file_size,
+    init_session_state, DOCUMENT_STATE_KEYS
 )
 
 st.set_page_config(page_title="Upload Text", page_icon="✍️", layout="wide")
-# ---- Initialize session state if not set ----
-if "xp" not in st.session_state:
-    st.session_state.xp = 0
-if "level" not in st.session_state:
-    st.session_state.level = 1
-if "badges" not in st.session_state:
-    st.session_state.badges = []
+# ---- Restore this user's state (shared across pages and replicas) ----
+init_session_state(*DOCUMENT_STATE_KEYS)
 
 # Load CSS
-
-
-css_path = Path(__file__).parents[1] / "styles.css"
-with open(css_path) as f:
-    st.markdown(f"<style>{f.read()}</style>", unsafe_allow_html=True)
-
 inject_custom_css()
 
 # Header
@@ -121,4 +111,6 @@ if st.session_state.get("quiz"):
                 key=f"quiz_{idx}",
                 label_visibility="collapsed"
             )
+        with st.expander("Show answer"):
+            st.write(q.get("answer", ""))
         st.markdown("---")
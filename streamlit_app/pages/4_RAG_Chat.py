@@ -1,28 +1,18 @@
+import html
 import streamlit as st
 import sys
+import uuid
 from pathlib import Path
 
 sys.path.append(str(Path(__file__).parent.parent))
 
-from utils import rag_chat, add_xp, inject_custom_css, show_loading
+from utils import rag_chat, format_citation, add_xp, inject_custom_css, show_loading, paginate, init_session_state
 
 st.set_page_config(page_title="RAG Chat", page_icon="💬", layout="wide")
-# ---- Initialize session state if not set ----
-if "xp" not in st.session_state:
-    st.session_state.xp = 0
-if "level" not in st.session_state:
-    st.session_state.level = 1
-if "badges" not in st.session_state:
-    st.session_state.badges = []
+# ---- Restore this user's state (shared across pages and replicas) ----
+init_session_state("chat_history", "chat_session_id", "document_id")
 
 # Load CSS
-
-
-css_path = Path(__file__).parents[1] / "styles.css"
-with open(css_path) as f:
-    st.markdown(f"<style>{f.read()}</style>", unsafe_allow_html=True)
-
-
 inject_custom_css()
 
 # Header
@@ -33,9 +23,9 @@ st.markdown("""
 </div>
 """, unsafe_allow_html=True)
 
-# Chat history state
-if "chat_history" not in st.session_state:
-    st.session_state.chat_history = []
+# The backend keeps the conversation context for this id
+if not st.session_state.chat_session_id:
+    st.session_state.chat_session_id = uuid.uuid4().hex
 
 # Input box
 query = st.text_input(
@@ -48,20 +38,32 @@ col1, col2, col3 = st.columns([6, 2, 2])
 
 with col2:
     if st.button("Ask AI", use_container_width=True) and query:
-        if not st.session_state.get("extracted_content"):
+        if not st.session_state.get("document_id"):
             st.warning("No documents uploaded. Please upload a document first.")
         else:
             with show_loading("Querying RAG..."):
-                answer = rag_chat(query)
-
-            st.session_state.chat_history.append({"q": query, "a": answer})
+                reply = rag_chat(query, st.session_state.chat_session_id)
+
+            st.session_state.chat_history.append({
+                "q": query,
+                "a": reply["answer"],
+                "source": format_citation(reply["citation"])
+            })
+            # Jump back to the newest page so the answer is visible
+            st.session_state.chat_history_page = 0
             add_xp(5)
             st.rerun()
 
 # Display conversation
 if st.session_state.chat_history:
     st.markdown("---")
-    for msg in reversed(st.session_state.chat_history):
+    # Only the current page of the history is rendered, newest first
+    for msg in paginate(st.session_state.chat_history, key="chat_history", newest_first=True):
+        # The citation carries the uploaded file's name, so it is escaped
+        source_html = (
+            f'<div style="margin-top: 0.4rem; font-size: 0.85em; opacity: 0.85;">📄 {html.escape(msg["source"])}</div>'
+            if msg.get("source") else ""
+        )
         st.markdown(f"""
         <div style="margin: 0.5rem 0;">
             
@@ -84,6 +86,7 @@ if st.session_state.chat_history:
                 color: white;
                 ">
                 <strong>AI:</strong> {msg['a']}
+                {source_html}
             </div>
 
         </div>
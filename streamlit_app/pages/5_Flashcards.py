@@ -1,27 +1,20 @@
 import streamlit as st
 import sys
 from pathlib import Path
-import random
 
 sys.path.append(str(Path(__file__).parent.parent))
 
-from utils import add_xp, inject_custom_css, show_success_message
+from utils import (
+    add_xp, inject_custom_css, show_success_message, init_session_state,
+    add_flashcards, fetch_due_flashcards, review_flashcard, fetch_flashcard_decks,
+    generate_flashcards, show_loading
+)
 
 st.set_page_config(page_title="Flashcards", page_icon="🧠", layout="wide")
-# ---- Initialize session state if not set ----
-if "xp" not in st.session_state:
-    st.session_state.xp = 0
-if "level" not in st.session_state:
-    st.session_state.level = 1
-if "badges" not in st.session_state:
-    st.session_state.badges = []
-
-
-css_path = Path(__file__).parents[1] / "styles.css"
-with open(css_path) as f:
-    st.markdown(f"<style>{f.read()}</style>", unsafe_allow_html=True)
-
+# ---- Restore this user's state (shared across pages and replicas) ----
+init_session_state("cards_studied", "quiz", "document_id", "text_handle", "flashcards_created")
 
+# Load CSS
 inject_custom_css()
 
 st.markdown("""
@@ -31,73 +24,120 @@ st.markdown("""
 </div>
 """, unsafe_allow_html=True)
 
-# Initialize flashcards
-if 'flashcards' not in st.session_state:
-    # If quiz exists, convert to simple Q/A flashcards
-    fc = []
-    if st.session_state.get("quiz"):
-        for q in st.session_state.quiz:
-            question = q.get("question")
-            answer = q.get("correct_answer") or (q.get("options") and q.get("options")[0]) or "Answer"
-            if question:
-                fc.append({"q": question, "a": answer, "mastered": False})
-    st.session_state.flashcards = fc
-    st.session_state.current_card = 0
+# Recall grades sent to the scheduler (SM-2 scale 0-5)
+GRADES = [("Again", 1), ("Hard", 3), ("Good", 4), ("Easy", 5)]
+
+if 'is_flipped' not in st.session_state:
     st.session_state.is_flipped = False
 
+# Quiz questions of the current document seed its deck once per session;
+# the scheduler skips cards that are already in the deck
+document_deck = st.session_state.document_id or "default"
+synced = st.session_state.setdefault("flashcard_synced_quizzes", set())
+if st.session_state.get("quiz") and document_deck not in synced:
+    cards = [
+        {
+            "front": q["question"],
+            "back": q.get("answer") or q.get("correct_answer") or "Answer",
+            "kind": "quiz",
+            "doc_id": st.session_state.document_id or None
+        }
+        for q in st.session_state.quiz
+        if isinstance(q, dict) and q.get("question")
+    ]
+    if cards and add_flashcards(document_deck, cards) is not None:
+        synced.add(document_deck)
+        st.session_state.pop("flashcard_due", None)
+
+# Cards from the whole document: each click walks the next batch of
+# passages it has not seen, so growing a document only adds new cards
+text_handle = st.session_state.text_handle or {}
+if st.session_state.document_id and text_handle.get("hash"):
+    remaining = st.session_state.get("flashcard_remaining", {}).get(document_deck)
+    label = ("Generate flashcards from this document" if remaining is None
+             else f"Continue generating ({remaining} passages left)" if remaining
+             else "Check document for new cards")
+    if st.button(label, use_container_width=True):
+        with show_loading("Generating flashcards..."):
+            result = generate_flashcards(st.session_state.document_id, text_handle["hash"], document_deck)
+        if result:
+            st.session_state.setdefault("flashcard_remaining", {})[document_deck] = result["remaining"]
+            st.session_state.flashcards_created += result["added"]
+            st.session_state.pop("flashcard_due", None)
+            if result["added"]:
+                add_xp(20)
+            show_success_message(
+                f"Added {result['added']} cards ({result['duplicates']} near-duplicates skipped)"
+            )
+
+decks = [d["deck"] for d in fetch_flashcard_decks()]
+options = ["All decks"] + decks
+deck_choice = st.selectbox(
+    "Deck", options,
+    index=options.index(document_deck) if document_deck in options else 0
+)
+deck = "" if deck_choice == "All decks" else deck_choice
+
+# The current card comes from the last review response, so a review is a
+# single round trip; only a deck switch or an empty slot fetches
+if st.session_state.get("flashcard_deck") != deck or "flashcard_due" not in st.session_state:
+    due = fetch_due_flashcards(deck)
+    st.session_state.flashcard_deck = deck
+    st.session_state.flashcard_due = due["cards"]
+    st.session_state.flashcard_stats = due["stats"]
+    st.session_state.is_flipped = False
+
+stats = st.session_state.flashcard_stats or {}
+cards = st.session_state.flashcard_due
+
 def flip_card():
     st.session_state.is_flipped = not st.session_state.is_flipped
 
-def next_card():
-    st.session_state.current_card = (st.session_state.current_card + 1) % max(1, len(st.session_state.flashcards))
+def grade_card(card_id, grade):
+    result = review_flashcard(card_id, grade, st.session_state.flashcard_deck)
+    if result is None:
+        return
+    st.session_state.flashcard_due = result["next"]
+    st.session_state.flashcard_stats = result["stats"]
     st.session_state.is_flipped = False
+    st.session_state.cards_studied += 1
+    add_xp(2, "🧠 Flashcard Pro" if st.session_state.cards_studied >= 50 else None)
 
-def prev_card():
-    st.session_state.current_card = (st.session_state.current_card - 1) % max(1, len(st.session_state.flashcards))
-    st.session_state.is_flipped = False
-
-if not st.session_state.flashcards:
-    st.info("No flashcards available. Generate them by uploading a document or creating a quiz.")
+if not cards:
+    if stats.get("total"):
+        show_success_message("All caught up! No cards are due right now.")
+    else:
+        st.info("No flashcards available. Generate them by uploading a document or creating a quiz.")
 else:
-    card = st.session_state.flashcards[st.session_state.current_card]
+    card = cards[0]
+    label = "New card" if card["new"] else f"Review · every {card['interval']:.0f} days"
     st.markdown(f"""
     <div style="background: var(--bg-secondary); padding: 2rem; border-radius: 20px;">
         <div style="display:flex; justify-content:space-between; align-items:center;">
-            <h3 style="margin:0">Card {st.session_state.current_card+1} / {len(st.session_state.flashcards)}</h3>
-            <div>
-                <button id="prev">◀</button>
-                <button id="next">▶</button>
-            </div>
+            <h3 style="margin:0">{stats.get('due', 0)} due</h3>
+            <span>{label}</span>
         </div>
         <div style="margin-top:1.5rem; text-align:center;">
     """, unsafe_allow_html=True)
 
     if not st.session_state.is_flipped:
-        st.markdown(f"<div style='font-size:1.2rem; padding:2rem; border-radius:12px; background:var(--bg-primary);'>{card['q']}</div>", unsafe_allow_html=True)
+        st.markdown(f"<div style='font-size:1.2rem; padding:2rem; border-radius:12px; background:var(--bg-primary);'>{card['front']}</div>", unsafe_allow_html=True)
+    else:
+        st.markdown(f"<div style='font-size:1.1rem; padding:2rem; border-radius:12px; background:var(--bg-primary);'>**Answer:** {card['back']}</div>", unsafe_allow_html=True)
+
+    # Controls: flip first, then grade how well the answer was recalled
+    if not st.session_state.is_flipped:
+        st.button("Show Answer", on_click=flip_card, use_container_width=True)
     else:
-        st.markdown(f"<div style='font-size:1.1rem; padding:2rem; border-radius:12px; background:var(--bg-primary);'>**Answer:** {card['a']}</div>", unsafe_allow_html=True)
-
-    # Controls
-    col1, col2, col3 = st.columns([1,2,1])
-    with col1:
-        if st.button("◀ Prev"):
-            prev_card()
-            st.experimental_rerun()
-    with col2:
-        if st.button("Flip"):
-            flip_card()
-        if st.button("Mark Mastered"):
-            st.session_state.flashcards[st.session_state.current_card]['mastered'] = True
-            add_xp(10, None)
-            show_success_message("Marked as mastered! +10 XP")
-    with col3:
-        if st.button("Next ▶"):
-            next_card()
-            st.experimental_rerun()
+        for col, (name, grade) in zip(st.columns(len(GRADES)), GRADES):
+            with col:
+                st.button(name, key=f"grade_{grade}", on_click=grade_card,
+                          args=(card["card_id"], grade), use_container_width=True)
 
     st.markdown("</div></div>", unsafe_allow_html=True)
 
-    # Progress
-    mastered = sum(1 for c in st.session_state.flashcards if c.get('mastered'))
-    st.progress(0 if len(st.session_state.flashcards)==0 else mastered/len(st.session_state.flashcards))
-    st.write(f"{mastered} / {len(st.session_state.flashcards)} mastered")
+# Progress from the scheduler's deck counters
+total = stats.get("total", 0)
+if total:
+    st.progress(stats["mastered"] / total)
+    st.write(f"{stats['mastered']} / {total} mastered · {stats['new']} new · {stats['due']} due")
@@ -5,29 +5,20 @@ from pathlib import Path
 sys.path.append(str(Path(__file__).parent.parent))
 
 from utils import (
-    generate_mindmap,
+    summarize_mindmap_sections,
+    mindmap_to_markdown,
     add_xp,
     inject_custom_css,
     show_loading,
-    show_success_message
+    show_success_message,
+    init_session_state
 )
 
 st.set_page_config(page_title="Mindmap", page_icon="🗺️", layout="wide")
-# ---- Initialize session state if not set ----
-if "xp" not in st.session_state:
-    st.session_state.xp = 0
-if "level" not in st.session_state:
-    st.session_state.level = 1
-if "badges" not in st.session_state:
-    st.session_state.badges = []
+# ---- Restore this user's state (shared across pages and replicas) ----
+init_session_state("mindmap", "text_handle")
 
 # Load CSS
-
-
-css_path = Path(__file__).parents[1] / "styles.css"
-with open(css_path) as f:
-    st.markdown(f"<style>{f.read()}</style>", unsafe_allow_html=True)
-
 inject_custom_css()
 
 # Header
@@ -38,31 +29,66 @@ st.markdown("""
 </div>
 """, unsafe_allow_html=True)
 
-# Check if content exists
-content = st.session_state.get("extracted_content", "")
+# Sections summarized per request; matches the backend limit
+SECTIONS_PER_BATCH = 16
+
+mindmap = st.session_state.get("mindmap")
+text_handle = st.session_state.get("text_handle") or {}
 
-if not content:
+if not isinstance(mindmap, dict) or not text_handle:
     st.warning("No document uploaded. Please upload a PDF/Text/Image first.")
-else:
-    if st.button("✨ Generate Mindmap", use_container_width=True):
-        with show_loading("Creating mindmap..."):
-            mindmap_text = generate_mindmap(content)
-
-        st.session_state.mindmap = mindmap_text
-        add_xp(20, "🗺️ Mindmap Creator")
-        show_success_message("Mindmap generated successfully!")
-        st.experimental_rerun()
-
-# Display mindmap
-if st.session_state.get("mindmap"):
-    st.markdown("---")
-    st.markdown("### 📌 Generated Mindmap")
-    st.code(st.session_state.mindmap, language="markdown")
-
-    st.download_button(
-        label="📥 Download Mindmap",
-        data=st.session_state.mindmap,
-        file_name="mindmap.md",
-        mime="text/markdown",
-        use_container_width=True
-    )
+    st.stop()
+
+if "mindmap_summaries" not in st.session_state:
+    st.session_state.mindmap_summaries = {}
+if st.session_state.get("mindmap_doc") != text_handle["hash"]:
+    st.session_state.mindmap_doc = text_handle["hash"]
+    st.session_state.mindmap_path = [mindmap]
+summaries = st.session_state.mindmap_summaries.setdefault(text_handle["hash"], {})
+
+# Walk the tree one level at a time instead of summarizing the whole book
+path = st.session_state.mindmap_path
+node = path[-1]
+
+st.markdown(" › ".join(f"**{n['title']}**" if n is node else n["title"] for n in path))
+if len(path) > 1 and st.button("⬅️ Up one level"):
+    path.pop()
+    st.rerun()
+
+if node.get("key_phrases"):
+    st.caption("Key phrases: " + ", ".join(node["key_phrases"]))
+
+children = node.get("children", [])
+if not children:
+    st.info("This section has no subsections.")
+    children = [node]
+
+pending = [c for c in children if c["id"] not in summaries][:SECTIONS_PER_BATCH]
+if pending and st.button(f"✨ Summarize {len(pending)} sections", use_container_width=True):
+    with show_loading("Summarizing sections..."):
+        summaries.update(summarize_mindmap_sections(text_handle["hash"], pending))
+    add_xp(20, "🗺️ Mindmap Creator")
+    show_success_message("Sections summarized!")
+    st.rerun()
+
+for child in children:
+    with st.container(border=True):
+        st.markdown(f"#### {child['title']}")
+        if child.get("key_phrases"):
+            st.caption(", ".join(child["key_phrases"]))
+        if child["id"] in summaries:
+            st.write(summaries[child["id"]]["summary"])
+        if child is not node and child.get("children"):
+            if st.button(f"Open ({len(child['children'])} subsections)", key=f"open_{child['id']}"):
+                path.append(child)
+                st.rerun()
+
+# Download outline
+st.markdown("---")
+st.download_button(
+    label="📥 Download Mindmap",
+    data=mindmap_to_markdown(mindmap),
+    file_name="mindmap.md",
+    mime="text/markdown",
+    use_container_width=True
+)
@@ -1,31 +1,17 @@
 import streamlit as st
 import sys
 from pathlib import Path
-import re
-import tempfile
 from pyvis.network import Network
 
 sys.path.append(str(Path(__file__).parent.parent))
 
-from utils import add_xp, inject_custom_css
+from utils import add_xp, inject_custom_css, fetch_knowledge_graph, init_session_state, get_user_id
 
 st.set_page_config(page_title="Knowledge Graph", page_icon="📊", layout="wide")
-# ---- Initialize session state if not set ----
-if "xp" not in st.session_state:
-    st.session_state.xp = 0
-if "level" not in st.session_state:
-    st.session_state.level = 1
-if "badges" not in st.session_state:
-    st.session_state.badges = []
+# ---- Restore this user's state (shared across pages and replicas) ----
+init_session_state("document_id")
 
 # Load CSS
-
-
-css_path = Path(__file__).parents[1] / "styles.css"
-with open(css_path) as f:
-    st.markdown(f"<style>{f.read()}</style>", unsafe_allow_html=True)
-
-
 inject_custom_css()
 
 # ------------------ HERO SECTION ------------------
@@ -41,24 +27,15 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 
-# ------------------ EXTRACT CONCEPTS ------------------
-def extract_concepts(text: str):
-    """
-    Extract important words from content.
-    Capitalized words or long words (5+ chars) represent concepts.
-    """
-    words = re.findall(r"\b[A-Z][a-z]+|\b[a-z]{5,}\b", text)
-    from collections import Counter
-    common = [w for w, _ in Counter(words).most_common(25)]
-    return common
+# ------------------ BUILD GRAPH ------------------
+LAYOUT_SCALE = 400
 
 
-# ------------------ BUILD GRAPH ------------------
-def build_graph(content: str):
-    concepts = extract_concepts(content)
+def build_graph(graph: dict):
+    nodes, edges = graph.get("nodes", []), graph.get("edges", [])
 
-    if len(concepts) < 2:
-        return None, 0
+    if len(nodes) < 2:
+        return None
 
     net = Network(
         height="650px",
@@ -68,36 +45,49 @@ def build_graph(content: str):
         directed=False
     )
 
-    # Add main node
-    net.add_node(
-        "Main Topic",
-        label="Main Topic",
-        size=45,
-        color="#764ba2"
-    )
-
-    # Add concept nodes
-    for c in concepts[:20]:
+    # Positions come precomputed from the backend, so the browser skips
+    # the physics simulation. Node size follows how many passages mention
+    # the concept; minor concepts keep their name only in the hover tooltip.
+    top_count = max(n["count"] for n in nodes)
+    for n in nodes:
         net.add_node(
-            c,
-            label=c,
-            size=25,
-            color="#4facfe"
+            n["id"],
+            label=n["id"] if n.get("labelled", True) else " ",
+            size=15 + 30 * n["count"] / top_count,
+            color="#4facfe",
+            title=f"{n['id']}: mentioned in {n['count']} passages",
+            x=n.get("x", 0) * LAYOUT_SCALE,
+            y=n.get("y", 0) * LAYOUT_SCALE,
+            physics=False
         )
-        net.add_edge("Main Topic", c)
 
-    # Add light interconnections between concepts
-    for i in range(len(concepts) - 1):
-        if i % 2 == 0:
-            net.add_edge(concepts[i], concepts[i + 1])
+    # Edges are real co-occurrences, thicker for stronger association (PMI)
+    for e in edges:
+        net.add_edge(
+            e["source"],
+            e["target"],
+            value=e["weight"],
+            title=f"PMI {e['weight']:.2f} · together in {e['count']} passages"
+        )
+
+    net.toggle_physics(False)
+    net.set_edge_smooth("continuous" if len(edges) < 150 else "discrete")
+    return net
+
 
-    return net, len(concepts)
+@st.cache_data(max_entries=16, show_spinner=False)
+def render_graph_html(user_id: str, document_id: str, top_n: int, version: tuple, _graph: dict):
+    """
+    Render the graph to HTML in memory, once per (user, document, size, graph version)
+    """
+    net = build_graph(_graph)
+    return net.generate_html() if net else None
 
 
 # ------------------ MAIN CONTENT ------------------
-content = st.session_state.get("extracted_content", "")
+document_id = st.session_state.get("document_id", "")
 
-if not content:
+if not document_id:
     st.info("Upload any PDF, image or text first to generate a knowledge graph.")
     st.stop()
 
@@ -114,18 +104,26 @@ st.markdown("""
 </div>
 """, unsafe_allow_html=True)
 
+scope = st.radio("Scope", ["This document", "All documents"], horizontal=True)
+top_n = st.slider("Concepts", min_value=10, max_value=200, value=30, step=10)
+
 if st.button("Generate Knowledge Graph", use_container_width=True):
-    graph, count = build_graph(content)
+    scope_id = document_id if scope == "This document" else ""
+    data = fetch_knowledge_graph(scope_id, top_n)
+    if not data:
+        st.stop()
 
-    if not graph:
+    # Versions count per tenant and restart with the backend; the corpus
+    # size next to it tells two graphs with the same counter apart
+    stats = data["stats"]
+    version = (stats["version"], stats["documents"], stats["passages"], stats["pairs"])
+    html = render_graph_html(get_user_id(), scope_id, top_n, version, data)
+    count = len(data["nodes"])
+
+    if not html:
         st.error("Not enough concepts found to build a graph.")
         st.stop()
 
-    # Save graph temporarily and display
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".html") as tmp:
-        graph.save_graph(tmp.name)
-        html = open(tmp.name, "r", encoding="utf-8").read()
-
     st.components.v1.html(html, height=700)
 
     # XP reward
@@ -139,8 +137,10 @@ if st.button("Generate Knowledge Graph", use_container_width=True):
             <h3 class="card-title">Graph Summary</h3>
         </div>
         <div class="card-content">
-            <p><strong>Total Concepts Identified:</strong> {count}</p>
-            <p>Your knowledge graph has been generated using semantic clustering and concept mapping.</p>
+            <p><strong>Concepts Shown:</strong> {count}</p>
+            <p><strong>Relationships:</strong> {len(data["edges"])}</p>
+            <p>Edges link concepts that appear together in the same passages more often than chance (PMI),
+            measured across {data["stats"]["documents"]} documents.</p>
         </div>
     </div>
     """, unsafe_allow_html=True)
@@ -6,27 +6,18 @@ sys.path.append(str(Path(__file__).parent.parent))
 
 from utils import (
     research_topic,
+    fetch_study_plan,
     add_xp,
     inject_custom_css,
-    create_progress_bar
+    create_progress_bar,
+    init_session_state
 )
 
 st.set_page_config(page_title="Study Plan", page_icon="📅", layout="wide")
-# ---- Initialize session state if not set ----
-if "xp" not in st.session_state:
-    st.session_state.xp = 0
-if "level" not in st.session_state:
-    st.session_state.level = 1
-if "badges" not in st.session_state:
-    st.session_state.badges = []
+# ---- Restore this user's state (shared across pages and replicas) ----
+init_session_state("study_plans", "completed_tasks", "study_stats", "mindmap")
 
 # Load CSS
-
-css_path = Path(__file__).parents[1] / "styles.css"
-with open(css_path) as f:
-    st.markdown(f"<style>{f.read()}</style>", unsafe_allow_html=True)
-
-
 inject_custom_css()
 
 # ------------------ HERO SECTION ------------------
@@ -51,10 +42,22 @@ st.markdown("""
     <div class="card-content">
 """, unsafe_allow_html=True)
 
-topic = st.text_input(
-    "Enter a topic, chapter or concept",
-    placeholder="e.g. Agentic AI, Neural Networks, Chapter 4, etc."
-)
+# Documents uploaded with section statistics are planned by the backend
+# from their structure; otherwise the plan is built around a topic
+stats_handle = st.session_state.study_stats or {}
+source = "Topic"
+if stats_handle:
+    source = st.radio("Plan from", ["Uploaded document", "Topic"], horizontal=True)
+
+if source == "Topic":
+    topic = st.text_input(
+        "Enter a topic, chapter or concept",
+        placeholder="e.g. Agentic AI, Neural Networks, Chapter 4, etc."
+    )
+else:
+    mindmap = st.session_state.mindmap
+    topic = (mindmap.get("title") if isinstance(mindmap, dict) else None) or "Uploaded document"
+    st.caption(f"{stats_handle['sections']} sections · about {stats_handle['minutes']:.0f} minutes of reading")
 
 col1, col2 = st.columns([3, 1])
 with col1:
@@ -65,43 +68,63 @@ with col2:
 st.markdown("</div></div>", unsafe_allow_html=True)
 
 # ------------------ GENERATE STUDY PLAN ------------------
+PRACTICE_PER_DAY = {"Light": 3, "Moderate": 5, "Intense": 10}
+
+def section_label(section):
+    # Titles are "Chapter › Section" paths; the last part is enough in a list
+    label = section["title"].split(" › ")[-1]
+    if section.get("part"):
+        label += f" (part {section['part'][0]}/{section['part'][1]})"
+    return label
+
+def document_plan(result, practice):
+    plan = []
+    for d in result["days"]:
+        tasks = [f"Read {section_label(sec)} (~{max(1, round(sec['minutes']))} min)" for sec in d["sections"]]
+        if d["key_phrases"]:
+            tasks.append(f"Review key terms: {', '.join(d['key_phrases'])}")
+        tasks.append(f"Practice {practice} flashcards on today's sections")
+        plan.append({
+            "day": d["day"],
+            "focus": ", ".join(dict.fromkeys(section_label(sec) for sec in d["sections"])),
+            "minutes": d["minutes"],
+            "tasks": tasks
+        })
+    return plan
+
+def topic_plan(topic, summary, days, practice):
+    # Spread the research summary's points over the days
+    points = [p.strip() for p in summary.replace("\n", " ").split(". ") if len(p.strip()) > 20]
+    return [
+        {
+            "day": d,
+            "focus": f"{topic} — {points[(d - 1) % len(points)][:80]}" if points else f"{topic} — Part {d}",
+            "tasks": [
+                "Read topic notes",
+                "Create bullet-point notes",
+                "Review with flashcards",
+                f"Do {practice} quick practice questions"
+            ]
+        }
+        for d in range(1, days + 1)
+    ]
+
 if st.button("Generate Study Plan", use_container_width=True):
+    practice = PRACTICE_PER_DAY[intensity]
+    plan = None
     if not topic:
         st.warning("Please enter a topic before generating a plan.")
+    elif source == "Uploaded document":
+        result = fetch_study_plan(stats_handle["stats"]["hash"], days)
+        if result:
+            plan = document_plan(result, practice)
     else:
         with st.spinner("🧠 AI is preparing your personalized study plan..."):
             backend_response = research_topic(topic)
+        summary = backend_response.get("summary", "") if isinstance(backend_response, dict) else ""
+        plan = topic_plan(topic, summary or "", days, practice)
 
-            if backend_response and isinstance(backend_response, dict):
-                summary = backend_response.get("summary", "")
-                plan = []
-
-                for d in range(1, days + 1):
-                    plan.append({
-                        "day": d,
-                        "focus": f"Study section {(d % 5) + 1}",
-                        "tasks": [
-                            "Read core section",
-                            "Write a brief summary",
-                            "Review key concepts",
-                            "Practice 3–5 questions"
-                        ]
-                    })
-            else:
-                plan = [
-                    {
-                        "day": d,
-                        "focus": f"{topic} — Part {d}",
-                        "tasks": [
-                            "Read topic notes",
-                            "Create bullet-point notes",
-                            "Review with flashcards",
-                            "Do quick practice questions"
-                        ]
-                    }
-                    for d in range(1, days + 1)
-                ]
-
+    if plan:
         # Save plan to session
         st.session_state.study_plans[topic] = plan
 
@@ -138,7 +161,7 @@ if st.session_state.study_plans:
                 margin-bottom: 1rem;
                 border: 1px solid var(--border-color);
             ">
-                <h4 style="margin: 0;">📆 Day {p['day']} — {p['focus']}</h4>
+                <h4 style="margin: 0;">📆 Day {p['day']} — {p['focus']}{f" · ~{p['minutes']:.0f} min" if p.get('minutes') else ""}</h4>
                 <ul style="margin-top: 0.7rem;">
             """, unsafe_allow_html=True)
 
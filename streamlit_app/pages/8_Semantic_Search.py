@@ -5,24 +5,13 @@ import re
 
 sys.path.append(str(Path(__file__).parent.parent))
 
-from utils import add_xp, inject_custom_css
+from utils import add_xp, fetch_text, inject_custom_css, paginate, init_session_state
 
 st.set_page_config(page_title="Semantic Search", page_icon="🔍", layout="wide")
-# ---- Initialize session state if not set ----
-if "xp" not in st.session_state:
-    st.session_state.xp = 0
-if "level" not in st.session_state:
-    st.session_state.level = 1
-if "badges" not in st.session_state:
-    st.session_state.badges = []
+# ---- Restore this user's state (shared across pages and replicas) ----
+init_session_state("text_handle", "search_history")
 
 # Load CSS
-
-
-css_path = Path(__file__).parents[1] / "styles.css"
-with open(css_path) as f:
-    st.markdown(f"<style>{f.read()}</style>", unsafe_allow_html=True)
-
 inject_custom_css()
 
 # ---------------- HERO SECTION ----------------
@@ -33,8 +22,9 @@ st.markdown("""
 </div>
 """, unsafe_allow_html=True)
 
-# Get extracted content
-content = st.session_state.get("extracted_content", "")
+# Text pasted on the research page only lives in this session and is
+# cleared by the next upload; otherwise the uploaded document is searched
+text_handle = st.session_state.get("text_handle") or {}
 
 # ---------------- SEARCH INPUT ----------------
 st.markdown("""
@@ -60,6 +50,11 @@ st.markdown("</div>", unsafe_allow_html=True)
 
 # ---------------- SEARCH ACTION ----------------
 if st.button("🔍 Run Search", use_container_width=True):
+    # The full text is only downloaded when a search actually runs
+    content = st.session_state.get("extracted_content", "")
+    if not content and text_handle.get("hash"):
+        content = fetch_text(text_handle["hash"])
+
     if not content:
         st.warning("⚠️ No content available. Please upload a PDF or image first.")
     else:
@@ -80,6 +75,7 @@ if st.button("🔍 Run Search", use_container_width=True):
         results.sort(key=lambda x: x["matches"], reverse=True)
 
         st.session_state.search_results = results
+        st.session_state.search_results_page = 0
         add_xp(10, "🔍 Search Expert")
 
 # ---------------- DISPLAY RESULTS ----------------
@@ -88,7 +84,7 @@ results = st.session_state.get("search_results", [])
 if results:
     st.markdown("<h2 class='section-title'>🔎 Top Results</h2>", unsafe_allow_html=True)
 
-    for item in results[:10]:
+    for item in paginate(results, key="search_results"):
         text = item["text"]
         score = item["matches"]
 
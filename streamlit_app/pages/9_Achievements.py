@@ -4,25 +4,13 @@ from pathlib import Path
 
 sys.path.append(str(Path(__file__).parent.parent))
 
-from utils import inject_custom_css, XP_REWARDS, BADGES
+from utils import inject_custom_css, XP_REWARDS, BADGES, init_session_state
 
 st.set_page_config(page_title="Achievements", page_icon="🏆", layout="wide")
-# ---- Initialize session state if not set ----
-if "xp" not in st.session_state:
-    st.session_state.xp = 0
-if "level" not in st.session_state:
-    st.session_state.level = 1
-if "badges" not in st.session_state:
-    st.session_state.badges = []
+# ---- Restore this user's state (shared across pages and replicas) ----
+init_session_state()
 
 # Load CSS
-
-
-css_path = Path(__file__).parents[1] / "styles.css"
-with open(css_path) as f:
-    st.markdown(f"<style>{f.read()}</style>", unsafe_allow_html=True)
-
-
 inject_custom_css()
 
 # ------------------------ HERO SECTION ------------------------
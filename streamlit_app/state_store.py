@@ -0,0 +1,203 @@
+"""
+Persistent user state for the Streamlit app
+
+Session values that should survive a reconnect (XP, badges, flashcards,
+study plans, the current document) are mirrored into a shared store so any
+replica behind a load balancer can restore them. Reads are batched per page
+and writes are buffered and flushed in the background.
+"""
+
+import atexit
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable
+
+logger = logging.getLogger(__name__)
+
+# ==================== CONFIGURATION ====================
+# sqlite:///path/to/file.db (default) or redis://host:port/db
+STATE_STORE_URL = os.getenv("STATE_STORE_URL", "sqlite:///storage/streamlit_state.db")
+FLUSH_INTERVAL_SECONDS = float(os.getenv("STATE_FLUSH_INTERVAL", "2"))
+MAX_PENDING_WRITES = 256
+REDIS_KEY_PREFIX = "airc:state:"
+
+# ==================== SERIALIZATION ====================
+
+def _encode(value) -> Dict:
+    if isinstance(value, (set, frozenset)):
+        return {"__set__": sorted(value, key=str)}
+    raise TypeError(f"Cannot persist {type(value).__name__}")
+
+def _decode(obj: Dict):
+    return set(obj["__set__"]) if "__set__" in obj and len(obj) == 1 else obj
+
+def dumps(value) -> str:
+    return json.dumps(value, default=_encode, separators=(",", ":"))
+
+def loads(data: str):
+    return json.loads(data, object_hook=_decode)
+
+# ==================== BACKENDS ====================
+
+class SQLiteStateBackend:
+    """One row per (user, key); WAL lets replicas on a shared volume read while one writes"""
+
+    def __init__(self, path: str):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS user_state ("
+                "user_id TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, "
+                "updated REAL NOT NULL, PRIMARY KEY (user_id, key))"
+            )
+
+    def get_many(self, user_id: str, keys: Iterable[str]) -> Dict[str, str]:
+        keys = list(keys)
+        if not keys:
+            return {}
+        placeholders = ",".join("?" * len(keys))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT key, value FROM user_state WHERE user_id = ? AND key IN ({placeholders})",
+                [user_id, *keys]
+            ).fetchall()
+        return dict(rows)
+
+    def set_many(self, items: Dict[tuple, str]):
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO user_state (user_id, key, value, updated) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (user_id, key) DO UPDATE SET value = excluded.value, updated = excluded.updated",
+                [(user_id, key, value, now) for (user_id, key), value in items.items()]
+            )
+
+    def delete_user(self, user_id: str):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM user_state WHERE user_id = ?", (user_id,))
+
+
+class RedisStateBackend:
+    """One hash per user; works with Redis and protocol-compatible servers (Valkey, KeyDB, Dragonfly)"""
+
+    def __init__(self, url: str):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("STATE_STORE_URL points to Redis but the 'redis' package is not installed") from e
+        self._client = redis.Redis.from_url(url, decode_responses=True)
+
+    def get_many(self, user_id: str, keys: Iterable[str]) -> Dict[str, str]:
+        keys = list(keys)
+        if not keys:
+            return {}
+        values = self._client.hmget(REDIS_KEY_PREFIX + user_id, keys)
+        return {key: value for key, value in zip(keys, values) if value is not None}
+
+    def set_many(self, items: Dict[tuple, str]):
+        by_user = {}
+        for (user_id, key), value in items.items():
+            by_user.setdefault(user_id, {})[key] = value
+        pipeline = self._client.pipeline(transaction=False)
+        for user_id, mapping in by_user.items():
+            pipeline.hset(REDIS_KEY_PREFIX + user_id, mapping=mapping)
+        pipeline.execute()
+
+    def delete_user(self, user_id: str):
+        self._client.delete(REDIS_KEY_PREFIX + user_id)
+
+
+def backend_from_url(url: str):
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisStateBackend(url)
+    if url.startswith("sqlite:///"):
+        return SQLiteStateBackend(url[len("sqlite:///"):])
+    raise ValueError(f"Unsupported STATE_STORE_URL: {url}")
+
+# ==================== WRITE-BEHIND STORE ====================
+
+class StateStore:
+    """
+    Write-behind front for a state backend
+
+    Writes land in an in-process buffer that coalesces repeated updates of
+    the same key and is flushed in one batch every FLUSH_INTERVAL_SECONDS
+    (or sooner once MAX_PENDING_WRITES pile up). Reads see pending writes
+    first, so a session never reads back an older value than it wrote.
+    """
+
+    def __init__(self, backend, flush_interval: float = FLUSH_INTERVAL_SECONDS):
+        self.backend = backend
+        self.flush_interval = flush_interval
+        self._pending = {}
+        # Batch being written; still visible to readers until it lands
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="state-store-flush", daemon=True)
+        self._thread.start()
+        atexit.register(self.flush)
+
+    def get_many(self, user_id: str, keys: Iterable[str]) -> Dict:
+        keys = list(keys)
+        with self._lock:
+            found = {}
+            for key in keys:
+                value = self._pending.get((user_id, key), self._inflight.get((user_id, key)))
+                if value is not None:
+                    found[key] = value
+        missing = [k for k in keys if k not in found]
+        if missing:
+            found.update(self.backend.get_many(user_id, missing))
+        return {key: loads(value) for key, value in found.items()}
+
+    def set_many(self, user_id: str, values: Dict[str, str]):
+        # Values arrive already serialized; the caller diffs on that form
+        with self._lock:
+            for key, value in values.items():
+                self._pending[(user_id, key)] = value
+            full = len(self._pending) >= MAX_PENDING_WRITES
+        if full:
+            self._wake.set()
+
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+                self._inflight = batch
+            if not batch:
+                return
+            try:
+                self.backend.set_many(batch)
+            except Exception:
+                # Put the batch back unless newer values arrived meanwhile
+                with self._lock:
+                    for item, value in batch.items():
+                        self._pending.setdefault(item, value)
+                raise
+            finally:
+                with self._lock:
+                    self._inflight = {}
+
+    def delete_user(self, user_id: str):
+        with self._lock:
+            self._pending = {item: v for item, v in self._pending.items() if item[0] != user_id}
+        self.backend.delete_user(user_id)
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.warning("State store flush failed, retrying: %s", e)
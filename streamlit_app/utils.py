@@ -5,30 +5,127 @@ Helper functions and API integration for the Streamlit frontend
 
 import streamlit as st
 import requests
+from requests.adapters import HTTPAdapter
 from typing import Dict, List, Any, Optional
+import copy
+import hashlib
 import json
+import logging
+import re
+import uuid
 from datetime import datetime
+from pathlib import Path
+
+from state_store import STATE_STORE_URL, StateStore, backend_from_url, dumps
+
+logger = logging.getLogger(__name__)
 
 # ==================== CONFIGURATION ====================
 API_BASE_URL = "http://127.0.0.1:8000"
+STYLES_PATH = Path(__file__).parent / "styles.css"
+
+# Backend results that can change (graph, research) are reused for this long;
+# content-addressed results (uploads, text ranges) never go stale
+CACHE_TTL_SECONDS = 600
+
+# Long text and lists are rendered one page at a time so a rerun ships the
+# same amount of HTML however large the document or chat gets
+TEXT_PAGE_BYTES = 16 * 1024
+# Kept with the document state; the full text is fetched only where it is read
+TEXT_PREVIEW_BYTES = 2 * 1024
+LIST_PAGE_SIZE = 10
+
+# ==================== CACHING ====================
+
+@st.cache_resource
+def get_http_session() -> requests.Session:
+    """Shared HTTP session so reruns reuse pooled keep-alive connections to the backend"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+@st.cache_resource
+def _cache_counters() -> Dict[str, Dict[str, int]]:
+    return {}
+
+def _record_call(name: str):
+    counters = _cache_counters()
+    counters.setdefault(name, {"calls": 0, "misses": 0})["calls"] += 1
+
+def _record_miss(name: str):
+    # Called from inside cached functions, which only run on a miss
+    counters = _cache_counters()
+    counters.setdefault(name, {"calls": 0, "misses": 0})["misses"] += 1
+
+def cache_stats() -> Dict[str, Dict]:
+    """
+    Hit/miss counts of the cached backend calls in this process
+    
+    Returns:
+        Dict mapping call name to calls, hits, misses and hit_rate
+    """
+    stats = {}
+    for name, counts in _cache_counters().items():
+        hits = max(counts["calls"] - counts["misses"], 0)
+        stats[name] = {
+            "calls": counts["calls"],
+            "hits": hits,
+            "misses": counts["misses"],
+            "hit_rate": hits / counts["calls"] if counts["calls"] else 0.0
+        }
+    return stats
+
+def clear_backend_cache():
+    """Drop all cached backend responses and reset the stats"""
+    st.cache_data.clear()
+    _cache_counters().clear()
+
+def _backend_instance() -> str:
+    # Id of the running backend process; it changes on restart, so upload
+    # results cached against an earlier process are not replayed and the
+    # new process gets to re-index the document
+    response = get_http_session().get(f"{API_BASE_URL}/", timeout=5)
+    response.raise_for_status()
+    return response.json().get("instance", "")
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def _cached_upload(endpoint: str, instance: str, user_id: str, file_hash: str, summary_mode: str,
+                   _filename: str, _data: bytes, _mime: str) -> Dict:
+    # Keyed by backend instance, user and content hash instead of hashing
+    # the raw bytes on every rerun; errors raise and are therefore never cached
+    _record_miss(endpoint)
+    response = get_http_session().post(
+        f"{API_BASE_URL}/{endpoint}",
+        files={"file": (_filename, _data, _mime)},
+        data={"user_id": user_id, "summary_mode": summary_mode},
+        timeout=60
+    )
+    response.raise_for_status()
+    return response.json()
+
+def _upload(endpoint: str, file, mime: str, summary_mode: str) -> Dict:
+    data = file.getvalue()
+    _record_call(endpoint)
+    return _cached_upload(endpoint, _backend_instance(), get_user_id(),
+                          hashlib.sha256(data).hexdigest(), summary_mode, file.name, data, mime)
 
 # ==================== API INTEGRATION FUNCTIONS ====================
 
-def upload_pdf(file) -> Optional[Dict]:
+def upload_pdf(file, summary_mode: str = "auto") -> Optional[Dict]:
     """
     Upload PDF to backend for processing
     
     Args:
         file: Streamlit UploadedFile object
+        summary_mode: "auto", "fast" (extractive) or "quality" (BART)
         
     Returns:
         Dict with extracted_content, summary, quiz, or None on error
     """
     try:
-        files = {"file": (file.name, file.getvalue(), "application/pdf")}
-        response = requests.post(f"{API_BASE_URL}/upload_pdf", files=files, timeout=60)
-        response.raise_for_status()
-        return response.json()
+        return _upload("upload_pdf", file, "application/pdf", summary_mode)
     except requests.exceptions.Timeout:
         st.error("⏱️ Request timed out. The file may be too large.")
         return None
@@ -42,21 +139,19 @@ def upload_pdf(file) -> Optional[Dict]:
         st.error(f"❌ Error uploading PDF: {str(e)}")
         return None
 
-def upload_image(file) -> Optional[Dict]:
+def upload_image(file, summary_mode: str = "auto") -> Optional[Dict]:
     """
     Upload image to backend for OCR processing
     
     Args:
         file: Streamlit UploadedFile object
+        summary_mode: "auto", "fast" (extractive) or "quality" (BART)
         
     Returns:
         Dict with extracted_text, summary, or None on error
     """
     try:
-        files = {"file": (file.name, file.getvalue(), file.type)}
-        response = requests.post(f"{API_BASE_URL}/upload_image", files=files, timeout=60)
-        response.raise_for_status()
-        return response.json()
+        return _upload("upload_image", file, file.type, summary_mode)
     except requests.exceptions.Timeout:
         st.error("⏱️ Request timed out. Try a smaller image.")
         return None
@@ -78,7 +173,7 @@ def upload_text(text: str) -> Optional[Dict]:
         Dict with summary, quiz, or None on error
     """
     try:
-        response = requests.post(
+        response = get_http_session().post(
             f"{API_BASE_URL}/upload_text",
             json={"text": text},
             timeout=60
@@ -103,49 +198,213 @@ def research_topic(topic: str) -> Optional[Dict]:
         Dict with research results or None on error
     """
     try:
-        response = requests.post(
-            f"{API_BASE_URL}/research",
-            json={"topic": topic},
-            timeout=120
-        )
-        response.raise_for_status()
-        return response.json()
+        _record_call("research")
+        return _cached_research(topic.strip())
     except Exception as e:
         st.error(f"❌ Error researching topic: {str(e)}")
         return None
 
-def generate_mindmap(content: str) -> str:
+@st.cache_data(ttl=CACHE_TTL_SECONDS, max_entries=64, show_spinner=False)
+def _cached_research(topic: str) -> Dict:
+    _record_miss("research")
+    response = get_http_session().post(
+        f"{API_BASE_URL}/research",
+        json={"topic": topic},
+        timeout=120
+    )
+    response.raise_for_status()
+    return response.json()
+
+def summarize_mindmap_sections(text_hash: str, sections: List[Dict],
+                               summary_mode: str = "auto") -> Dict[int, Dict]:
+    """
+    Summarize mindmap nodes on demand; the backend runs them concurrently
+    and caches each section
+    
+    Args:
+        text_hash: Hash from the text_handle returned by an upload
+        sections: Mindmap nodes (id, title, start, end), at most 16 per call
+        summary_mode: "auto", "fast" (extractive) or "quality" (BART)
+        
+    Returns:
+        Dict mapping node id to {summary, tier}, empty on error
+    """
     try:
-        response = requests.post(
-            f"{API_BASE_URL}/generate_mindmap",
-            data={"text": content},   # <-- FORM data, not JSON
-            timeout=60
-        )
-        response.raise_for_status()
-        return response.json().get("mindmap", "")
+        keys = tuple((s["id"], s["title"], s["start"], s["end"]) for s in sections)
+        _record_call("mindmap_summaries")
+        return _cached_mindmap_summaries(text_hash, keys, summary_mode)
     except Exception as e:
-        st.error(f"❌ Error generating mindmap: {str(e)}")
-        return ""
+        st.error(f"❌ Error summarizing mindmap sections: {str(e)}")
+        return {}
 
+@st.cache_data(max_entries=256, show_spinner=False)
+def _cached_mindmap_summaries(text_hash: str, sections: tuple, summary_mode: str) -> Dict[int, Dict]:
+    _record_miss("mindmap_summaries")
+    payload = {
+        "text_hash": text_hash,
+        "sections": [dict(zip(("id", "title", "start", "end"), s)) for s in sections],
+        "summary_mode": summary_mode
+    }
+    response = get_http_session().post(f"{API_BASE_URL}/mindmap/summaries", json=payload, timeout=120)
+    response.raise_for_status()
+    return {item["id"]: item for item in response.json()["summaries"]}
 
-def upload_to_rag(content: str, metadata: Optional[Dict] = None) -> bool:
+
+def mindmap_to_markdown(node: Dict, depth: int = 0) -> str:
+    """
+    Render a mindmap tree as a nested markdown list
+    
+    Args:
+        node: Mindmap node with title, key_phrases and children
+        depth: Indentation level of this node
+        
+    Returns:
+        Markdown string
+    """
+    indent = "  " * depth
+    lines = [f"{indent}- **{node['title']}**"]
+    if node.get("key_phrases"):
+        lines.append(f"{indent}  - _{', '.join(node['key_phrases'])}_")
+    lines.extend(mindmap_to_markdown(child, depth + 1) for child in node.get("children", []))
+    return "\n".join(lines)
+
+
+def fetch_text_range(blob_hash: str, start: int = 0, length: int = 256 * 1024) -> Dict:
+    """
+    Fetch a window of extracted text from the backend blob store
+    
+    Args:
+        blob_hash: Hash from the text_handle returned by an upload
+        start: Byte offset to start from
+        length: Maximum number of bytes to fetch
+        
+    Returns:
+        Dict with text, start, next offset (None at the end) and total size
+    """
+    try:
+        _record_call("text_range")
+        return _cached_text_range(blob_hash, start, length)
+    except Exception as e:
+        st.error(f"❌ Error fetching text: {str(e)}")
+        return {"text": "", "start": start, "next": None, "size": 0}
+
+def fetch_text(blob_hash: str, page_bytes: int = 256 * 1024) -> str:
     """
-    Upload content to RAG system via temp file
+    Fetch the whole extracted text by paging through the blob store
+    
+    Args:
+        blob_hash: Hash from the text_handle returned by an upload
+        page_bytes: Bytes fetched per request
+        
+    Returns:
+        The full text, or whatever was fetched before an error
     """
+    parts = []
+    start = 0
+    while start is not None:
+        window = fetch_text_range(blob_hash, start, page_bytes)
+        if not window["text"]:
+            break
+        parts.append(window["text"])
+        start = window["next"]
+    return "".join(parts)
 
+@st.cache_data(max_entries=256, show_spinner=False)
+def _cached_text_range(blob_hash: str, start: int, length: int) -> Dict:
+    # Blobs are content-addressed, so a range never changes
+    _record_miss("text_range")
+    response = get_http_session().get(
+        f"{API_BASE_URL}/blobs/{blob_hash}/text",
+        params={"start": start, "length": length},
+        timeout=30
+    )
+    response.raise_for_status()
+    return response.json()
+
+
+def fetch_study_plan(stats_hash: str, days: int) -> Optional[Dict]:
+    """
+    Plan a document's sections over a number of days
+    
+    Args:
+        stats_hash: Hash from the study_stats handle returned by an upload
+        days: Number of study days
+        
+    Returns:
+        Dict with days (minutes, difficulty, key_phrases, sections) and total_minutes, or None on error
+    """
+    try:
+        _record_call("study_plan")
+        return _cached_study_plan(get_user_id(), stats_hash, days)
+    except Exception as e:
+        st.error(f"❌ Error planning study sessions: {str(e)}")
+        return None
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def _cached_study_plan(user_id: str, stats_hash: str, days: int) -> Dict:
+    # Section stats are content-addressed, so a plan never changes
+    _record_miss("study_plan")
+    response = get_http_session().get(
+        f"{API_BASE_URL}/study_plan",
+        params={"user_id": user_id, "stats_hash": stats_hash, "days": days},
+        timeout=30
+    )
+    response.raise_for_status()
+    return response.json()
+
+
+def fetch_knowledge_graph(document_id: str = "", top_n: int = 30,
+                          edges_per_node: int = 4) -> Optional[Dict]:
+    """
+    Fetch the PMI-weighted concept subgraph from the backend
+    
+    Args:
+        document_id: Restrict nodes to one document's concepts ("" for the whole corpus)
+        top_n: Number of concepts to include
+        edges_per_node: Strongest associations kept per concept
+        
+    Returns:
+        Dict with nodes, edges and corpus stats, or None on error
+    """
     try:
-        # create a temporary file because backend expects UploadFile
-        temp_file = "temp_rag.txt"
-        with open(temp_file, "w", encoding="utf-8") as f:
-            f.write(content)
+        _record_call("graph")
+        return _cached_graph(get_user_id(), document_id, top_n, edges_per_node)
+    except requests.exceptions.ConnectionError:
+        st.error("🔌 Cannot connect to backend. Please ensure it's running on " + API_BASE_URL)
+        return None
+    except Exception as e:
+        st.error(f"❌ Error fetching knowledge graph: {str(e)}")
+        return None
+
+@st.cache_data(ttl=CACHE_TTL_SECONDS, max_entries=64, show_spinner=False)
+def _cached_graph(user_id: str, document_id: str, top_n: int, edges_per_node: int) -> Dict:
+    # The graph spans the user's own corpus, so the user is part of the key
+    _record_miss("graph")
+    response = get_http_session().get(
+        f"{API_BASE_URL}/graph",
+        params={"user_id": user_id, "doc_id": document_id, "top_n": top_n,
+                "edges_per_node": edges_per_node},
+        timeout=30
+    )
+    response.raise_for_status()
+    return response.json()
+
 
+def upload_to_rag(content: str, metadata: Optional[Dict] = None) -> bool:
+    """
+    Upload content to RAG system as a text file
+    """
+
+    try:
+        # The backend expects an UploadFile; send the text as one in memory
         files = {
-            "file": ("rag.txt", open(temp_file, "rb"), "text/plain")
+            "file": ("rag.txt", content.encode("utf-8"), "text/plain")
         }
 
-        response = requests.post(
+        response = get_http_session().post(
             f"{API_BASE_URL}/upload_to_rag",
             files=files,
+            data={"user_id": get_user_id()},
             timeout=60
         )
         response.raise_for_status()
@@ -156,29 +415,166 @@ def upload_to_rag(content: str, metadata: Optional[Dict] = None) -> bool:
         return False
 
 
-def rag_chat(question: str) -> str:
+def rag_chat(question: str, session_id: str = "") -> Dict:
     """
     Chat with RAG system
     
     Args:
         question: User question
+        session_id: Conversation id; lets the backend resolve follow-up questions
         
     Returns:
-        AI response string
+        Dict with answer and citation (document, pages, character span; may be None)
     """
     try:
-        response = requests.get(
+        # Not cached here: answers depend on the conversation, and the backend
+        # keeps its own semantic answer cache
+        response = get_http_session().get(
             f"{API_BASE_URL}/rag_chat",
-            params={"question": question},
+            params={"question": question, "user_id": get_user_id(), "session_id": session_id},
             timeout=60
         )
         response.raise_for_status()
         result = response.json()
-        return result.get("answer", "No response received")
+        return {
+            "answer": result.get("answer", "No response received"),
+            "citation": result.get("citation")
+        }
     except requests.exceptions.ConnectionError:
-        return "❌ Cannot connect to backend. Please ensure it's running."
+        return {"answer": "❌ Cannot connect to backend. Please ensure it's running.", "citation": None}
     except Exception as e:
-        return f"❌ Error: {str(e)}"
+        return {"answer": f"❌ Error: {str(e)}", "citation": None}
+
+
+def format_citation(citation: Optional[Dict]) -> str:
+    """
+    Format a RAG citation for display
+    
+    Args:
+        citation: Citation dict from rag_chat, or None
+        
+    Returns:
+        Short source label such as "report.pdf · p. 3-4", or "" without a citation
+    """
+    if not citation:
+        return ""
+    label = citation.get("filename") or citation["document_id"][:12]
+    pages = citation.get("pages")
+    if pages:
+        label += f" · p. {pages[0]}" if pages[0] == pages[1] else f" · p. {pages[0]}-{pages[1]}"
+    return label
+
+def add_flashcards(deck: str, cards: List[Dict]) -> Optional[Dict]:
+    """
+    Add cards to one of the user's spaced-repetition decks
+    
+    Args:
+        deck: Deck name (usually the document id)
+        cards: Dicts with front, back and optional kind/doc_id
+        
+    Returns:
+        Dict with the number of cards added and deck stats, or None on error
+    """
+    try:
+        response = get_http_session().post(
+            f"{API_BASE_URL}/flashcards",
+            json={"user_id": get_user_id(), "deck": deck, "cards": cards},
+            timeout=30
+        )
+        response.raise_for_status()
+        return response.json()
+    except Exception as e:
+        st.error(f"❌ Error saving flashcards: {str(e)}")
+        return None
+
+def generate_flashcards(document_id: str, text_hash: str, deck: str = "") -> Optional[Dict]:
+    """
+    Generate cards from a document's passages into its deck
+    
+    Each call processes the next batch of unseen passages; call again while
+    "remaining" is above zero.
+    
+    Args:
+        document_id: Document the cards come from
+        text_hash: Hash from the document's text_handle
+        deck: Target deck (defaults to the document id)
+        
+    Returns:
+        Dict with processed, remaining, added and duplicates counts, or None on error
+    """
+    try:
+        response = get_http_session().post(
+            f"{API_BASE_URL}/flashcards/generate",
+            json={"user_id": get_user_id(), "doc_id": document_id, "text_hash": text_hash, "deck": deck},
+            timeout=300
+        )
+        response.raise_for_status()
+        return response.json()
+    except Exception as e:
+        st.error(f"❌ Error generating flashcards: {str(e)}")
+        return None
+
+def fetch_due_flashcards(deck: str = "", limit: int = 1) -> Dict:
+    """
+    Fetch the cards due for review, earliest due first
+    
+    Args:
+        deck: Deck name, or "" for all of the user's decks
+        limit: Maximum number of cards
+        
+    Returns:
+        Dict with cards and deck stats
+    """
+    try:
+        response = get_http_session().get(
+            f"{API_BASE_URL}/flashcards/next",
+            params={"user_id": get_user_id(), "deck": deck, "limit": limit},
+            timeout=30
+        )
+        response.raise_for_status()
+        return response.json()
+    except Exception as e:
+        st.error(f"❌ Error fetching flashcards: {str(e)}")
+        return {"cards": [], "stats": {}}
+
+def review_flashcard(card_id: int, grade: int, deck: str = "") -> Optional[Dict]:
+    """
+    Record a review and get the next due card in the same call
+    
+    Args:
+        card_id: Reviewed card
+        grade: Recall quality from 0 (forgot) to 5 (perfect)
+        deck: Deck the next card should come from, or "" for any
+        
+    Returns:
+        Dict with the rescheduled card, next due cards and stats, or None on error
+    """
+    try:
+        response = get_http_session().post(
+            f"{API_BASE_URL}/flashcards/{card_id}/review",
+            params={"deck": deck},
+            json={"user_id": get_user_id(), "grade": grade},
+            timeout=30
+        )
+        response.raise_for_status()
+        return response.json()
+    except Exception as e:
+        st.error(f"❌ Error saving review: {str(e)}")
+        return None
+
+def fetch_flashcard_decks() -> List[Dict]:
+    """Decks of the current user with their card counts"""
+    try:
+        response = get_http_session().get(
+            f"{API_BASE_URL}/flashcards/decks",
+            params={"user_id": get_user_id()},
+            timeout=30
+        )
+        response.raise_for_status()
+        return response.json()["decks"]
+    except Exception as e:
+        st.error(f"❌ Error fetching decks: {str(e)}")
+        return []
 
 # ==================== GAMIFICATION FUNCTIONS ====================
 
@@ -197,6 +593,9 @@ def add_xp(points: int, badge: Optional[str] = None):
         st.balloons()
         st.toast(f"🎉 Achievement Unlocked: {badge}", icon="🏆")
 
+    # XP is often awarded without a rerun following it
+    save_session_state()
+
 def check_level_up():
     """Check if user leveled up and show notification"""
     old_level = st.session_state.get('prev_level', 1)
@@ -360,10 +759,7 @@ def create_custom_card(title: str, content: str, icon: str = "📄", card_type:
     </div>
     """, unsafe_allow_html=True)
 
-def inject_custom_css():
-    """Inject additional custom CSS for cards and components"""
-    st.markdown("""
-    <style>
+CUSTOM_CSS = """
     .custom-card {
         background: var(--bg-secondary);
         border: 2px solid var(--border-color);
@@ -431,8 +827,97 @@ def inject_custom_css():
         0%, 100% { transform: translateY(0); }
         50% { transform: translateY(-15px); }
     }
-    </style>
-    """, unsafe_allow_html=True)
+"""
+
+@st.cache_resource
+def _stylesheet() -> str:
+    # Read and minified once per process instead of on every rerun
+    css = STYLES_PATH.read_text() if STYLES_PATH.exists() else ""
+    css = re.sub(r"/\*.*?\*/", "", css + CUSTOM_CSS, flags=re.S)
+    css = re.sub(r"\s+", " ", css)
+    return re.sub(r"\s*([{};,>])\s*", r"\1", css).strip()
+
+def inject_custom_css():
+    """Inject the app stylesheet (styles.css plus component styles)"""
+    st.markdown(f"<style>{_stylesheet()}</style>", unsafe_allow_html=True)
+
+# ==================== PAGINATION ====================
+
+def _set_page(key: str, page: int):
+    st.session_state[key] = page
+
+def render_text_pages(text_handle: Dict, key: str, label: str = "Extracted Text",
+                      page_bytes: int = TEXT_PAGE_BYTES, height: int = 400):
+    """
+    Show stored text one window at a time, fetched by range from the backend
+    
+    Args:
+        text_handle: text_handle returned by an upload (hash and size)
+        key: Unique widget/state key for this viewer
+        label: Label of the text area
+        page_bytes: Bytes fetched per page
+        height: Height of the text area in pixels
+    """
+    # Page starts are learned while paging forward: windows end on a
+    # character boundary, so page n does not start at n * page_bytes
+    pager = st.session_state.get(f"{key}_pager")
+    if not pager or pager["hash"] != text_handle["hash"]:
+        pager = st.session_state[f"{key}_pager"] = {"hash": text_handle["hash"], "starts": [0]}
+        st.session_state[f"{key}_page"] = 0
+
+    page = min(st.session_state.get(f"{key}_page", 0), len(pager["starts"]) - 1)
+    window = fetch_text_range(text_handle["hash"], pager["starts"][page], page_bytes)
+    if window["next"] is not None and page == len(pager["starts"]) - 1:
+        pager["starts"].append(window["next"])
+
+    st.text_area(label, window["text"], height=height)
+
+    total = max(1, -(-(window["size"] or text_handle.get("size", 0)) // page_bytes))
+    col1, col2, col3 = st.columns([1, 2, 1])
+    with col1:
+        st.button("◀ Previous", key=f"{key}_prev", disabled=page == 0,
+                  on_click=_set_page, args=(f"{key}_page", page - 1), use_container_width=True)
+    with col2:
+        st.caption(f"Page {page + 1} of ~{max(total, page + 1)}")
+    with col3:
+        st.button("Next ▶", key=f"{key}_next", disabled=window["next"] is None,
+                  on_click=_set_page, args=(f"{key}_page", page + 1), use_container_width=True)
+
+def paginate(items: List, key: str, page_size: int = LIST_PAGE_SIZE,
+             newest_first: bool = False) -> List:
+    """
+    Render pager controls and return only the items on the current page
+    
+    Args:
+        items: Full list (e.g. chat history)
+        key: Unique widget/state key for this list
+        page_size: Items per page
+        newest_first: Page from the end of the list, newest item first
+        
+    Returns:
+        Items to render on this run
+    """
+    pages = max(1, -(-len(items) // page_size))
+    page = min(st.session_state.get(f"{key}_page", 0), pages - 1)
+
+    if newest_first:
+        end = len(items) - page * page_size
+        window = items[max(0, end - page_size):end][::-1]
+    else:
+        window = items[page * page_size:(page + 1) * page_size]
+
+    if pages > 1:
+        older, newer = ("Older ▶", "◀ Newer") if newest_first else ("Next ▶", "◀ Previous")
+        col1, col2, col3 = st.columns([1, 2, 1])
+        with col1:
+            st.button(newer, key=f"{key}_back", disabled=page == 0,
+                      on_click=_set_page, args=(f"{key}_page", page - 1), use_container_width=True)
+        with col2:
+            st.caption(f"Page {page + 1} of {pages} · {len(items)} items")
+        with col3:
+            st.button(older, key=f"{key}_forward", disabled=page == pages - 1,
+                      on_click=_set_page, args=(f"{key}_page", page + 1), use_container_width=True)
+    return window
 
 # ==================== DATA FORMATTING FUNCTIONS ====================
 
@@ -494,6 +979,121 @@ def validate_file_size(file, max_size_mb: int = 10) -> bool:
 
 # ==================== SESSION STATE HELPERS ====================
 
+# Values restored on reconnect and shared by every replica; anything not
+# listed here (widget state, pagers, caches) stays local to the session
+PERSISTED_STATE = {
+    'theme': 'dark',
+    'xp': 0,
+    'level': 1,
+    'badges': [],
+    'text_handle': {},
+    'text_preview': '',
+    'document_id': '',
+    'summary': '',
+    'quiz': [],
+    'mindmap': None,
+    'study_stats': None,
+    'chat_history': [],
+    'chat_session_id': '',
+    'cards_studied': 0,
+    'cards_mastered': 0,
+    'study_plans': {},
+    'completed_tasks': set(),
+    'search_history': [],
+    'documents_processed': 0,
+    'total_searches': 0,
+    'flashcards_created': 0
+}
+BASE_STATE_KEYS = ('theme', 'xp', 'level', 'badges')
+DOCUMENT_STATE_KEYS = (
+    'text_handle', 'text_preview', 'document_id', 'summary', 'quiz', 'mindmap', 'study_stats'
+)
+
+@st.cache_resource
+def get_state_store() -> Optional[StateStore]:
+    """Process-wide write-behind store, or None when no backend is reachable"""
+    try:
+        return StateStore(backend_from_url(STATE_STORE_URL))
+    except Exception as e:
+        logger.warning("Persistent user state disabled: %s", e)
+        return None
+
+def get_user_id() -> str:
+    """
+    Stable id for the current user, kept in the URL so a reconnect or
+    another replica picks up the same state
+    
+    Returns:
+        User id string
+    """
+    user_id = st.session_state.get("user_id") or st.query_params.get("uid") or uuid.uuid4().hex
+    st.session_state.user_id = user_id
+    if st.query_params.get("uid") != user_id:
+        st.query_params["uid"] = user_id
+    return user_id
+
+def _state_digest(value) -> Optional[str]:
+    try:
+        return hashlib.sha1(dumps(value).encode("utf-8")).hexdigest()
+    except TypeError:
+        return None
+
+def init_session_state(*keys: str):
+    """
+    Restore the persisted state a page needs, falling back to defaults
+    
+    Only keys not yet loaded in this session are fetched, in one batch, so
+    reruns and widget interactions cost no round trips.
+    
+    Args:
+        keys: PERSISTED_STATE keys the page reads, on top of BASE_STATE_KEYS
+    """
+    # Changes made by the previous run are queued before loading more
+    save_session_state()
+
+    saved = st.session_state.setdefault("_state_saved", {})
+    wanted = [k for k in dict.fromkeys(BASE_STATE_KEYS + keys) if k not in saved]
+    if wanted:
+        stored = {}
+        store = get_state_store()
+        if store:
+            try:
+                stored = store.get_many(get_user_id(), wanted)
+            except Exception as e:
+                logger.warning("Could not load user state: %s", e)
+
+        for key in wanted:
+            value = stored[key] if key in stored else copy.deepcopy(PERSISTED_STATE[key])
+            # Values set earlier in this session are newer than the stored ones
+            if key not in st.session_state:
+                st.session_state[key] = value
+            saved[key] = _state_digest(value)
+
+def save_session_state():
+    """Queue persisted keys whose value changed since they were last saved"""
+    saved = st.session_state.get("_state_saved")
+    if not saved:
+        return
+
+    # Only a digest per key is kept between runs; the serialized value is
+    # sent when the digest moved
+    changed = {}
+    for key, before in saved.items():
+        if key not in st.session_state:
+            continue
+        try:
+            data = dumps(st.session_state[key])
+        except TypeError:
+            continue
+        after = hashlib.sha1(data.encode("utf-8")).hexdigest()
+        if after != before:
+            saved[key] = after
+            changed[key] = data
+
+    store = get_state_store()
+    if changed and store:
+        store.set_many(get_user_id(), changed)
+
 def init_page_state(page_name: str, defaults: Dict):
     """Initialize session state for a specific page"""
     if f'{page_name}_initialized' not in st.session_state:
@@ -0,0 +1,33 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+# Storage locations are read at import time, so they point at a scratch
+# directory before any backend module loads
+STORAGE = Path(tempfile.mkdtemp(prefix="airc-tests-"))
+os.environ.setdefault("BLOB_DIR", str(STORAGE / "blobs"))
+os.environ.setdefault("GRAPH_DIR", str(STORAGE / "graph"))
+os.environ.setdefault("FLASHCARD_DB", str(STORAGE / "flashcards.db"))
+os.environ.setdefault("VECTOR_STORE_DIR", str(STORAGE / "vector_store"))
+os.environ.pop("MONGO_URL", None)
+os.environ["STUB_MODEL_BASE_MS"] = "0"
+os.environ["STUB_MODEL_PER_KCHAR_MS"] = "0"
+
+# The model libraries are replaced by the load test's lightweight stand-ins:
+# embeddings are deterministic bags of hashed words, QA returns the first
+# sentence of its context
+from benchmarks import stub_models  # noqa: E402
+
+stub_models.install()
+
+
+@pytest.fixture
+def tenant(request):
+    # A fresh tenant per test keeps collections and caches independent
+    return f"test-{request.node.name}"
@@ -0,0 +1,75 @@
+import numpy as np
+
+from backend.agents.answer_cache import SemanticAnswerCache
+from backend.agents.rag_agent import CollectionVersions, embed_batch
+
+RESPONSE = {"answer": "Light energy", "citation": None}
+
+
+def vector(text):
+    return embed_batch([text])[0]
+
+
+def test_same_question_hits_until_the_collection_changes():
+    cache = SemanticAnswerCache(threshold=0.95)
+    question = vector("What is photosynthesis?")
+    cache.store("alice", 1, question, RESPONSE, 0.5)
+
+    assert cache.lookup("alice", 1, question) == RESPONSE
+    # Another tenant, or the same tenant after a write, misses
+    assert cache.lookup("bob", 1, question) is None
+    assert cache.lookup("alice", 2, question) is None
+
+
+def test_writes_invalidate_older_entries():
+    cache = SemanticAnswerCache(threshold=0.95)
+    question = vector("What is photosynthesis?")
+    cache.store("alice", 1, question, RESPONSE, 0.5)
+    cache.store("alice", 2, vector("What is ATP?"), RESPONSE, 0.5)
+
+    assert cache.lookup("alice", 2, question) is None
+    # A slow answer computed against the old version is not stored
+    cache.store("alice", 1, question, RESPONSE, 0.5)
+    assert cache.lookup("alice", 2, question) is None
+
+
+def test_different_questions_miss():
+    cache = SemanticAnswerCache(threshold=0.95)
+    cache.store("alice", 1, vector("What is photosynthesis?"), RESPONSE, 0.5)
+    assert cache.lookup("alice", 1, vector("Where are ribosomes made?")) is None
+
+
+def test_follow_ups_only_match_within_their_context():
+    cache = SemanticAnswerCache(threshold=0.95)
+    question = vector("Why is it important?")
+    cache.store("alice", 1, question, RESPONSE, 0.5, scope="What is photosynthesis?")
+
+    assert cache.lookup("alice", 1, question, scope="What is photosynthesis?") == RESPONSE
+    assert cache.lookup("alice", 1, question, scope="What is ATP?") is None
+    assert cache.lookup("alice", 1, question) is None
+
+
+def test_versions_are_shared_between_processes(tmp_path):
+    # Two instances over one file stand in for two uvicorn workers
+    worker_a = CollectionVersions(tmp_path / "versions.db")
+    worker_b = CollectionVersions(tmp_path / "versions.db")
+    assert worker_a.get("alice") == 0
+
+    worker_b.bump("alice")
+    worker_b.bump("alice")
+    assert worker_a.get("alice") == 2
+    assert worker_a.get("bob") == 0
+
+
+def test_full_cache_overwrites_the_oldest_entry(monkeypatch):
+    from backend.agents import answer_cache
+
+    monkeypatch.setattr(answer_cache, "ENTRIES_PER_TENANT", 2)
+    cache = SemanticAnswerCache(threshold=0.95)
+    questions = [vector(q) for q in ("What is ATP?", "What is DNA?", "What is RNA?")]
+    for i, q in enumerate(questions):
+        cache.store("alice", 1, q, {"answer": str(i)}, 0.1)
+
+    assert cache.lookup("alice", 1, questions[0]) is None
+    assert cache.lookup("alice", 1, questions[2]) == {"answer": "2"}
+    assert np.asarray(cache._tenants["alice"].vectors).shape[0] == 2
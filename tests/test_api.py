@@ -0,0 +1,71 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from backend.database import blob_store
+from backend.main import app
+
+client = TestClient(app)
+
+
+@pytest.fixture(scope="module")
+def blob():
+    return blob_store.put_text("0123456789" * 10)
+
+
+@pytest.mark.parametrize("params, status", [
+    ({"start": -5}, 400),
+    ({"length": 0}, 400),
+    ({"start": 1000}, 416),
+])
+def test_blob_ranges_are_validated(blob, params, status):
+    assert client.get(f"/blobs/{blob['hash']}", params=params).status_code == status
+
+
+def test_blob_range_headers(blob):
+    response = client.get(f"/blobs/{blob['hash']}", params={"start": 10, "length": 5})
+    assert response.content == b"01234"
+    assert response.headers["content-range"] == "bytes 10-14/100"
+
+
+def test_unknown_blobs_are_404():
+    assert client.get("/blobs/" + "0" * 64).status_code == 404
+    assert client.get("/blobs/not-a-digest/text").status_code == 404
+
+
+def test_chat_without_documents_keeps_the_response_shape(tenant):
+    response = client.get("/rag_chat", params={"question": "What is ATP?", "user_id": tenant}).json()
+    assert response["answer"] == "No relevant document found."
+    assert {"question", "query", "citation", "sources", "cached"} <= response.keys()
+
+
+def test_repeated_question_in_a_session_is_served_from_cache(tenant):
+    client.post(
+        "/upload_to_rag",
+        files={"file": ("plants.txt", b"Photosynthesis converts light energy into chemical energy.", "text/plain")},
+        data={"user_id": tenant}
+    )
+    params = {"question": "What is photosynthesis?", "user_id": tenant, "session_id": "s1"}
+    first = client.get("/rag_chat", params=params).json()
+    second = client.get("/rag_chat", params=params).json()
+
+    assert not first["cached"]
+    assert second["cached"]
+    assert second["query"] == "What is photosynthesis?"
+    assert second["citation"]["filename"] == "plants.txt"
+
+
+@pytest.mark.parametrize("download", ["../../etc/passwd", "json/../x", "txt"])
+def test_profile_downloads_only_serve_known_kinds(monkeypatch, download):
+    monkeypatch.setenv("ADMIN_TOKEN", "secret")
+    response = client.get(
+        "/admin/profiles/abc-123", params={"download": download}, headers={"X-Admin-Token": "secret"}
+    )
+    assert response.status_code == 400
+
+
+def test_unknown_profiles_are_404(monkeypatch):
+    monkeypatch.setenv("ADMIN_TOKEN", "secret")
+    response = client.get(
+        "/admin/profiles/abc-123", params={"download": "prof"}, headers={"X-Admin-Token": "secret"}
+    )
+    assert response.status_code == 404
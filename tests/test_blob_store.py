@@ -0,0 +1,54 @@
+import pytest
+
+from backend.database import blob_store
+
+
+def test_text_round_trip_and_dedup():
+    first = blob_store.put_text("hello blob store")
+    second = blob_store.put_text("hello blob store")
+    assert first == second
+    assert blob_store.exists(first["hash"])
+    assert blob_store.read_text(first["hash"]) == "hello blob store"
+
+
+def test_range_reads_across_chunks(monkeypatch):
+    monkeypatch.setattr(blob_store, "CHUNK_SIZE", 64)
+    data = bytes(range(256)) * 5
+    handle = blob_store.put_bytes(data)
+
+    assert blob_store.read_range(handle["hash"], 0, 10) == data[:10]
+    assert blob_store.read_range(handle["hash"], 60, 200) == data[60:200]
+    assert blob_store.read_range(handle["hash"], 1200) == data[1200:]
+    assert blob_store.read_range(handle["hash"], 2000, 3000) == b""
+
+
+def test_text_range_never_splits_a_character():
+    text = "é" * 10
+    handle = blob_store.put_text(text)
+
+    window = blob_store.read_text_range(handle["hash"], 0, 5)
+    assert window["text"] == "éé"
+    assert window["next"] == 4
+
+    pieces, start = [], 0
+    while start is not None:
+        window = blob_store.read_text_range(handle["hash"], start, 5)
+        pieces.append(window["text"])
+        start = window["next"]
+    assert "".join(pieces) == text
+
+
+def test_arrays_keep_dtype_and_shape():
+    import numpy as np
+
+    array = np.arange(12, dtype=np.float32).reshape(3, 4)
+    handle = blob_store.put_array(array)
+    assert np.array_equal(blob_store.get_array(handle["hash"]), array)
+
+
+@pytest.mark.parametrize("digest", ["../../etc/passwd", "abc", "A" * 64, ""])
+def test_malformed_digests_are_rejected(digest):
+    assert not blob_store.exists(digest)
+    assert blob_store.stat(digest) is None
+    with pytest.raises(KeyError):
+        blob_store.read_range(digest)
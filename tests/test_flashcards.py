@@ -0,0 +1,91 @@
+import pytest
+
+from backend.agents.flashcard_agent import (
+    DAY_SECONDS, MIN_EASE, RELEARN_SECONDS, START_EASE, ReviewScheduler, generate_flashcards,
+    schedule
+)
+
+NEW_CARD = {"interval": 0.0, "ease": START_EASE, "reps": 0, "lapses": 0}
+
+
+def review_many(grades, now=0.0):
+    card = dict(NEW_CARD)
+    for grade in grades:
+        interval, ease, reps, lapses, due = schedule(card, grade, now)
+        card = {"interval": interval, "ease": ease, "reps": reps, "lapses": lapses, "due": due}
+    return card
+
+
+def test_sm2_intervals_grow_1_6_then_by_ease():
+    assert review_many([4])["interval"] == 1.0
+    assert review_many([4, 4])["interval"] == 6.0
+    card = review_many([4, 4, 4])
+    assert card["interval"] == pytest.approx(6.0 * START_EASE)
+    assert card["reps"] == 3
+
+
+def test_sm2_ease_moves_with_grade():
+    assert review_many([5])["ease"] == pytest.approx(START_EASE + 0.1)
+    assert review_many([4])["ease"] == pytest.approx(START_EASE)
+    assert review_many([3])["ease"] < START_EASE
+    assert review_many([3] * 20)["ease"] == MIN_EASE
+
+
+def test_sm2_lapse_keeps_the_ease():
+    assert review_many([0])["ease"] == START_EASE
+    assert review_many([5, 5, 1])["ease"] == pytest.approx(START_EASE + 0.2)
+
+
+def test_sm2_lapse_resets_and_relearns_soon():
+    card = review_many([4, 4, 1], now=100.0)
+    assert card["reps"] == 0
+    assert card["lapses"] == 1
+    assert card["due"] == 100.0 + RELEARN_SECONDS
+
+
+def test_scheduler_serves_due_cards_and_reschedules(tmp_path, monkeypatch):
+    scheduler = ReviewScheduler(tmp_path / "cards.db")
+    cards = [{"front": f"Q{i}", "back": f"A{i}"} for i in range(3)]
+    assert scheduler.add_cards("alice", "bio", cards, now=0.0) == 3
+    # Same fronts are not added twice; other tenants see nothing
+    assert scheduler.add_cards("alice", "bio", cards, now=0.0) == 0
+    assert scheduler.next_due("bob", "bio", now=10.0) == []
+
+    first = scheduler.next_due("alice", "bio", now=10.0)[0]
+    assert first["front"] == "Q0" and first["new"]
+
+    reviewed = scheduler.review("alice", first["card_id"], 4, now=10.0)
+    assert reviewed["due"] == 10.0 + DAY_SECONDS
+    assert scheduler.next_due("alice", "bio", now=10.0)[0]["front"] == "Q1"
+    assert scheduler.review("bob", first["card_id"], 4) is None
+
+    stats = scheduler.stats("alice", "bio", now=10.0)
+    assert stats == {"total": 3, "due": 2, "new": 2, "mastered": 0, "next_due": 10.0 + DAY_SECONDS}
+
+
+def test_generation_only_processes_new_passages(tmp_path):
+    scheduler = ReviewScheduler(tmp_path / "cards.db")
+    text = (
+        "Photosynthesis is a process that turns light energy into chemical energy. " * 4
+        + "\n\n"
+        + "A ribosome is a molecular machine that builds proteins from amino acids. " * 4
+    )
+
+    def qa(inputs, batch_size=None):
+        return [{"answer": "a cell structure", "score": 0.9} for _ in inputs]
+
+    first = generate_flashcards(scheduler, "alice", "bio", "doc", text, qa, max_passages=1)
+    assert (first["passages"], first["processed"], first["remaining"]) == (2, 1, 1)
+    assert first["added"] >= 1
+
+    rest = generate_flashcards(scheduler, "alice", "bio", "doc", text, qa)
+    assert (rest["processed"], rest["remaining"]) == (1, 0)
+
+    again = generate_flashcards(scheduler, "alice", "bio", "doc", text, qa)
+    assert again["processed"] == 0 and again["added"] == 0
+
+
+def test_added_cards_take_part_in_duplicate_detection(tmp_path):
+    scheduler = ReviewScheduler(tmp_path / "cards.db")
+    scheduler.add_cards("alice", "bio", [{"front": "What is ATP?", "back": "The energy currency of cells"}])
+    assert scheduler.deck_vectors("alice", "bio").shape[0] == 1
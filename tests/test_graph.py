@@ -0,0 +1,44 @@
+import threading
+
+from backend.agents.graph_agent import ConceptGraph
+
+PLANTS = [
+    "Photosynthesis in chloroplasts turns light energy into chemical energy.",
+    "Chloroplasts hold chlorophyll, which absorbs light energy for photosynthesis.",
+]
+CELLS = [
+    "Mitochondria release chemical energy through cellular respiration.",
+    "Cellular respiration in mitochondria produces ATP molecules.",
+]
+
+
+def test_ingest_during_flush_leaves_the_snapshot_intact(tmp_path, monkeypatch):
+    graph = ConceptGraph(tmp_path)
+    graph.add_document("plants", PLANTS)
+    before = graph.counts.toarray()
+
+    writing, release, saved = threading.Event(), threading.Event(), []
+
+    def slow_save(counts, state):
+        writing.set()
+        release.wait(5)
+        saved.append((counts.toarray(), state))
+
+    monkeypatch.setattr(graph, "_save", slow_save)
+    flusher = threading.Thread(target=graph.flush)
+    flusher.start()
+    assert writing.wait(5)
+
+    # New concepts grow the matrix while the old one is being written
+    assert graph.add_document("cells", CELLS) > 0
+    release.set()
+    flusher.join(5)
+
+    counts, state = saved[0]
+    assert counts.shape == before.shape
+    assert (counts == before).all()
+    assert len(state["labels"]) == before.shape[0]
+
+    grown = graph.counts.toarray()
+    assert grown.shape[0] > before.shape[0]
+    assert (grown[:before.shape[0], :before.shape[0]] >= before).all()
@@ -0,0 +1,61 @@
+import pytest
+
+from backend.agents.memory_agent import WINDOW_TURNS, Conversation, is_follow_up, rewrite_query
+
+
+@pytest.mark.parametrize("question", [
+    "What is photosynthesis?",
+    "What is photosynthesis and why is it important?",
+    "What is the enzyme that fixes carbon in plants?",
+    "Is there a difference between DNA and RNA?",
+])
+def test_standalone_questions(question):
+    assert not is_follow_up(question)
+
+
+@pytest.mark.parametrize("question", [
+    "Why is it important?",
+    "Who discovered it?",
+    "How does it relate to cellular respiration?",
+    "What about chapter 3?",
+    "And the Calvin cycle?",
+    "Tell me more",
+    "Why?",
+])
+def test_follow_up_questions(question):
+    assert is_follow_up(question)
+
+
+def test_standalone_question_is_not_rewritten():
+    conversation = Conversation()
+    conversation.remember("What is photosynthesis?", "Turning light into sugar.")
+
+    query, _, context = rewrite_query(conversation, "What is photosynthesis?")
+    assert query == "What is photosynthesis?"
+    assert context == []
+
+
+def test_follow_up_is_expanded_with_the_last_question():
+    conversation = Conversation()
+    conversation.remember("What is photosynthesis?", "Turning light into sugar.")
+
+    query, _, context = rewrite_query(conversation, "Why is it important?")
+    assert context == ["What is photosynthesis?"]
+    assert query == "Why is it important? (What is photosynthesis?)"
+
+
+def test_without_a_session_nothing_is_rewritten():
+    query, vector, context = rewrite_query(None, "Why is it important?")
+    assert query == "Why is it important?"
+    assert context == [] and len(vector)
+
+
+def test_old_turns_move_to_embedding_memory():
+    conversation = Conversation()
+    for i in range(WINDOW_TURNS + 2):
+        conversation.remember(f"Question number {i} about chloroplasts", f"Answer {i}")
+
+    assert len(conversation.recent_questions()) == WINDOW_TURNS
+    assert conversation.memory_questions == [
+        "Question number 0 about chloroplasts", "Question number 1 about chloroplasts"
+    ]
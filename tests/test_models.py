@@ -0,0 +1,107 @@
+import copy
+
+import pytest
+
+from backend.database import models
+
+
+class FakeCollection:
+    # Just enough of a pymongo collection to check what the repository asks for
+    def __init__(self):
+        self.docs = []
+        self.indexes = []
+        self.calls = []
+
+    def create_index(self, keys, **options):
+        self.indexes.append((keys, options))
+
+    def _matches(self, doc, query):
+        return all(doc.get(k) == v for k, v in query.items())
+
+    def update_one(self, query, update, upsert=False):
+        self.calls.append("update_one")
+        doc = next((d for d in self.docs if self._matches(d, query)), None)
+        if doc is None:
+            if not upsert:
+                return
+            doc = dict(query, **update.get("$setOnInsert", {}))
+            self.docs.append(doc)
+        doc.update(update["$set"])
+
+    def _project(self, doc, projection):
+        if any(v == 1 for v in projection.values()):
+            return {k: copy.deepcopy(doc[k]) for k, v in projection.items() if v == 1 and k in doc}
+        return {k: copy.deepcopy(v) for k, v in doc.items() if projection.get(k, 1)}
+
+    def find_one(self, query, projection):
+        self.calls.append("find_one")
+        doc = next((d for d in self.docs if self._matches(d, query)), None)
+        return None if doc is None else self._project(doc, projection)
+
+    def find(self, query, projection):
+        self.calls.append("find")
+        return FakeCursor([self._project(d, projection) for d in self.docs if self._matches(d, query)])
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def sort(self, key, direction):
+        self.docs.sort(key=lambda d: d[key], reverse=direction < 0)
+        return self
+
+    def limit(self, n):
+        return self.docs[:n]
+
+
+@pytest.fixture
+def documents(monkeypatch):
+    collection = FakeCollection()
+    monkeypatch.setattr(models, "get_db", lambda: {"documents": collection})
+    monkeypatch.setattr(models, "_documents_indexed", False)
+    return collection
+
+
+def test_indexes_are_created_once(documents):
+    models.get_documents_collection()
+    models.get_documents_collection()
+
+    by_name = {options["name"]: (keys, options) for keys, options in documents.indexes}
+    assert len(documents.indexes) == 3
+    assert by_name["hash_user"] == ([("hash", 1), ("user_id", 1)], {"unique": True, "name": "hash_user"})
+    assert by_name["user_recent"][0] == [("user_id", 1), ("created_at", -1)]
+    assert by_name["created_at"][0] == [("created_at", -1)]
+
+
+def test_saving_again_updates_the_same_record(documents):
+    models.save_document("h1", "alice", "a.pdf", {"hash": "t1"}, summary="first")
+    created = documents.docs[0]["created_at"]
+    models.save_document("h1", "alice", "a.pdf", {"hash": "t1"}, summary="second")
+
+    assert len(documents.docs) == 1
+    assert documents.docs[0]["summary"] == "second"
+    assert documents.docs[0]["created_at"] == created
+    assert documents.docs[0]["updated_at"] >= created
+
+
+def test_artifacts_come_back_in_one_projected_query(documents):
+    models.save_document("h1", "alice", "a.pdf", {"hash": "t1"}, summary="s", quiz=[{"q": 1}])
+    documents.calls.clear()
+
+    found = models.find_document("h1", "alice", ["summary", "quiz"])
+    assert found == {"summary": "s", "quiz": [{"q": 1}]}
+    assert documents.calls == ["find_one"]
+
+    assert "_id" not in models.find_document("h1", "alice")
+    assert models.find_document("h1", "bob") is None
+
+
+def test_user_documents_are_listed_newest_first(documents):
+    for i in range(3):
+        models.save_document(f"h{i}", "alice", f"{i}.pdf", {"hash": f"t{i}"})
+    models.save_document("other", "bob", "b.pdf", {"hash": "tb"})
+
+    listed = models.list_user_documents("alice", limit=2)
+    assert [d["hash"] for d in listed] == ["h2", "h1"]
+    assert set(listed[0]) == {"hash", "filename", "created_at"}
@@ -0,0 +1,14 @@
+import numpy as np
+
+from backend.agents.quiz_agent import TermIndex, build_questions
+
+
+def test_falls_back_to_the_next_term_when_the_best_is_only_a_substring():
+    # "ion" ranks first but only occurs inside "function"
+    index = TermIndex(["ion", "membrane"], np.eye(2, dtype=np.float32))
+    passages = ["The function of the membrane is to protect the cell from damage."]
+
+    questions = build_questions(passages, None, index, n_questions=1)
+    assert len(questions) == 1
+    assert questions[0]["answer"] == "membrane"
+    assert "function of the _____ is" in questions[0]["question"]
@@ -0,0 +1,40 @@
+from backend.agents.rag_agent import (
+    collection_version, index_document, is_indexed, query_passages, tenant_usage
+)
+
+PLANTS = "Photosynthesis converts light energy into chemical energy inside chloroplasts."
+ENGINES = "Combustion engines convert chemical energy into motion through pistons."
+
+
+def test_searches_only_see_the_tenants_own_documents(tenant):
+    alice, bob = f"{tenant}-alice", f"{tenant}-bob"
+    index_document("plants", PLANTS, "plants.txt", tenant=alice)
+    index_document("engines", ENGINES, "engines.txt", tenant=bob)
+
+    hits = query_passages("How does energy conversion work?", n_results=5, tenant=alice)
+    assert {hit["doc_id"] for hit in hits} == {"plants"}
+    hits = query_passages("How does energy conversion work?", n_results=5, tenant=bob)
+    assert {hit["doc_id"] for hit in hits} == {"engines"}
+
+    assert is_indexed("plants", alice) and not is_indexed("plants", bob)
+    assert tenant_usage(alice)["passages"] == 1
+
+
+def test_unknown_tenant_has_no_results(tenant):
+    assert query_passages("anything", tenant=f"{tenant}-nobody") == []
+
+
+def test_writes_bump_the_collection_version(tenant):
+    before = collection_version(tenant)
+    index_document("plants", PLANTS, "plants.txt", tenant=tenant)
+    assert collection_version(tenant) == before + 1
+
+
+def test_hits_carry_page_provenance(tenant):
+    text = PLANTS + "\n\n" + ENGINES
+    index_document("both", text, "both.pdf", page_starts=[0, len(PLANTS) + 2], tenant=tenant)
+
+    hit = query_passages("chloroplasts", n_results=1, tenant=tenant)[0]
+    assert hit["filename"] == "both.pdf"
+    assert hit["page_first"] == 1
+    assert text[hit["start"]:hit["end"]] == hit["text"]
@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+from backend.agents.study_plan_agent import MAX_PIECE_OF_DAY, partition, plan_study
+
+
+def section(i, minutes, phrases=()):
+    return {
+        "id": i, "title": f"Section {i}", "start": i * 1000, "end": (i + 1) * 1000,
+        "words": int(minutes * 230), "concepts": 0, "difficulty": 1.0,
+        "minutes": minutes, "key_phrases": list(phrases)
+    }
+
+
+@pytest.mark.parametrize("days", [1, 2, 3, 7])
+def test_partition_is_contiguous_and_non_empty(days):
+    minutes = np.array([5.0, 1.0, 1.0, 8.0, 2.0, 2.0, 3.0, 4.0])
+    cuts = partition(minutes, days)
+    assert cuts[0] == 0 and cuts[-1] == len(minutes)
+    assert len(cuts) == days + 1
+    assert all(a < b for a, b in zip(cuts, cuts[1:]))
+
+
+def test_partition_cuts_at_the_nearest_boundary():
+    # Ideal cut at 10 of 20 minutes falls exactly after the fourth unit
+    assert partition(np.array([2.0, 3.0, 4.0, 1.0, 5.0, 5.0]), 2) == [0, 4, 6]
+
+
+def test_plan_covers_every_section_once_in_order():
+    stats = [section(i, m) for i, m in enumerate([10, 3, 25, 7, 12, 4, 9])]
+    plan = plan_study(stats, 4)
+
+    assert [d["day"] for d in plan["days"]] == [1, 2, 3, 4]
+    assert plan["total_minutes"] == pytest.approx(70)
+    assert sum(d["minutes"] for d in plan["days"]) == pytest.approx(70, abs=0.5)
+
+    pieces = [s for d in plan["days"] for s in d["sections"]]
+    assert [s["start"] for s in pieces] == sorted(s["start"] for s in pieces)
+    assert pieces[0]["start"] == 0 and pieces[-1]["end"] == 7000
+
+
+def test_long_sections_are_split_so_days_stay_balanced():
+    stats = [section(0, 60), section(1, 5), section(2, 5)]
+    plan = plan_study(stats, 5)
+    per_day = 70 / 5
+
+    assert any(s["part"] for d in plan["days"] for s in d["sections"])
+    for day in plan["days"]:
+        assert abs(day["minutes"] - per_day) <= per_day * MAX_PIECE_OF_DAY + 0.1
+
+
+def test_days_are_capped_by_available_sections():
+    plan = plan_study([section(0, 0.0001), section(1, 0.0001)], 30)
+    assert 1 <= len(plan["days"]) <= 30
+    assert all(d["sections"] for d in plan["days"])
+
+
+def test_key_phrases_follow_their_sections():
+    stats = [section(0, 10, ["chlorophyll"]), section(1, 10, ["mitochondria"])]
+    plan = plan_study(stats, 2)
+    assert plan["days"][0]["key_phrases"] == ["chlorophyll"]
+    assert plan["days"][1]["key_phrases"] == ["mitochondria"]